@@ -1,6 +1,7 @@
 import os
 from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
+from app.assets import AssetManifest
 
 # Configurar os caminhos explicitamente
 template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
@@ -13,6 +14,8 @@ app = Flask(__name__,
 # Configurar middleware para proxy reverso (Apache)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
-from app import routes
+# Manifest dos estáticos com hash (make assets); os templates usam asset('styles.css')
+asset_manifest = AssetManifest(static_dir)
+app.jinja_env.globals['asset'] = asset_manifest.asset_path
 
-routes.start_background_service()
\ No newline at end of file
+from app import routes
\ No newline at end of file
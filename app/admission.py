@@ -0,0 +1,175 @@
+import copy
+import math
+import time
+from collections import OrderedDict
+from threading import Condition, Lock
+from app.config_manager import config_manager
+
+# Máximo de buckets mantidos em memória (os menos usados são descartados)
+MAX_BUCKETS = 10000
+
+
+def classify_path(path):
+    """
+    Classifica a rota em uma classe de admissão, ou None para rotas não limitadas
+    (páginas e estáticos). O prefixo /ipmonitor de produção é ignorado.
+    """
+    if path.startswith('/ipmonitor/'):
+        path = path[len('/ipmonitor'):]
+    if path.startswith('/api/external/'):
+        return 'external'
+    if path.startswith('/api/ip-status') or path.startswith('/api/start-check/'):
+        return 'status'
+    if path.startswith('/api/rescan'):
+        return 'rescan'
+    if path.startswith('/api/agents/'):
+        return 'agents'
+    if path.startswith('/api/debug/profile'):
+        return 'debug'  # Capturas longas não ocupam as vagas da classe 'api'
+    if path.startswith('/api/'):
+        return 'api'
+    return None
+
+
+class TokenBucket:
+    """Token bucket clássico: `rate` fichas por segundo, acumulando até `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def consume(self):
+        """Consome uma ficha. Retorna 0 se admitido, ou os segundos até haver ficha"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60
+
+
+class AdmissionController:
+    """
+    Controle de admissão da API: rate limiting por cliente (token Bearer ou IP)
+    e limite de requisições simultâneas por classe de rota, com espera curta
+    em fila antes de rejeitar. Mantém contadores de rejeição e de espera.
+    """
+
+    def __init__(self):
+        self.buckets_lock = Lock()
+        self.buckets = OrderedDict()  # (classe, cliente) -> TokenBucket
+        self.cond = Condition()
+        self.in_flight = {}
+        self.stats = {}
+        self.reload_config()
+
+    def reload_config(self):
+        """Relê a seção 'admission' (chamado a cada gravação das configurações)"""
+        with config_manager.config_lock:
+            self.config = copy.deepcopy(config_manager.get_config('admission'))
+
+    def _config(self):
+        # Cópia em memória: o hook de admissão roda em toda requisição /api e não passa pelo config_lock
+        return self.config
+
+    def enabled(self):
+        return self._config().get('enabled', True)
+
+    def _class_stats(self, route_class):
+        return self.stats.setdefault(route_class, {
+            'admitted': 0,
+            'rejected_rate_limit': 0,
+            'rejected_overload': 0,
+            'queued': 0,
+            'queue_wait_total_ms': 0.0,
+            'queue_wait_max_ms': 0.0,
+        })
+
+    def check_rate(self, route_class, client):
+        """Aplica o token bucket do cliente. Retorna 0 ou o Retry-After em segundos"""
+        limits = self._config().get('rate_limits', {}).get(route_class)
+        if not limits:
+            return 0
+
+        key = (route_class, client)
+        with self.buckets_lock:
+            bucket = self.buckets.get(key)
+            if bucket is None or bucket.rate != limits['rate'] or bucket.burst != limits['burst']:
+                bucket = TokenBucket(limits['rate'], limits['burst'])
+                self.buckets[key] = bucket
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+            wait = bucket.consume()
+
+        if wait:
+            with self.cond:
+                self._class_stats(route_class)['rejected_rate_limit'] += 1
+            return max(1, math.ceil(wait))
+        return 0
+
+    def acquire(self, route_class):
+        """Reserva uma vaga da classe, esperando até queue_timeout. Retorna True se admitido"""
+        config = self._config()
+        limit = config.get('max_in_flight', {}).get(route_class)
+        queue_timeout = config.get('queue_timeout', 0.5)
+
+        with self.cond:
+            stats = self._class_stats(route_class)
+            if limit is None:
+                self.in_flight[route_class] = self.in_flight.get(route_class, 0) + 1
+                stats['admitted'] += 1
+                return True
+
+            start = time.monotonic()
+            queued = False
+            while self.in_flight.get(route_class, 0) >= limit:
+                remaining = queue_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    stats['rejected_overload'] += 1
+                    return False
+                if not queued:
+                    queued = True
+                    stats['queued'] += 1
+                self.cond.wait(remaining)
+
+            if queued:
+                waited_ms = (time.monotonic() - start) * 1000
+                stats['queue_wait_total_ms'] += waited_ms
+                stats['queue_wait_max_ms'] = max(stats['queue_wait_max_ms'], waited_ms)
+
+            self.in_flight[route_class] = self.in_flight.get(route_class, 0) + 1
+            stats['admitted'] += 1
+            return True
+
+    def release(self, route_class):
+        """Libera a vaga ocupada por uma requisição admitida"""
+        with self.cond:
+            self.in_flight[route_class] = max(0, self.in_flight.get(route_class, 0) - 1)
+            self.cond.notify()
+
+    def get_status(self):
+        """Retorna limites, ocupação atual e contadores por classe"""
+        config = self._config()
+        with self.cond:
+            classes = {}
+            for route_class, stats in self.stats.items():
+                classes[route_class] = dict(stats)
+                classes[route_class]['in_flight'] = self.in_flight.get(route_class, 0)
+                classes[route_class]['queue_wait_total_ms'] = round(stats['queue_wait_total_ms'], 2)
+                classes[route_class]['queue_wait_max_ms'] = round(stats['queue_wait_max_ms'], 2)
+        with self.buckets_lock:
+            active_clients = len(self.buckets)
+        return {
+            'enabled': config.get('enabled', True),
+            'limits': config,
+            'active_clients': active_clients,
+            'classes': classes,
+        }
+
+# Instância global do controle de admissão
+admission_controller = AdmissionController()
+config_manager.change_listeners.append(admission_controller.reload_config)
@@ -0,0 +1,228 @@
+"""
+Agente remoto de varredura.
+
+Roda o mesmo motor de 'verificar_ips' (ip_operations.varrer_hosts) em outro
+site, para VLANs que o servidor central não alcança, e envia ao ipmonitor
+central apenas as mudanças de estado, em lotes JSON comprimidos (gzip), pela
+API externa com o token Bearer.
+
+Enquanto o central estiver inacessível ou pedir para esperar (429/503), as
+mudanças ficam acumuladas por IP, de modo que o buffer nunca passa do número
+de alvos; a cada `--full-every` ciclos o agente reenvia o estado completo.
+
+Todo ciclo termina com um lote marcado com `cycle_end` (vazio se nada mudou),
+que serve de heartbeat: o central conta uma amostra por ciclo do agente para
+alertas e disponibilidade e marca como desatualizadas as VLANs de agentes
+que param de enviar. Quando o central pede `resync` (agente desconhecido ou
+que voltou depois de ficar mudo), o agente reenvia o estado completo.
+
+Exemplos:
+    ipmonitor-agent --central https://automacao.tce.go.gov.br/ipmonitor --token <token> --id predio-b 90 91
+    python -m app.agent --central http://127.0.0.1:8000 --token <token> --id teste 127.0.0.0/29 --method tcp --port 8000 --once
+    (o central precisa de "networks": {"127.0.0.0/29": 99} na seção agents para aceitar IPs de loopback)
+"""
+import argparse
+import gzip
+import json
+import logging
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+from app import ip_operations
+from app.config_manager import config_manager
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Caminho do endpoint de recebimento no servidor central
+RESULTS_PATH = '/api/agents/results'
+
+
+class CentralBusy(Exception):
+    """O servidor central pediu para o agente esperar (429/503)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Servidor central ocupado, nova tentativa em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ProbeAgent:
+    """Agente que varre os alvos localmente e envia as mudanças em lotes ao servidor central"""
+
+    def __init__(self, central_url, token, agent_id, targets, interval=60, full_every=10, max_batch=2000,
+                 scan_options=None, sender=None):
+        self.central_url = central_url.rstrip('/')
+        self.token = token
+        self.agent_id = agent_id
+        self.ips = [ip for _, ip in ip_operations.expandir_alvos(targets)]
+        self.interval = interval
+        self.full_every = full_every
+        self.max_batch = max_batch
+        self.scan_options = scan_options or ip_operations.opcoes_da_config()
+        self.sender = sender or self._post
+        self.last_state = {}         # ip -> último status varrido
+        self.pending = OrderedDict()  # ip -> resultado ainda não confirmado pelo central
+        self.pending_full = False
+        self.cycle = 0
+        self.announced_cycle = 0  # Último ciclo cujo lote final (cycle_end) o central confirmou
+        self.seq = 0
+        self.backoff_until = 0
+
+    def run_cycle(self):
+        """Varre os alvos e acumula as mudanças (ou o estado completo, periodicamente) para envio"""
+        full = self.cycle % self.full_every == 0
+        self.cycle += 1
+
+        changed = 0
+        for result in ip_operations.varrer_hosts(self.ips, **self.scan_options):
+            ip = result['ip']
+            if full or self.last_state.get(ip) != result['status']:
+                self.pending[ip] = result
+                self.pending.move_to_end(ip)
+                changed += 1
+            self.last_state[ip] = result['status']
+
+        self.pending_full = self.pending_full or full
+        logging.info(f"[AGENT] Ciclo {self.cycle}: {changed} mudanças, {len(self.pending)} pendentes de envio")
+        return changed
+
+    def has_pending(self):
+        """Há resultados ou o fim do ciclo atual ainda não entregues ao central"""
+        return bool(self.pending) or self.announced_cycle < self.cycle
+
+    def resync(self):
+        """Enfileira o último estado conhecido de todos os alvos (o central pediu o estado completo)"""
+        for ip, status in self.last_state.items():
+            if ip not in self.pending:
+                self.pending[ip] = {'ip': ip, 'status': status}
+        self.pending_full = True
+
+    def flush(self):
+        """Envia os pendentes em lotes, terminando com o marcador de fim de ciclo. Retorna True se tudo foi entregue"""
+        if time.monotonic() < self.backoff_until:
+            return False
+
+        while self.has_pending():
+            ips = list(self.pending)[:self.max_batch]
+            batch = [self.pending[ip] for ip in ips]
+            # 'full' só quando o lote contém o estado de todos os alvos
+            full = self.pending_full and len(batch) == len(self.ips)
+            # O último lote do ciclo (ou um lote vazio, se nada mudou) fecha o ciclo no central
+            cycle_end = len(batch) == len(self.pending)
+            self.seq += 1
+            payload = {
+                'agent_id': self.agent_id,
+                'seq': self.seq,
+                'full': full,
+                'cycle': self.cycle,
+                'cycle_end': cycle_end,
+                'interval': self.interval,
+                'sent_at': time.time(),
+                'results': batch,
+            }
+
+            try:
+                response = self.sender(payload)
+            except CentralBusy as e:
+                logging.warning(f"[AGENT] {e}")
+                self.backoff_until = time.monotonic() + e.retry_after
+                return False
+            except Exception as e:
+                logging.warning(f"[AGENT] Central inacessível, {len(self.pending)} resultados mantidos no buffer: {e}")
+                return False
+
+            # Remove apenas o que foi enviado e não mudou de novo durante o envio
+            for ip, result in zip(ips, batch):
+                if self.pending.get(ip) is result:
+                    del self.pending[ip]
+            if full:
+                self.pending_full = False
+            if cycle_end:
+                self.announced_cycle = self.cycle
+            if (response or {}).get('resync'):
+                logging.info("[AGENT] Central pediu o estado completo; reenviando")
+                self.resync()
+            unmapped = (response or {}).get('unmapped')
+            if unmapped:
+                # Sem VLAN no central: reenviar não adianta, é preciso mapear a rede em agents.networks
+                logging.warning(f"[AGENT] Central ignorou {len(unmapped)} IPs sem VLAN mapeada (ex.: {unmapped[0]}); "
+                                f"configure agents.networks no central")
+
+        return True
+
+    def _post(self, payload):
+        """Envia um lote comprimido ao servidor central e retorna a resposta JSON"""
+        body = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        request = urllib.request.Request(
+            self.central_url + RESULTS_PATH,
+            data=body,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'Content-Encoding': 'gzip',
+                'Authorization': f'Bearer {self.token}',
+                'X-Agent-Id': self.agent_id,
+            })
+        try:
+            with urllib.request.urlopen(request, timeout=15) as response:
+                return json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            if e.code in (429, 503):
+                raise CentralBusy(int(e.headers.get('Retry-After', 5)))
+            raise
+
+    def run(self, once=False):
+        while True:
+            started = time.monotonic()
+            self.run_cycle()
+            self.flush()
+            if once:
+                return not self.has_pending()
+            # Tenta reenviar o buffer enquanto espera o próximo ciclo
+            while time.monotonic() - started < self.interval:
+                time.sleep(min(5, self.interval))
+                if self.has_pending():
+                    self.flush()
+
+
+def main(argv=None):
+    network_config = config_manager.get_config('network_settings')
+
+    parser = argparse.ArgumentParser(prog='ipmonitor-agent',
+                                     description='Agente remoto: varre os alvos e envia os resultados ao ipmonitor central.')
+    parser.add_argument('targets', nargs='+', help="VLANs (ex.: 90), CIDRs ou IPs atribuídos a este agente")
+    parser.add_argument('--central', required=True, help='URL base do ipmonitor central (ex.: http://servidor:8000)')
+    parser.add_argument('--token', required=True, help='token Bearer da API externa')
+    parser.add_argument('--id', dest='agent_id', required=True, help='identificador deste agente')
+    parser.add_argument('-i', '--interval', type=float, default=60, help='segundos entre varreduras')
+    parser.add_argument('--full-every', type=int, default=10, help='reenvia o estado completo a cada N ciclos')
+    parser.add_argument('--max-batch', type=int, default=2000, help='máximo de hosts por lote enviado')
+    parser.add_argument('-m', '--method', choices=sorted(ip_operations.SONDAS), default='icmp', help='método de sonda')
+    parser.add_argument('-p', '--port', type=int, default=ip_operations.TCP_PORTA_PADRAO, help='porta usada pela sonda tcp')
+    parser.add_argument('-t', '--timeout', type=float, default=network_config.get('ping_timeout', 2),
+                        help='timeout máximo de cada sonda, em segundos')
+    parser.add_argument('--once', action='store_true', help='executa um único ciclo e sai (código 1 se sobrar algo no buffer)')
+    args = parser.parse_args(argv)
+
+    if args.interval <= 0 or args.full_every < 1 or args.max_batch < 1:
+        parser.error('interval, full-every e max-batch devem ser positivos')
+
+    scan_options = ip_operations.opcoes_da_config()
+    scan_options.update(probe_method=args.method, tcp_port=args.port, timeout=args.timeout)
+
+    try:
+        agent = ProbeAgent(args.central, args.token, args.agent_id, args.targets, interval=args.interval,
+                           full_every=args.full_every, max_batch=args.max_batch, scan_options=scan_options)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.info(f"[AGENT] Agente {args.agent_id} iniciado: {len(agent.ips)} IPs, central {agent.central_url}")
+    delivered = agent.run(once=args.once)
+    return 0 if delivered else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from app.config_manager import config_manager
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class AlertManager:
+    """
+    Motor de alertas orientado a transições.
+
+    Cada varredura alimenta `processar_varredura`, que só confirma uma mudança
+    de estado de um dispositivo cadastrado depois de N amostras consecutivas
+    (debounce). As transições confirmadas vão para uma fila limitada; uma
+    thread de envio agrupa tudo o que chegar dentro da janela de agrupamento
+    em um único incidente (por VLAN) e entrega via webhook com retries e
+    backoff exponencial, sem bloquear o scanner.
+    """
+
+    def __init__(self, queue_size=1000, sender=None):
+        self.state_lock = threading.Lock()
+        self.lock = threading.Lock()  # Protege o worker de envio e os contadores
+        self.estados = {}  # ip -> {'confirmado', 'candidato', 'contagem'}
+        self.fila = queue.Queue(maxsize=queue_size)
+        self.sender = sender or self._enviar_webhook
+        self.worker = None
+        self.stats = {
+            'transicoes': 0,
+            'incidentes_enviados': 0,
+            'incidentes_falhos': 0,
+            'eventos_descartados': 0,
+            'tentativas': 0,
+        }
+
+    def _config(self):
+        monitoring = config_manager.get_config('monitoring')
+        return {
+            'enabled': monitoring.get('alert_on_device_down', False),
+            'webhook_url': monitoring.get('alert_webhook_url', ''),
+            'debounce_samples': max(1, int(monitoring.get('alert_debounce_samples', 3))),
+            'group_window': float(monitoring.get('alert_group_window', 30)),
+            'batch_size': max(1, int(monitoring.get('alert_batch_size', 500))),
+            'max_retries': max(0, int(monitoring.get('alert_max_retries', 5))),
+        }
+
+    def processar_varredura(self, vlan, ip_status_list):
+        """Atualiza o debounce com o resultado de uma varredura e enfileira as transições confirmadas"""
+        config = self._config()
+        if not config['enabled']:
+            return []
+
+        # Só dispositivos cadastrados geram alertas; IPs livres da faixa seriam ruído.
+        # Hosts sem resultado (varredura interrompida) e status repetidos de IPs não
+        # sondados no ciclo (modo em camadas) não contam como amostra.
+        registrados = [item for item in ip_status_list
+                       if item.get('descricao', '-') != '-' and item.get('status') != 'unknown' and not item.get('stale')]
+        confirmadas = []
+
+        with self.state_lock:
+            for item in registrados:
+                amostra = 'on' if item.get('status') == 'on' else 'off'
+                estado = self.estados.get(item['ip'])
+
+                # Primeira amostra apenas estabelece o estado, sem alertar.
+                if estado is None:
+                    self.estados[item['ip']] = {'confirmado': amostra, 'candidato': amostra, 'contagem': 0}
+                    continue
+
+                if amostra == estado['confirmado']:
+                    estado['candidato'] = amostra
+                    estado['contagem'] = 0
+                    continue
+
+                if amostra == estado['candidato']:
+                    estado['contagem'] += 1
+                else:
+                    estado['candidato'] = amostra
+                    estado['contagem'] = 1
+
+                if estado['contagem'] >= config['debounce_samples']:
+                    estado['confirmado'] = amostra
+                    estado['contagem'] = 0
+                    confirmadas.append({
+                        'vlan': vlan,
+                        'ip': item['ip'],
+                        'descricao': item.get('descricao', ''),
+                        'tipo': item.get('tipo', ''),
+                        'estado': 'down' if amostra == 'off' else 'up',
+                        'timestamp': datetime.now().isoformat(),
+                    })
+
+            vlan_inteira_down = bool(registrados) and all(
+                self.estados.get(item['ip'], {}).get('confirmado') == 'off' for item in registrados
+            )
+
+        for evento in confirmadas:
+            evento['vlan_inteira_down'] = vlan_inteira_down
+            self._enfileirar(evento)
+
+        if confirmadas:
+            logging.info(f"[ALERT_MANAGER] VLAN {vlan} - {len(confirmadas)} transições confirmadas")
+        return confirmadas
+
+    def _enfileirar(self, evento):
+        """Enfileira um evento; com a fila cheia descarta o mais antigo"""
+        self._garantir_worker()
+        self._contar('transicoes')
+        while True:
+            try:
+                self.fila.put_nowait(evento)
+                return
+            except queue.Full:
+                try:
+                    self.fila.get_nowait()
+                    self._contar('eventos_descartados')
+                except queue.Empty:
+                    pass
+
+    def _contar(self, contador):
+        with self.lock:
+            self.stats[contador] += 1
+
+    def _garantir_worker(self):
+        # Várias threads de varredura (uma por VLAN, agentes, reverificações) chegam aqui ao mesmo tempo
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._loop_envio, name='alerts', daemon=True)
+                self.worker.start()
+
+    def _loop_envio(self):
+        """Agrupa eventos dentro da janela configurada e envia um incidente por lote"""
+        while True:
+            primeiro = self.fila.get()
+            config = self._config()
+            lote = [primeiro]
+            limite = time.monotonic() + config['group_window']
+
+            while len(lote) < config['batch_size']:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self.fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            incidente = self.montar_incidente(lote)
+            if self._entregar(incidente, config):
+                self._contar('incidentes_enviados')
+            else:
+                self._contar('incidentes_falhos')
+                logging.error(f"[ALERT_MANAGER] Incidente {incidente['incident']} descartado após {config['max_retries']} retries")
+
+    @staticmethod
+    def montar_incidente(eventos):
+        """Consolida uma lista de transições em um único incidente agrupado por VLAN"""
+        vlans = {}
+        for evento in eventos:
+            grupo = vlans.setdefault(str(evento['vlan']), {'down': [], 'up': [], 'vlan_inteira_down': False})
+            grupo[evento['estado']].append({
+                'ip': evento['ip'],
+                'descricao': evento['descricao'],
+                'tipo': evento['tipo'],
+                'timestamp': evento['timestamp'],
+            })
+            grupo['vlan_inteira_down'] = grupo['vlan_inteira_down'] or evento.get('vlan_inteira_down', False)
+
+        total_down = sum(len(g['down']) for g in vlans.values())
+        total_up = sum(len(g['up']) for g in vlans.values())
+        partes = []
+        for vlan, grupo in sorted(vlans.items()):
+            if grupo['vlan_inteira_down']:
+                partes.append(f"VLAN {vlan} inteira offline")
+            elif grupo['down']:
+                partes.append(f"VLAN {vlan}: {len(grupo['down'])} offline")
+            if grupo['up']:
+                partes.append(f"VLAN {vlan}: {len(grupo['up'])} recuperados")
+
+        return {
+            'incident': f"ipmonitor-{int(time.time() * 1000)}",
+            'generated_at': datetime.now().isoformat(),
+            'summary': '; '.join(partes),
+            'total_down': total_down,
+            'total_up': total_up,
+            'vlans': vlans,
+        }
+
+    def _entregar(self, incidente, config):
+        """Tenta entregar o incidente com backoff exponencial (1s, 2s, 4s... até 60s)"""
+        for tentativa in range(config['max_retries'] + 1):
+            self._contar('tentativas')
+            try:
+                self.sender(incidente, config['webhook_url'])
+                logging.info(f"[ALERT_MANAGER] Incidente enviado: {incidente['summary']}")
+                return True
+            except Exception as e:
+                logging.warning(f"[ALERT_MANAGER] Falha ao enviar incidente (tentativa {tentativa + 1}): {e}")
+                if tentativa < config['max_retries']:
+                    time.sleep(min(60, 2 ** tentativa))
+        return False
+
+    @staticmethod
+    def _enviar_webhook(incidente, url):
+        """Envia o incidente como JSON via HTTP POST"""
+        if not url:
+            raise ValueError("monitoring.alert_webhook_url não configurado")
+        corpo = json.dumps(incidente, ensure_ascii=False).encode('utf-8')
+        requisicao = urllib.request.Request(url, data=corpo, method='POST',
+                                            headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(requisicao, timeout=10) as resposta:
+            if resposta.status >= 300:
+                raise RuntimeError(f"HTTP {resposta.status}")
+
+    def get_status(self):
+        """Retorna contadores do motor de alertas"""
+        with self.lock:
+            status = dict(self.stats)
+        status['fila'] = self.fila.qsize()
+        status['fila_max'] = self.fila.maxsize
+        with self.state_lock:
+            status['dispositivos_acompanhados'] = len(self.estados)
+            status['dispositivos_offline'] = sum(1 for e in self.estados.values() if e['confirmado'] == 'off')
+        return status
+
+# Instância global do motor de alertas
+alert_manager = AlertManager()
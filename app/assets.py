@@ -0,0 +1,63 @@
+import json
+import mimetypes
+import os
+from threading import Lock
+
+# Cache-Control dos arquivos com hash no nome: o conteúdo nunca muda para a mesma URL.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Variantes pré-comprimidas em ordem de preferência: (Content-Encoding, extensão)
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+
+
+class AssetManifest:
+    """Resolve nomes de arquivos estáticos para as versões com hash geradas por scripts/build_assets.py"""
+
+    def __init__(self, static_dir):
+        self.dist_dir = os.path.join(static_dir, 'dist')
+        self.manifest_file = os.path.join(self.dist_dir, 'manifest.json')
+        self.lock = Lock()
+        self.mtime = None
+        self.manifest = {}
+
+    def _reload_if_changed(self):
+        """Recarrega o manifest quando o build é refeito com o servidor no ar"""
+        try:
+            mtime = os.path.getmtime(self.manifest_file)
+        except OSError:
+            mtime = None
+
+        if mtime == self.mtime:
+            return
+
+        with self.lock:
+            if mtime is None:
+                self.manifest = {}
+            else:
+                try:
+                    with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                        self.manifest = json.load(f)
+                except (OSError, ValueError):
+                    self.manifest = {}
+            self.mtime = mtime
+
+    def asset_path(self, filename):
+        """Caminho relativo a /static/ do arquivo; sem build, retorna o próprio nome"""
+        self._reload_if_changed()
+        return self.manifest.get(filename, filename)
+
+    def resolve(self, filename, accept_encoding):
+        """
+        Escolhe o arquivo de dist a servir conforme o Accept-Encoding.
+        Retorna (caminho, content_encoding, mimetype) ou None se não existir.
+        """
+        path = os.path.normpath(os.path.join(self.dist_dir, filename))
+        if not path.startswith(self.dist_dir + os.sep) or not os.path.isfile(path):
+            return None
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+        for encoding, ext in PRECOMPRESSED:
+            if encoding in accepted and os.path.isfile(path + ext):
+                return path + ext, encoding, mimetype
+        return path, None, mimetype
@@ -0,0 +1,257 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from app.config_manager import config_manager
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Resoluções dos agregados: nome -> duração do bucket em segundos (da mais fina à mais grossa)
+RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+
+class RollupRing:
+    """
+    Buffer circular de buckets de uma resolução. Cada posição guarda o id do
+    bucket (timestamp // passo) e os contadores de amostras online, amostras
+    totais e transições; posições de buckets antigos são reaproveitadas, o
+    que aplica a retenção sem limpeza explícita.
+    """
+
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.ids = array('q', [-1]) * size
+        self.up = array('I', [0]) * size
+        self.total = array('I', [0]) * size
+        self.transitions = array('I', [0]) * size
+
+    def add(self, ts, up, transition):
+        bucket = int(ts // self.step)
+        i = bucket % self.size
+        if self.ids[i] != bucket:
+            self.ids[i] = bucket
+            self.up[i] = self.total[i] = self.transitions[i] = 0
+        self.total[i] += 1
+        self.up[i] += up
+        self.transitions[i] += transition
+
+    def sum(self, start_ts, end_ts):
+        """Soma os buckets entre start_ts e end_ts que ainda estão retidos"""
+        first = int(start_ts // self.step)
+        last = int(end_ts // self.step)
+        first = max(first, last - self.size + 1)
+        up = total = transitions = 0
+        for bucket in range(first, last + 1):
+            i = bucket % self.size
+            if self.ids[i] == bucket:
+                up += self.up[i]
+                total += self.total[i]
+                transitions += self.transitions[i]
+        return up, total, transitions
+
+    def copy(self):
+        """Cópia dos buffers (fatias de array, baratas), para serializar fora do lock"""
+        ring = RollupRing.__new__(RollupRing)
+        ring.step, ring.size = self.step, self.size
+        ring.ids, ring.up, ring.total, ring.transitions = self.ids[:], self.up[:], self.total[:], self.transitions[:]
+        return ring
+
+    def to_dict(self):
+        slots = [i for i in range(self.size) if self.ids[i] != -1]
+        return {
+            'ids': [self.ids[i] for i in slots],
+            'up': [self.up[i] for i in slots],
+            'total': [self.total[i] for i in slots],
+            'transitions': [self.transitions[i] for i in slots],
+        }
+
+    def load_dict(self, data):
+        for bucket, up, total, transitions in zip(data['ids'], data['up'], data['total'], data['transitions']):
+            i = bucket % self.size
+            if bucket > self.ids[i]:
+                self.ids[i] = bucket
+                self.up[i] = up
+                self.total[i] = total
+                self.transitions[i] = transitions
+
+
+class AvailabilityTracker:
+    """
+    Agregados de disponibilidade pré-calculados por IP cadastrado e por VLAN,
+    em buckets de minuto, hora e dia, alimentados a cada varredura. Os
+    relatórios somam poucos buckets em vez de reprocessar amostras brutas.
+    """
+
+    def __init__(self):
+        config = config_manager.get_config('availability')
+        self.retention = dict(config.get('retention', {}))
+        self.data_file = config.get('file', 'availability_rollups.json')
+        self.persist_interval = config.get('persist_interval', 300)
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.devices = {}      # ip -> {resolução: RollupRing}
+        self.vlans = {}        # vlan -> {resolução: RollupRing}
+        self.last_status = {}  # ip -> último status ('on'/'off')
+        self.meta = {}         # ip -> {'vlan', 'descricao', 'tipo'}
+        self.last_save = time.time()
+        self.persistent = False  # Só o servidor web lê/grava o arquivo (ver enable_persistence)
+
+    def _new_rings(self):
+        return {name: RollupRing(step, self.retention.get(name, 1)) for name, step in RESOLUTIONS.items()}
+
+    def record_sweep(self, vlan, ip_status_list, ts=None):
+        """Acrescenta uma amostra por dispositivo cadastrado da varredura aos agregados"""
+        if not config_manager.get_config('availability').get('enabled', True):
+            return
+
+        ts = ts or time.time()
+        with self.lock:
+            vlan_rings = self.vlans.setdefault(vlan, self._new_rings())
+            for item in ip_status_list:
+                if item.get('descricao', '-') == '-' or item.get('status') == 'unknown' or item.get('stale'):
+                    continue  # IPs livres da faixa, hosts sem resultado e status repetidos não entram nos relatórios
+
+                ip = item['ip']
+                up = 1 if item.get('status') == 'on' else 0
+                previous = self.last_status.get(ip)
+                transition = 1 if previous is not None and previous != item.get('status') else 0
+                self.last_status[ip] = item.get('status')
+                self.meta[ip] = {'vlan': vlan, 'descricao': item.get('descricao', ''), 'tipo': item.get('tipo', '')}
+
+                rings = self.devices.get(ip)
+                if rings is None:
+                    rings = self.devices[ip] = self._new_rings()
+                for name in RESOLUTIONS:
+                    rings[name].add(ts, up, transition)
+                    vlan_rings[name].add(ts, up, transition)
+
+    @staticmethod
+    def choose_resolution(start_ts, end_ts):
+        """Escolhe a resolução mais grossa que ainda divide o período em pelo menos 2 buckets"""
+        span = end_ts - start_ts
+        chosen = 'minute'
+        for name, step in RESOLUTIONS.items():
+            if span >= 2 * step:
+                chosen = name
+        return chosen
+
+    @staticmethod
+    def _summary(up, total, transitions):
+        return {
+            'uptime_pct': round(100.0 * up / total, 3) if total else None,
+            'up_samples': up,
+            'samples': total,
+            'transitions': transitions,
+        }
+
+    def report(self, vlan, start_ts, end_ts, resolution=None, ip=None):
+        """Disponibilidade da VLAN e de cada dispositivo dela (ou de um IP) no período"""
+        resolution = resolution or self.choose_resolution(start_ts, end_ts)
+        step = RESOLUTIONS[resolution]
+
+        with self.lock:
+            vlan_rings = self.vlans.get(vlan)
+            vlan_summary = self._summary(*vlan_rings[resolution].sum(start_ts, end_ts)) if vlan_rings else self._summary(0, 0, 0)
+
+            devices = []
+            for device_ip, meta in self.meta.items():
+                if meta['vlan'] != vlan or (ip and device_ip != ip):
+                    continue
+                summary = self._summary(*self.devices[device_ip][resolution].sum(start_ts, end_ts))
+                summary.update({'ip': device_ip, 'descricao': meta['descricao'], 'tipo': meta['tipo']})
+                devices.append(summary)
+
+        devices.sort(key=lambda d: (d['uptime_pct'] is None, d['uptime_pct'] if d['uptime_pct'] is not None else 0))
+        return {
+            'vlan': vlan,
+            'resolution': resolution,
+            'from': int(start_ts // step) * step,
+            'to': (int(end_ts // step) + 1) * step,
+            'retention_buckets': self.retention.get(resolution),
+            'vlan_summary': vlan_summary,
+            'devices': devices,
+        }
+
+    def enable_persistence(self):
+        """
+        Carrega o arquivo de agregados e passa a gravá-lo periodicamente e na saída.
+        Chamado só pelo ponto de entrada web, para que outros usos do pacote (CLI,
+        agente) não criem nem sobrescrevam o arquivo do servidor.
+        """
+        if self.persistent:
+            return
+        self._load()
+        self.persistent = True
+        atexit.register(self.save)
+        # Gravação periódica em thread própria: serializar os buffers de todos os
+        # dispositivos não pode atrasar a varredura que chamou record_sweep
+        threading.Thread(target=self._persist_loop, name='availability-persist', daemon=True).start()
+
+    def _persist_loop(self):
+        while True:
+            time.sleep(max(1, self.persist_interval - (time.time() - self.last_save)))
+            if time.time() - self.last_save >= self.persist_interval:
+                self.save()
+
+    def save(self):
+        """Grava os agregados em disco (JSON) para sobreviver a reinícios"""
+        # Sob o lock só se copiam os buffers; a conversão para JSON é feita fora dele
+        with self.lock:
+            devices = {ip: {name: ring.copy() for name, ring in rings.items()} for ip, rings in self.devices.items()}
+            vlans = {vlan: {name: ring.copy() for name, ring in rings.items()} for vlan, rings in self.vlans.items()}
+            meta = dict(self.meta)
+            last_status = dict(self.last_status)
+            self.last_save = time.time()
+        data = {
+            'retention': self.retention,
+            'devices': {ip: {name: ring.to_dict() for name, ring in rings.items()} for ip, rings in devices.items()},
+            'vlans': {str(vlan): {name: ring.to_dict() for name, ring in rings.items()} for vlan, rings in vlans.items()},
+            'meta': meta,
+            'last_status': last_status,
+        }
+        try:
+            with self.save_lock:
+                tmp_file = self.data_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_file, self.data_file)
+            return True
+        except Exception as e:
+            logging.error(f"[AVAILABILITY] Erro ao salvar agregados: {e}")
+            return False
+
+    def _load(self):
+        try:
+            if not os.path.exists(self.data_file):
+                return
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            # Os tamanhos dos buffers seguem a retenção atual; buckets excedentes são descartados
+            for ip, rings_data in data.get('devices', {}).items():
+                rings = self.devices[ip] = self._new_rings()
+                for name, ring_data in rings_data.items():
+                    if name in rings:
+                        rings[name].load_dict(ring_data)
+            for vlan, rings_data in data.get('vlans', {}).items():
+                rings = self.vlans[int(vlan)] = self._new_rings()
+                for name, ring_data in rings_data.items():
+                    if name in rings:
+                        rings[name].load_dict(ring_data)
+            self.meta = data.get('meta', {})
+            self.last_status = data.get('last_status', {})
+            logging.info(f"[AVAILABILITY] Agregados carregados: {len(self.devices)} dispositivos, {len(self.vlans)} VLANs")
+        except Exception as e:
+            logging.error(f"[AVAILABILITY] Erro ao carregar agregados: {e}")
+
+# Instância global dos agregados de disponibilidade
+availability_tracker = AvailabilityTracker()
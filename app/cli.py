@@ -0,0 +1,138 @@
+"""
+Varredura headless pela linha de comando.
+
+Usa o mesmo motor de 'verificar_ips' (ip_operations.varrer_hosts) sem subir
+o servidor web e emite um registro NDJSON por host, na ordem em que os
+resultados chegam, para auditorias ad-hoc e verificações via cron.
+
+Exemplos:
+    ipmonitor-sweep 80 85
+    ipmonitor-sweep 172.17.85.0/28 --method tcp --port 502 --rate 50
+    python -m app.cli 70 --registered-only --timeout 1
+
+Códigos de saída:
+    0 - todos os hosts verificados responderam
+    1 - pelo menos um host não respondeu
+    2 - argumentos inválidos
+"""
+import argparse
+import json
+import sys
+import time
+
+from app import ip_operations
+from app.config_manager import config_manager
+from app.device_manager import device_manager
+
+EXIT_OK = 0
+EXIT_OFFLINE = 1
+EXIT_USAGE = 2
+
+
+def _mapa_dispositivos(ips):
+    """Monta um dicionário IP -> dispositivo cadastrado para as VLANs envolvidas"""
+    vlans = {ip_operations.vlan_do_ip(ip) for ip in ips}
+    device_map = {}
+    for vlan in vlans:
+        if vlan is None:
+            continue
+        for device in device_manager.get_devices_by_vlan(vlan):
+            device_map[device['ip']] = device
+    return device_map
+
+
+def _criar_parser():
+    network_config = config_manager.get_config('network_settings')
+
+    parser = argparse.ArgumentParser(
+        prog='ipmonitor-sweep',
+        description='Varre VLANs ou CIDRs e emite um registro NDJSON por host.'
+    )
+    parser.add_argument('targets', nargs='+',
+                        help="VLANs (ex.: 85), CIDRs (ex.: 172.17.85.0/28) ou IPs")
+    parser.add_argument('-c', '--concurrency', type=int,
+                        default=network_config.get('max_concurrent_pings', 3) * 20,
+                        help='número de sondas simultâneas')
+    parser.add_argument('-t', '--timeout', type=float,
+                        default=network_config.get('ping_timeout', 2),
+                        help='timeout de cada sonda (teto do timeout adaptativo), em segundos')
+    parser.add_argument('-r', '--retries', type=int,
+                        default=network_config.get('retry_attempts', 2),
+                        help='tentativas extras para hosts que não responderam')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='limite de sondas por segundo (padrão: sem limite)')
+    parser.add_argument('-m', '--method', choices=sorted(ip_operations.SONDAS), default='icmp',
+                        help='método de sonda')
+    parser.add_argument('-p', '--port', type=int, default=ip_operations.TCP_PORTA_PADRAO,
+                        help='porta usada pela sonda tcp')
+    parser.add_argument('--no-adaptive', dest='adaptive', action='store_false',
+                        default=network_config.get('adaptive_timeout', True),
+                        help='usa o timeout fixo em todas as sondas (sem RTO adaptativo)')
+    parser.add_argument('--rto-floor', type=float, default=network_config.get('rto_floor', 0.2),
+                        help='menor timeout adaptativo, em segundos')
+    parser.add_argument('--registered-only', action='store_true',
+                        help='verifica apenas os IPs cadastrados em ip_devices.json')
+    return parser
+
+
+def main(argv=None):
+    parser = _criar_parser()
+    args = parser.parse_args(argv)
+
+    if args.concurrency < 1 or args.timeout <= 0 or args.retries < 0 or (args.rate is not None and args.rate <= 0):
+        parser.error('concurrency, timeout, retries e rate devem ser positivos')
+
+    try:
+        alvos = ip_operations.expandir_alvos(args.targets)
+    except ValueError as e:
+        parser.error(str(e))
+
+    alvo_por_ip = dict((ip, alvo) for alvo, ip in alvos)
+    device_map = _mapa_dispositivos(alvo_por_ip)
+    if args.registered_only:
+        alvo_por_ip = {ip: alvo for ip, alvo in alvo_por_ip.items() if ip in device_map}
+
+    inicio = time.monotonic()
+    total = online = unknown = 0
+    for resultado in ip_operations.varrer_hosts(
+            list(alvo_por_ip),
+            probe_method=args.method,
+            timeout=args.timeout,
+            retry_attempts=args.retries,
+            max_workers=args.concurrency,
+            rate=args.rate,
+            tcp_port=args.port,
+            adaptive=args.adaptive,
+            rto_floor=args.rto_floor):
+        device = device_map.get(resultado['ip'], {})
+        registro = {
+            'target': alvo_por_ip[resultado['ip']],
+            'ip': resultado['ip'],
+            'status': resultado['status'],
+            'rtt_ms': resultado['rtt_ms'],
+            'descricao': device.get('descricao', '-'),
+            'tipo': device.get('tipo', ''),
+        }
+        sys.stdout.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+        total += 1
+        if resultado['status'] == 'on':
+            online += 1
+        elif resultado['status'] == 'unknown':
+            unknown += 1
+
+    resumo = {
+        'total': total,
+        'online': online,
+        'offline': total - online - unknown,
+        'unknown': unknown,
+        'elapsed_s': round(time.monotonic() - inicio, 2),
+    }
+    sys.stderr.write(json.dumps(resumo) + '\n')
+
+    return EXIT_OK if online == total else EXIT_OFFLINE
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,15 @@
 import json
 import os
-from threading import Lock
+from threading import RLock
 
 class ConfigManager:
     """Gerenciador de configurações do sistema IP Monitor"""
     
     def __init__(self, config_file='app_config.json'):
         self.config_file = config_file
-        self.config_lock = Lock()
+        # Reentrante: update_section/reset_to_defaults chamam save_config segurando o lock
+        self.config_lock = RLock()
+        self.change_listeners = []  # Chamados (sem argumentos) após cada gravação bem-sucedida
         self.config = self._load_default_config()
         self.load_config()
     
@@ -25,7 +27,14 @@ class ConfigManager:
             "network_settings": {
                 "ping_timeout": 2,
                 "max_concurrent_pings": 3,
-                "retry_attempts": 2
+                "retry_attempts": 2,
+                "adaptive_timeout": True,  # Timeout por host a partir do RTT observado (ping_timeout vira o teto)
+                "rto_floor": 0.2,          # Menor timeout adaptativo, em segundos
+                "sweep_deadline": 30,      # Tempo máximo de cada varredura de VLAN, em segundos (0 = sem limite)
+                "scan_mode": "full",       # 'full' (faixa inteira a cada ciclo) ou 'tiered' (cadastrados + descoberta rotativa)
+                "registered_interval": 10, # Modo 'tiered': segundos entre verificações dos cadastrados (a descoberta segue ping_intervals)
+                "tier_probe_budget": 64,   # Modo 'tiered': sondas por VLAN a cada ciclo (cadastrados + fatia de descoberta)
+                "discovery_min_slice": 8   # Modo 'tiered': menor fatia de descoberta por ciclo
             },
             "ui_settings": {
                 "auto_refresh": True,
@@ -37,7 +46,68 @@ class ConfigManager:
                 "enable_logging": True,
                 "log_level": "INFO",
                 "max_log_entries": 1000,
-                "alert_on_device_down": False
+                "alert_on_device_down": False,
+                "alert_webhook_url": "",
+                "alert_debounce_samples": 3,   # Amostras consecutivas para confirmar mudança de estado
+                "alert_group_window": 30,      # Segundos agrupando transições em um único incidente
+                "alert_batch_size": 500,
+                "alert_max_retries": 5
+            },
+            "admission": {
+                "enabled": True,
+                # Token bucket por cliente (token Bearer ou IP): requisições/s e rajada
+                "rate_limits": {
+                    "external": {"rate": 2, "burst": 20},
+                    "status": {"rate": 5, "burst": 30},
+                    "api": {"rate": 10, "burst": 40},
+                    "rescan": {"rate": 0.2, "burst": 3},
+                    "agents": {"rate": 2, "burst": 20},
+                    "debug": {"rate": 0.05, "burst": 2}
+                },
+                # Requisições simultâneas por classe de rota (o waitress usa 4 threads)
+                "max_in_flight": {
+                    "external": 2,
+                    "status": 2,
+                    "api": 2,
+                    "agents": 2
+                },
+                "queue_timeout": 0.5  # Segundos de espera por vaga antes de responder 503
+            },
+            "agents": {
+                # VLANs varridas por agentes remotos (app/agent.py); o servidor não as varre localmente
+                "remote_vlans": [],
+                # Redes fora de 172.17.x atendidas por agentes: CIDR -> VLAN (ex.: {"127.0.0.0/29": 99} para testes locais)
+                "networks": {},
+                # Ciclos do agente sem nenhum lote até os IPs dele passarem a 'unknown'
+                "stale_after_cycles": 3
+            },
+            "availability": {
+                "enabled": True,
+                # Buckets retidos por resolução: 6 horas de minutos, 90 dias de horas, ~13 meses de dias
+                "retention": {
+                    "minute": 360,
+                    "hour": 2160,
+                    "day": 400
+                },
+                "persist_interval": 300,  # Segundos entre gravações do arquivo de agregados
+                "file": "availability_rollups.json"
+            },
+            "inventory": {
+                "stale_after_days": 14,   # Cadastrados sem resposta há mais que isso entram na conciliação
+                "persist_interval": 300,  # Segundos entre gravações do last_seen
+                "file": "inventory_last_seen.json"
+            },
+            "enrichment": {
+                "enabled": True,
+                "ttl": 3600,               # Segundos de validade de nome/MAC/fabricante no cache
+                "negative_ttl": 300,       # Validade de consultas sem resultado
+                "cache_size": 4096,
+                "queue_size": 2048,
+                "batch_size": 64,
+                "dns_workers": 8,
+                "neighbor_file": "/proc/net/arp",
+                "neighbor_max_age": 30,    # Segundos entre leituras da tabela de vizinhos
+                "oui_file": "oui.txt"      # Base OUI do IEEE (https://standards-oui.ieee.org/oui/oui.txt)
             },
             "vlans": {
                 "active_vlans": [70, 80, 85, 86, 200, 204],
@@ -91,10 +161,15 @@ class ConfigManager:
             with self.config_lock:
                 with open(self.config_file, 'w', encoding='utf-8') as f:
                     json.dump(self.config, f, indent=4, ensure_ascii=False)
-                return True
         except Exception as e:
             print(f"Erro ao salvar configurações: {e}")
             return False
+        for listener in self.change_listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Erro ao notificar alteração de configurações: {e}")
+        return True
     
     def get_config(self, section=None):
         """Obtém configurações (toda ou de uma seção específica)"""
@@ -1,9 +1,10 @@
 import json
 import os
 import logging
-from threading import Lock
+from threading import RLock
 from datetime import datetime
 from app.config_manager import config_manager
+from app.profiling import timings
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,8 +14,11 @@ class IPDeviceManager:
     
     def __init__(self, devices_file='ip_devices.json'):
         self.devices_file = devices_file
-        self.devices_lock = Lock()
+        # Reentrante: add/update/delete chamam _save_devices com o lock já adquirido
+        self.devices_lock = RLock()
         self.devices = self._load_devices()
+        # Funções chamadas a cada edição: listener(vlan, ip, antes, depois), com None quando não existe
+        self.change_listeners = []
     
     def _load_devices(self):
         """Carrega dispositivos do arquivo JSON"""
@@ -79,9 +83,21 @@ class IPDeviceManager:
             print(f"Erro ao salvar dispositivos: {e}")
             return False
     
+    def _notify_change(self, vlan, ip, old, new):
+        for listener in self.change_listeners:
+            try:
+                listener(vlan, ip, old, new)
+            except Exception as e:
+                logging.error(f"[DEVICE_MANAGER] Erro ao notificar alteração de {ip}: {e}")
+    
+    def snapshot(self):
+        """Cópia rasa do cadastro (VLAN -> lista de dispositivos) para montar índices"""
+        with self.devices_lock:
+            return {'vlans': {vlan: list(devices) for vlan, devices in self.devices.get('vlans', {}).items()}}
+    
     def get_devices_by_vlan(self, vlan):
         """Obtém dispositivos de uma VLAN específica"""
-        with self.devices_lock:
+        with timings.timed_lock(self.devices_lock, 'devices.lock_wait'):
             devices = self.devices.get('vlans', {}).get(str(vlan), [])
             logging.info(f"[DEVICE_MANAGER] get_devices_by_vlan({vlan}) - Encontrados {len(devices)} dispositivos")
             dispositivos_com_tipo = [d for d in devices if d.get('tipo') and d['tipo'].strip()]
@@ -119,6 +135,7 @@ class IPDeviceManager:
                 self.devices['vlans'][vlan_str].append(new_device)
                 
                 if self._save_devices():
+                    self._notify_change(vlan, ip, None, new_device)
                     return True, "Dispositivo adicionado com sucesso"
                 else:
                     return False, "Erro ao salvar dispositivo"
@@ -138,6 +155,7 @@ class IPDeviceManager:
                 
                 for device in self.devices['vlans'][vlan_str]:
                     if device['ip'] == ip:
+                        old_device = dict(device)
                         if descricao is not None:
                             device['descricao'] = descricao
                         if tipo is not None:
@@ -145,6 +163,7 @@ class IPDeviceManager:
                         device['updated_at'] = datetime.now().isoformat()
                         
                         if self._save_devices():
+                            self._notify_change(vlan, ip, old_device, device)
                             return True, "Dispositivo atualizado com sucesso"
                         else:
                             return False, "Erro ao salvar alterações"
@@ -170,6 +189,7 @@ class IPDeviceManager:
                         del devices_list[i]
                         
                         if self._save_devices():
+                            self._notify_change(vlan, ip, device, None)
                             return True, "Dispositivo removido com sucesso"
                         else:
                             return False, "Erro ao salvar alterações"
@@ -0,0 +1,224 @@
+import concurrent.futures
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from app.config_manager import config_manager
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Linha do oui.txt do IEEE: "00-1A-2B   (hex)		Fabricante"
+OUI_IEEE_LINE = re.compile(r'^\s*([0-9A-Fa-f]{2}[-:]?[0-9A-Fa-f]{2}[-:]?[0-9A-Fa-f]{2})\s+\(hex\)\s+(.+?)\s*$')
+
+# Linha simplificada: "001A2B,Fabricante" ou "00:1A:2B<tab>Fabricante"
+OUI_SIMPLE_LINE = re.compile(r'^\s*([0-9A-Fa-f]{2}[-:]?[0-9A-Fa-f]{2}[-:]?[0-9A-Fa-f]{2})\s*[,\t]\s*(.+?)\s*$')
+
+
+class TTLCache:
+    """Cache LRU limitado com expiração por entrada; resultados vazios usam um TTL menor (cache negativo)"""
+
+    def __init__(self, maxsize, ttl, negative_ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # chave -> (valor, expira_em)
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Retorna (encontrado, valor)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.stats['misses'] += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return True, entry[0]
+
+    def set(self, key, value, negative=False):
+        ttl = self.negative_ttl if negative else self.ttl
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def load_oui_file(path):
+    """Carrega a base OUI (prefixo de 6 dígitos hex -> fabricante)"""
+    vendors = {}
+    if not path or not os.path.exists(path):
+        return vendors
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = OUI_IEEE_LINE.match(line) or OUI_SIMPLE_LINE.match(line)
+            if match:
+                prefix = re.sub(r'[-:]', '', match.group(1)).upper()
+                vendors[prefix] = match.group(2)
+    return vendors
+
+
+def read_neighbor_table(path):
+    """Lê a tabela de vizinhos no formato de /proc/net/arp (ip -> mac)"""
+    neighbors = {}
+    if not path or not os.path.exists(path):
+        return neighbors
+    with open(path, 'r', encoding='utf-8') as f:
+        next(f, None)  # Cabeçalho
+        for line in f:
+            parts = line.split()
+            if len(parts) < 4:
+                continue
+            ip, flags, mac = parts[0], parts[2], parts[3].lower()
+            # Flag 0x0 indica entrada incompleta (host não respondeu ao ARP)
+            if flags != '0x0' and mac != '00:00:00:00:00:00':
+                neighbors[ip] = mac
+    return neighbors
+
+
+def reverse_dns(ip):
+    """Resolvedor padrão: DNS reverso do sistema"""
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except (socket.herror, socket.gaierror, OSError):
+        return None
+
+
+class EnrichmentService:
+    """
+    Enriquecimento dos resultados da varredura com nome (DNS reverso), MAC
+    (tabela de vizinhos) e fabricante (OUI). Tudo é consultado em lotes por
+    uma thread própria: a varredura apenas lê o cache e enfileira os IPs que
+    faltam, então nunca espera por DNS. Os dados aparecem a partir da
+    varredura seguinte.
+
+    `resolver(ip)` e `neighbor_reader(path)` podem ser trocados por stubs
+    (ver scripts/enrichment_check.py); o padrão é o DNS reverso do sistema e
+    a leitura de /proc/net/arp.
+    """
+
+    def __init__(self, resolver=None, neighbor_reader=None):
+        config = self._config()
+        self.resolver = resolver or reverse_dns
+        self.neighbor_reader = neighbor_reader or read_neighbor_table
+        self.cache = TTLCache(config.get('cache_size', 4096), config.get('ttl', 3600), config.get('negative_ttl', 300))
+        self.pending = queue.Queue(maxsize=config.get('queue_size', 2048))
+        self.queued = set()
+        self.queued_lock = threading.Lock()
+        self.oui = None
+        self.neighbors = {}
+        self.neighbors_read_at = 0
+        self.worker = None
+        self.stats = {'lookups': 0, 'dropped': 0, 'batches': 0}
+
+    def _config(self):
+        return config_manager.get_config('enrichment')
+
+    def _vendor(self, mac):
+        if not mac:
+            return None
+        if self.oui is None:
+            self.oui = load_oui_file(self._config().get('oui_file', 'oui.txt'))
+        return self.oui.get(mac.replace(':', '').upper()[:6])
+
+    def _neighbor_table(self, max_age):
+        """Relê a tabela de vizinhos no máximo uma vez a cada `max_age` segundos"""
+        if time.monotonic() - self.neighbors_read_at >= max_age:
+            try:
+                self.neighbors = self.neighbor_reader(self._config().get('neighbor_file', '/proc/net/arp'))
+            except Exception as e:
+                logging.warning(f"[ENRICHMENT] Erro ao ler tabela de vizinhos: {e}")
+                self.neighbors = {}
+            self.neighbors_read_at = time.monotonic()
+        return self.neighbors
+
+    def enrich(self, ip_status_list):
+        """Anexa os dados em cache aos hosts online e agenda a consulta dos que faltam (não bloqueia)"""
+        if not self._config().get('enabled', True):
+            return ip_status_list
+
+        for item in ip_status_list:
+            if item.get('status') != 'on':
+                continue
+            found, info = self.cache.get(item['ip'])
+            if found:
+                item.update(info)
+            else:
+                self.submit(item['ip'])
+        return ip_status_list
+
+    def submit(self, ip):
+        """Enfileira um IP para consulta; com a fila cheia o IP é descartado até a próxima varredura"""
+        with self.queued_lock:
+            if ip in self.queued:
+                return
+            try:
+                self.pending.put_nowait(ip)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                return
+            self.queued.add(ip)
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._worker_loop, name='enrichment', daemon=True)
+            self.worker.start()
+
+    def _worker_loop(self):
+        while True:
+            batch = [self.pending.get()]
+            batch_size = self._config().get('batch_size', 64)
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.lookup_batch(batch)
+            except Exception as e:
+                logging.error(f"[ENRICHMENT] Erro ao enriquecer lote: {e}")
+            finally:
+                with self.queued_lock:
+                    self.queued.difference_update(batch)
+
+    def lookup_batch(self, ips):
+        """Resolve um lote de IPs (DNS em paralelo, MAC e fabricante localmente) e grava no cache"""
+        config = self._config()
+        neighbors = self._neighbor_table(config.get('neighbor_max_age', 30))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config.get('dns_workers', 8), thread_name_prefix='enrichment-dns') as executor:
+            hostnames = dict(zip(ips, executor.map(self.resolver, ips)))
+
+        results = {}
+        for ip in ips:
+            mac = neighbors.get(ip)
+            info = {'hostname': hostnames.get(ip), 'mac': mac, 'vendor': self._vendor(mac)}
+            self.cache.set(ip, info, negative=not any(info.values()))
+            results[ip] = info
+
+        self.stats['lookups'] += len(ips)
+        self.stats['batches'] += 1
+        return results
+
+    def get_status(self):
+        status = dict(self.stats)
+        status.update(self.cache.stats)
+        status['cached'] = len(self.cache)
+        status['pending'] = self.pending.qsize()
+        return status
+
+# Instância global do enriquecimento de resultados
+enrichment_service = EnrichmentService()
@@ -0,0 +1,151 @@
+import logging
+import threading
+from app.device_manager import device_manager
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def type_key(tipo):
+    """Chave normalizada do tipo ('UPS', 'ups ' e 'Ups' caem na mesma faceta)"""
+    return (tipo or '').strip().casefold()
+
+
+class FacetIndex:
+    """
+    Índice facetado tipo -> dispositivos, cruzando todas as VLANs, com as
+    contagens de cadastrados e online por tipo e por VLAN. As contagens são
+    ajustadas a cada edição de dispositivo e a cada transição de status vista
+    nas varreduras, então a consulta de um tipo não percorre os dispositivos.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.devices = {}     # ip -> (vlan, chave do tipo)
+        self.status = {}      # ip -> último status varrido ('on'/'off'), cadastrado ou não
+        self.facets = {}      # chave do tipo -> faceta (contagens e IPs)
+        self.vlan_hosts = {}  # vlan -> {'scanned', 'online'} da última varredura
+        self.totals = {'registered': 0, 'registered_online': 0}
+
+    def _facet(self, key, tipo):
+        facet = self.facets.get(key)
+        if facet is None:
+            facet = self.facets[key] = {'tipo': (tipo or '').strip(), 'registered': 0, 'online': 0, 'vlans': {}, 'ips': set()}
+        return facet
+
+    def _count(self, vlan, key, field, delta):
+        facet = self.facets[key]
+        facet[field] += delta
+        vlan_counts = facet['vlans'].setdefault(vlan, {'registered': 0, 'online': 0})
+        vlan_counts[field] += delta
+        self.totals['registered_online' if field == 'online' else 'registered'] += delta
+
+    def _add_device(self, vlan, ip, tipo):
+        key = type_key(tipo)
+        facet = self._facet(key, tipo)
+        facet['tipo'] = (tipo or '').strip()  # Mantém a grafia mais recente
+        facet['ips'].add(ip)
+        self.devices[ip] = (vlan, key)
+        self._count(vlan, key, 'registered', 1)
+        if self.status.get(ip) == 'on':
+            self._count(vlan, key, 'online', 1)
+
+    def _remove_device(self, ip):
+        vlan, key = self.devices.pop(ip)
+        facet = self.facets[key]
+        facet['ips'].discard(ip)
+        self._count(vlan, key, 'registered', -1)
+        if self.status.get(ip) == 'on':
+            self._count(vlan, key, 'online', -1)
+        if not facet['ips']:
+            del self.facets[key]
+
+    def rebuild(self, devices_data):
+        """Monta o índice a partir do conteúdo de ip_devices.json (usado só na carga)"""
+        with self.lock:
+            self.devices.clear()
+            self.facets.clear()
+            self.totals = {'registered': 0, 'registered_online': 0}
+            for vlan, devices in devices_data.get('vlans', {}).items():
+                for device in devices:
+                    if device.get('ip') and device['ip'] not in self.devices:
+                        self._add_device(int(vlan), device['ip'], device.get('tipo', ''))
+
+    def device_changed(self, vlan, ip, old, new):
+        """Listener do device_manager: `old`/`new` são o dispositivo antes e depois (None se não existe)"""
+        with self.lock:
+            if old is not None and ip in self.devices:
+                self._remove_device(ip)
+            if new is not None:
+                self._add_device(int(vlan), ip, new.get('tipo', ''))
+
+    def record_sweep(self, vlan, ip_status_list):
+        """Aplica as transições de status de uma varredura da VLAN"""
+        online = 0
+        with self.lock:
+            for item in ip_status_list:
+                ip = item['ip']
+                status = item.get('status')
+                if status == 'on':
+                    online += 1
+                elif status == 'unknown':
+                    continue  # Sem resultado nesta varredura: mantém o último status conhecido
+                previous = self.status.get(ip)
+                if previous == status:
+                    continue
+                self.status[ip] = status
+
+                device = self.devices.get(ip)
+                if device is not None and (status == 'on') != (previous == 'on'):
+                    self._count(device[0], device[1], 'online', 1 if status == 'on' else -1)
+
+            self.vlan_hosts[vlan] = {'scanned': len(ip_status_list), 'online': online}
+
+    @staticmethod
+    def _facet_view(facet, vlan=None, include_devices=False):
+        counts = facet['vlans'].get(vlan, {'registered': 0, 'online': 0}) if vlan is not None else facet
+        view = {
+            'tipo': facet['tipo'],
+            'registered': counts['registered'],
+            'online': counts['online'],
+            'offline': counts['registered'] - counts['online'],
+        }
+        if vlan is None:
+            view['vlans'] = {str(v): dict(c) for v, c in sorted(facet['vlans'].items()) if c['registered']}
+        if include_devices:
+            view['devices'] = sorted(facet['ips'])
+        return view
+
+    def query(self, tipo=None, vlan=None, include_devices=False):
+        """
+        Retorna as facetas (todas, ou só a do `tipo`) e os totais. Com `vlan`
+        as contagens são as daquela VLAN. Lança KeyError se o tipo não existir.
+        """
+        with self.lock:
+            if tipo is not None:
+                facets = [self.facets[type_key(tipo)]]
+            else:
+                facets = sorted(self.facets.values(), key=lambda f: f['tipo'].casefold())
+
+            if include_devices and vlan is not None:
+                # Restringe a lista de IPs à VLAN pedida
+                facets = [dict(f, ips={ip for ip in f['ips'] if self.devices[ip][0] == vlan}) for f in facets]
+
+            views = [self._facet_view(f, vlan, include_devices) for f in facets]
+            if vlan is not None:
+                views = [v for v in views if v['registered']]
+
+            hosts = [self.vlan_hosts.get(vlan, {'scanned': 0, 'online': 0})] if vlan is not None else self.vlan_hosts.values()
+            totals = dict(self.totals) if vlan is None else {
+                'registered': sum(v['registered'] for v in views),
+                'registered_online': sum(v['online'] for v in views),
+            }
+            totals['scanned'] = sum(h['scanned'] for h in hosts)
+            totals['online'] = sum(h['online'] for h in hosts)
+
+        return {'totals': totals, 'facets': views}
+
+# Instância global do índice por tipo, alimentada pelas edições de dispositivos
+facet_index = FacetIndex()
+facet_index.rebuild(device_manager.snapshot())
+device_manager.change_listeners.append(facet_index.device_changed)
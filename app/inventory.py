@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from app.config_manager import config_manager
+from app.device_manager import device_manager
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class InventoryReconciler:
+    """
+    Conciliação do inventário por VLAN, mantida de forma incremental:
+
+    - online não cadastrados: hosts que respondem e não estão em ip_devices.json;
+    - cadastrados sem resposta: dispositivos que não estão online, com o
+      instante em que responderam pela última vez (last_seen).
+
+    Os dois conjuntos mudam só nas transições de status das varreduras e nas
+    edições de dispositivos, então a consulta não cruza a faixa inteira com o
+    cadastro. O filtro "não visto desde T" percorre apenas os cadastrados sem
+    resposta. O last_seen é gravado em disco para valer entre reinícios.
+    """
+
+    def __init__(self):
+        config = config_manager.get_config('inventory')
+        self.data_file = config.get('file', 'inventory_last_seen.json')
+        self.persist_interval = config.get('persist_interval', 300)
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.devices = {}              # ip cadastrado -> (vlan, descrição, tipo)
+        self.registered = {}           # vlan -> IPs cadastrados
+        self.online = {}               # vlan -> IPs online na última varredura
+        self.unregistered_online = {}  # vlan -> online - cadastrados
+        self.registered_offline = {}   # vlan -> cadastrados - online
+        self.swept = set()             # VLANs com pelo menos uma varredura
+        self.last_seen = {}            # ip -> timestamp da última resposta
+        self.tracking_since = time.time()
+        self.last_save = time.time()
+        self.persistent = False  # Só o servidor web lê/grava o arquivo (ver enable_persistence)
+
+    def _add_device(self, vlan, ip, device):
+        self.devices[ip] = (vlan, device.get('descricao', ''), device.get('tipo', ''))
+        self.registered.setdefault(vlan, set()).add(ip)
+        if ip in self.online.get(vlan, ()):
+            self.unregistered_online[vlan].discard(ip)
+        else:
+            self.registered_offline.setdefault(vlan, set()).add(ip)
+
+    def _remove_device(self, ip):
+        vlan = self.devices.pop(ip)[0]
+        self.registered[vlan].discard(ip)
+        self.registered_offline.get(vlan, set()).discard(ip)
+        if ip in self.online.get(vlan, ()):
+            self.unregistered_online.setdefault(vlan, set()).add(ip)
+
+    def rebuild(self, devices_data):
+        """Monta o cadastro a partir do conteúdo de ip_devices.json (usado só na carga)"""
+        with self.lock:
+            self.devices.clear()
+            self.registered.clear()
+            self.registered_offline.clear()
+            self.unregistered_online = {vlan: set(ips) for vlan, ips in self.online.items()}
+            for vlan, devices in devices_data.get('vlans', {}).items():
+                for device in devices:
+                    if device.get('ip') and device['ip'] not in self.devices:
+                        self._add_device(int(vlan), device['ip'], device)
+
+    def device_changed(self, vlan, ip, old, new):
+        """Listener do device_manager: `old`/`new` são o dispositivo antes e depois (None se não existe)"""
+        with self.lock:
+            if old is not None and ip in self.devices:
+                self._remove_device(ip)
+            if new is not None:
+                self._add_device(int(vlan), ip, new)
+
+    def record_sweep(self, vlan, ip_status_list, ts=None):
+        """Aplica as transições de status de uma varredura da VLAN"""
+        ts = ts or time.time()
+        with self.lock:
+            online = self.online.setdefault(vlan, set())
+            registered = self.registered.setdefault(vlan, set())
+            unregistered_online = self.unregistered_online.setdefault(vlan, set())
+            registered_offline = self.registered_offline.setdefault(vlan, set())
+            for item in ip_status_list:
+                if item.get('stale'):
+                    continue  # Não sondado neste ciclo (modo em camadas): não renova o last_seen
+                status = item.get('status')
+                ip = item['ip']
+                if status == 'on':
+                    self.last_seen[ip] = ts
+                    if ip in online:
+                        continue
+                    online.add(ip)
+                    if ip in registered:
+                        registered_offline.discard(ip)
+                    else:
+                        unregistered_online.add(ip)
+                elif status == 'off' and ip in online:
+                    online.discard(ip)
+                    if ip in registered:
+                        registered_offline.add(ip)
+                    else:
+                        unregistered_online.discard(ip)
+                # 'unknown': sem resultado nesta varredura, mantém o último status conhecido
+            self.swept.add(vlan)
+
+    def query(self, vlan=None, days=None):
+        """
+        Retorna, por VLAN já varrida, os online não cadastrados e os cadastrados
+        sem resposta há pelo menos `days` dias (padrão: stale_after_days).
+        Cadastrados que nunca responderam saem com last_seen None.
+        """
+        if days is None:
+            days = config_manager.get_config('inventory').get('stale_after_days', 14)
+        cutoff = time.time() - days * 86400
+
+        with self.lock:
+            vlans = [vlan] if vlan is not None else sorted(self.swept)
+            result = {}
+            for v in vlans:
+                if v not in self.swept:
+                    continue
+                unregistered = [{'ip': ip, 'last_seen': self.last_seen.get(ip)}
+                                for ip in self.unregistered_online.get(v, ())]
+                stale = []
+                for ip in self.registered_offline.get(v, ()):
+                    seen = self.last_seen.get(ip)
+                    if seen is None or seen <= cutoff:
+                        _, descricao, tipo = self.devices[ip]
+                        stale.append({'ip': ip, 'descricao': descricao, 'tipo': tipo, 'last_seen': seen})
+                result[str(v)] = {
+                    'registered': len(self.registered.get(v, ())),
+                    'unregistered_online': sorted(unregistered, key=lambda d: tuple(map(int, d['ip'].split('.')))),
+                    'stale_registered': sorted(stale, key=lambda d: (d['last_seen'] or 0, tuple(map(int, d['ip'].split('.'))))),
+                }
+            tracking_since = self.tracking_since
+
+        return {'days': days, 'tracking_since': tracking_since, 'vlans': result}
+
+    def enable_persistence(self):
+        """Carrega o last_seen gravado e passa a gravá-lo periodicamente e na saída (só no servidor web)"""
+        if self.persistent:
+            return
+        self._load()
+        self.persistent = True
+        atexit.register(self.save)
+        # Gravação periódica em thread própria, fora das threads de varredura
+        threading.Thread(target=self._persist_loop, name='inventory-persist', daemon=True).start()
+
+    def _persist_loop(self):
+        while True:
+            time.sleep(max(1, self.persist_interval - (time.time() - self.last_save)))
+            if time.time() - self.last_save >= self.persist_interval:
+                self.save()
+
+    def save(self):
+        """Grava o last_seen em disco (JSON) para sobreviver a reinícios"""
+        with self.lock:
+            data = {'tracking_since': self.tracking_since, 'last_seen': dict(self.last_seen)}
+            self.last_save = time.time()
+        try:
+            with self.save_lock:
+                tmp_file = self.data_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_file, self.data_file)
+            return True
+        except Exception as e:
+            logging.error(f"[INVENTORY] Erro ao salvar last_seen: {e}")
+            return False
+
+    def _load(self):
+        try:
+            if not os.path.exists(self.data_file):
+                return
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self.lock:
+                self.tracking_since = min(self.tracking_since, data.get('tracking_since', self.tracking_since))
+                # Respostas vistas antes da carga são mais recentes que as do arquivo
+                self.last_seen = dict(data.get('last_seen', {}), **self.last_seen)
+            logging.info(f"[INVENTORY] last_seen carregado: {len(self.last_seen)} IPs")
+        except Exception as e:
+            logging.error(f"[INVENTORY] Erro ao carregar last_seen: {e}")
+
+# Instância global da conciliação do inventário, alimentada pelas edições de dispositivos
+inventory_reconciler = InventoryReconciler()
+inventory_reconciler.rebuild(device_manager.snapshot())
+device_manager.change_listeners.append(inventory_reconciler.device_changed)
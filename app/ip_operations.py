@@ -1,21 +1,303 @@
 import concurrent.futures  # Importa o módulo para execução paralela de tarefas.
 from ping3 import ping  # Importa a função ping do módulo ping3 para verificar conectividade com IPs.
 from collections import deque  # Importa deque, uma estrutura de dados de fila, que será usada para o histórico de status dos IPs.
+import ipaddress  # Importa ipaddress para expandir CIDRs em listas de hosts.
 import json  # Importa o módulo JSON para manipulação de arquivos JSON.
 import logging  # Importa logging para diagnóstico
+import socket  # Importa socket para a sonda TCP (connect).
+import threading  # Importa threading para o limitador de taxa compartilhado entre workers.
+import time  # Importa time para medir RTT e espaçar as sondas.
 from app.config_manager import config_manager  # Importa o gerenciador de configurações.
 from app.device_manager import device_manager  # Importa o gerenciador de dispositivos.
+from app.enrichment import enrichment_service  # Importa o enriquecimento (DNS reverso, MAC e fabricante).
+from app.profiling import timings  # Importa os tempos por fase (spans).
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Prefixo das redes monitoradas: a VLAN N corresponde à rede 172.17.N.0/24.
+REDE_PREFIXO = '172.17.'
+
+# Porta padrão usada pela sonda TCP quando nenhuma é informada.
+TCP_PORTA_PADRAO = 80
+
+
+def rede_base_da_vlan(vlan):
+    """Retorna a rede base (ex.: '172.17.85.') de uma VLAN"""
+    return REDE_PREFIXO + str(vlan) + '.'
+
+
+def expandir_alvos(alvos):
+    """
+    Expande uma lista de alvos em IPs.
+
+    Cada alvo pode ser um número de VLAN ('85'), um CIDR ('172.17.85.0/28')
+    ou um IP isolado. Retorna uma lista de tuplas (alvo, ip) preservando a
+    ordem e sem repetir IPs. Lança ValueError para alvos inválidos.
+    """
+    vistos = set()
+    resultado = []
+    for alvo in alvos:
+        alvo = str(alvo).strip()
+        if alvo.isdigit():
+            ips = [rede_base_da_vlan(alvo) + str(i) for i in range(1, 255)]
+        elif '/' in alvo:
+            rede = ipaddress.ip_network(alvo, strict=False)
+            ips = [str(host) for host in rede.hosts()] or [str(rede.network_address)]
+        else:
+            ips = [str(ipaddress.ip_address(alvo))]
+        for ip in ips:
+            if ip not in vistos:
+                vistos.add(ip)
+                resultado.append((alvo, ip))
+    return resultado
+
+
+def vlan_do_ip(ip):
+    """Retorna a VLAN (terceiro octeto) de um IP da rede monitorada, ou None"""
+    if not ip.startswith(REDE_PREFIXO):
+        return None
+    try:
+        return int(ip.split('.')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+# Sondas disponíveis. Cada sonda recebe (ip, timeout) e retorna o RTT em
+# segundos quando o host responde, ou None quando não responde.
+def sonda_icmp(ip, timeout):
+    """Sonda ICMP echo (ping3)"""
+    rtt = ping(ip, timeout=timeout)
+    return rtt if rtt else None
+
+
+def sonda_tcp(ip, timeout, porta=TCP_PORTA_PADRAO):
+    """Sonda TCP connect: conexão aceita ou recusada (RST) indicam host ativo"""
+    inicio = time.monotonic()
+    try:
+        with socket.create_connection((ip, porta), timeout=timeout):
+            pass
+    except ConnectionRefusedError:
+        pass  # O host respondeu com RST, portanto está ativo.
+    except OSError:
+        return None
+    return time.monotonic() - inicio
+
+
+SONDAS = {
+    'icmp': sonda_icmp,
+    'tcp': sonda_tcp,
+}
+
+
+class LimitadorTaxa:
+    """Espaça o envio de sondas para no máximo `taxa` por segundo entre todos os workers"""
+
+    def __init__(self, taxa):
+        self.intervalo = 1.0 / taxa if taxa else 0
+        self.lock = threading.Lock()
+        self.proximo = time.monotonic()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self.lock:
+            agora = time.monotonic()
+            espera = self.proximo - agora
+            self.proximo = max(agora, self.proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+class EstimadorRTT:
+    """
+    Estimativa de RTT por host no estilo do RTO do TCP (RFC 6298):
+    SRTT e RTTVAR suavizados a cada resposta e RTO = SRTT + 4 * RTTVAR,
+    limitado entre um piso e um teto.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}  # ip -> [srtt, rttvar]
+
+    def registrar(self, ip, rtt):
+        with self.lock:
+            estado = self.hosts.get(ip)
+            if estado is None:
+                self.hosts[ip] = [rtt, rtt / 2]
+            else:
+                srtt, rttvar = estado
+                estado[1] = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+                estado[0] = 0.875 * srtt + 0.125 * rtt
+
+    def rto(self, ip):
+        """RTO do host, ou None se ele nunca respondeu"""
+        with self.lock:
+            estado = self.hosts.get(ip)
+        return estado[0] + 4 * estado[1] if estado else None
+
+    def rto_rede(self, ip_list):
+        """Maior RTO entre os hosts conhecidos da lista (o host vivo mais lento), ou None"""
+        with self.lock:
+            rtos = [e[0] + 4 * e[1] for e in (self.hosts.get(ip) for ip in ip_list) if e]
+        return max(rtos) if rtos else None
+
+# Estimativas compartilhadas entre as varreduras
+estimador_rtt = EstimadorRTT()
+
+
+def opcoes_da_config():
+    """Parâmetros de varredura (argumentos de varrer_hosts) a partir de network_settings"""
+    network_config = config_manager.get_config('network_settings')
+    return {
+        'timeout': network_config.get('ping_timeout', 2),
+        'retry_attempts': network_config.get('retry_attempts', 2),
+        'max_workers': network_config.get('max_concurrent_pings', 3) * 20,  # Multiplica para ter mais threads para IPs
+        'adaptive': network_config.get('adaptive_timeout', True),
+        'rto_floor': network_config.get('rto_floor', 0.2),
+    }
+
+
+def prazo_da_config():
+    """Prazo (time.monotonic) para uma varredura que começa agora, ou None se sweep_deadline for 0"""
+    orcamento = config_manager.get_config('network_settings').get('sweep_deadline', 30)
+    return time.monotonic() + orcamento if orcamento else None
+
+
+def varrer_hosts(ip_list, probe_method='icmp', timeout=2, retry_attempts=2, max_workers=60, rate=None, tcp_port=None,
+                 adaptive=True, rto_floor=0.2, deadline=None, cancel=None):
+    """
+    Motor de varredura: sonda os IPs em paralelo e produz (yield) um resultado
+    por host assim que ele fica pronto, no formato
+    {'ip': ..., 'status': 'on'|'off', 'rtt_ms': float|None}.
+
+    `rate` limita o total de sondas por segundo (None = sem limite) e
+    `probe_method` escolhe a sonda em SONDAS.
+
+    Com `adaptive`, o timeout de cada host é o seu RTO estimado (hosts sem
+    histórico usam o RTO do host conhecido mais lento da lista), entre
+    `rto_floor` e `timeout`. As retentativas não são feitas em sequência por
+    host: cada passada extra sonda apenas quem não respondeu, com o RTO dobrado.
+
+    `deadline` (instante de time.monotonic) e `cancel` (threading.Event)
+    interrompem a varredura: nenhuma sonda nova é enviada, as que estão em
+    andamento terminam em até um timeout (que também é cortado no prazo) e
+    os hosts sem resultado definitivo saem com status 'unknown'.
+    """
+    if probe_method not in SONDAS:
+        raise ValueError(f"Método de sonda desconhecido: {probe_method}")
+    sonda = SONDAS[probe_method]
+    if probe_method == 'tcp' and tcp_port:
+        sonda = lambda ip, t: sonda_tcp(ip, t, porta=tcp_port)
+    limitador = LimitadorTaxa(rate)
+    rto_floor = min(rto_floor, timeout)
+
+    # Timeout de um host na passada `tentativa` (0 = primeira)
+    def limite(ip, rto_rede, tentativa):
+        if not adaptive:
+            return timeout
+        rto = estimador_rtt.rto(ip) or rto_rede or timeout
+        return min(timeout, max(rto_floor, rto) * (2 ** tentativa))
+
+    def interrompida():
+        return (cancel is not None and cancel.is_set()) or (deadline is not None and time.monotonic() >= deadline)
+
+    # Função auxiliar que sonda um IP uma única vez. Retorna (ip, rtt, sondado).
+    def verificar_ip(ip, limite_ip):
+        limitador.aguardar()
+        if interrompida():
+            return ip, None, False
+        if deadline is not None:
+            limite_ip = min(limite_ip, deadline - time.monotonic())
+        rtt = sonda(ip, limite_ip)
+        if rtt is not None:
+            estimador_rtt.registrar(ip, rtt)
+        return ip, rtt, True
+
+    pendentes = list(ip_list)
+    sem_resultado = []  # Hosts cuja sonda não chegou a ser enviada por causa da interrupção
+    concluida = False   # Se a última passada chegou a rodar
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='probe') as executor:
+        for tentativa in range(retry_attempts + 1):
+            if not pendentes or interrompida():
+                break
+            rto_rede = estimador_rtt.rto_rede(ip_list) if adaptive else None
+
+            # Entrega os hosts que responderam na ordem em que terminam; os demais vão para a próxima passada.
+            futures = [executor.submit(verificar_ip, ip, limite(ip, rto_rede, tentativa)) for ip in pendentes]
+            pendentes = []
+            for future in concurrent.futures.as_completed(futures):
+                ip, rtt, sondado = future.result()
+                if rtt is not None:
+                    yield {'ip': ip, 'status': 'on', 'rtt_ms': round(rtt * 1000, 2)}
+                elif sondado:
+                    pendentes.append(ip)
+                else:
+                    sem_resultado.append(ip)
+            concluida = tentativa == retry_attempts
+
+    # Quem não respondeu em todas as passadas está offline; se a varredura foi
+    # interrompida antes da última passada, o resultado desses hosts é desconhecido.
+    status_pendentes = 'off' if not pendentes or concluida else 'unknown'
+    for ip in pendentes:
+        yield {'ip': ip, 'status': status_pendentes, 'rtt_ms': None}
+    for ip in sem_resultado:
+        yield {'ip': ip, 'status': 'unknown', 'rtt_ms': None}
+
+
+class DescobertaRotativa:
+    """
+    Seleção de alvos do modo em camadas (scan_mode 'tiered'): os IPs
+    cadastrados são sondados em todo ciclo (a cada registered_interval) e o
+    restante da faixa é coberto aos poucos, uma fatia a cada intervalo da
+    VLAN em ping_intervals, de forma que cadastrados + fatia caibam no
+    orçamento de sondas por VLAN (tier_probe_budget).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursores = {}  # rede_base -> posição da próxima fatia de descoberta
+        self.ultima = {}    # rede_base -> time.monotonic() da última fatia de descoberta
+        self.avisos = {}    # rede_base -> nº de cadastrados já avisado acima do orçamento
+
+    def alvos(self, rede_base, ip_list, registrados, intervalo_descoberta):
+        """Retorna (cadastrados, fatia de descoberta) para este ciclo; a fatia vem vazia fora da vez"""
+        network_config = config_manager.get_config('network_settings')
+        orcamento = network_config.get('tier_probe_budget', 64)
+        fatia_minima = network_config.get('discovery_min_slice', 8)
+
+        criticos = [ip for ip in ip_list if ip in registrados]
+        livres = [ip for ip in ip_list if ip not in registrados]
+        agora = time.monotonic()
+        with self.lock:
+            if len(criticos) > orcamento and self.avisos.get(rede_base) != len(criticos):
+                # Os cadastrados continuam todos sondados a cada ciclo; o orçamento é que não basta
+                logging.warning(f"[IP_OPERATIONS] {rede_base}0: {len(criticos)} cadastrados excedem tier_probe_budget "
+                                f"({orcamento}); todos continuam sendo sondados, aumente o orçamento")
+                self.avisos[rede_base] = len(criticos)
+
+            if agora - self.ultima.get(rede_base, float('-inf')) < intervalo_descoberta:
+                return criticos, []
+            self.ultima[rede_base] = agora
+            fatia = min(len(livres), max(fatia_minima, orcamento - len(criticos)))
+            inicio = self.cursores.get(rede_base, 0) % len(livres) if livres else 0
+            self.cursores[rede_base] = inicio + fatia
+        descoberta = (livres[inicio:] + livres[:inicio])[:fatia]
+        return criticos, descoberta
+
+# Posição da descoberta de cada VLAN, mantida entre os ciclos
+descoberta_rotativa = DescobertaRotativa()
+
+
 # Função principal que verifica os IPs em uma determinada rede base.
-def verificar_ips(rede_base: str):
+# `deadline` e `cancel` são repassados a varrer_hosts; hosts sem resultado saem como 'unknown'.
+# `anterior` é o resultado da varredura anterior da VLAN, usado pelo modo em camadas.
+def verificar_ips(rede_base: str, deadline=None, cancel=None, anterior=None):
     # Obtém configurações atuais do sistema
-    network_config = config_manager.get_config('network_settings')
-    ping_timeout = network_config.get('ping_timeout', 2)
-    max_workers = network_config.get('max_concurrent_pings', 3) * 20  # Multiplica para ter mais threads para IPs
-    retry_attempts = network_config.get('retry_attempts', 2)
+    opcoes = opcoes_da_config()
+    ping_timeout = opcoes['timeout']
+    max_workers = opcoes['max_workers']
+    retry_attempts = opcoes['retry_attempts']
     
     # Cria uma lista de IPs na rede base, variando de 1 a 254.
     ip_list = [rede_base + str(i) for i in range(1, 255)]
@@ -35,78 +317,98 @@ def verificar_ips(rede_base: str):
     # Outro dicionário para armazenar o status final ("on" ou "off") de cada IP após a verificação.
     ip_checked = {ip: "on" for ip in ip_list}
 
-    # Função auxiliar que verifica o status de um IP (ping).
-    def verificar_ip(ip):
-        # Tenta pingar o IP com configurações dinâmicas
-        success = False
-        
-        # Implementa retry attempts
-        for attempt in range(retry_attempts + 1):
-            if ping(ip, timeout=ping_timeout): 
-                success = True
-                break
-        
-        if success:
-            ip_status_dict[ip].append("on")
-        else:
-            ip_status_dict[ip].append("off")
-
-    # Usa um executor de pool de threads para verificar os IPs simultaneamente (concorrência).
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        executor.map(verificar_ip, ip_list)  # Aplica a função verificar_ip para cada IP da lista.
-
-    # Após a verificação, atualiza o status final de cada IP.
-    for ip in ip_list:
-        # Se não houve nenhum "on" no histórico, marca o IP como "off". Caso contrário, "on".
-        if ip_status_dict[ip].count("on") == 0:
-            ip_checked[ip] = "off"
-        else:
-            ip_checked[ip] = "on"
-
     # Extrai o número da VLAN da rede base (assumindo que está no terceiro octeto do IP).
     vlan = rede_base.split('.')[2]
     
     logging.info(f"[IP_OPERATIONS] Processando VLAN {vlan}")
     
     # Obtém a lista de dispositivos da VLAN usando o device_manager
-    vlan_devices = device_manager.get_devices_by_vlan(int(vlan))
+    with timings.span('sweep.devices'):
+        vlan_devices = device_manager.get_devices_by_vlan(int(vlan))
     
     logging.info(f"[IP_OPERATIONS] Dispositivos encontrados na VLAN {vlan}: {len(vlan_devices)}")
     if vlan_devices:
         for device in vlan_devices[:3]:  # Log apenas os primeiros 3 para não poluir
             logging.info(f"[IP_OPERATIONS] Dispositivo: IP={device.get('ip')}, Desc={device.get('descricao')}, Tipo={device.get('tipo', 'VAZIO')}")
                 
+    # No modo em camadas, sonda os cadastrados e uma fatia do restante da faixa; os
+    # demais IPs repetem o status da varredura anterior (`anterior`), marcados com
+    # 'stale' para que disponibilidade, inventário e alertas não os contem como amostra.
+    alvos = ip_list
+    status_anterior = {}
+    if config_manager.get_config('network_settings').get('scan_mode') == 'tiered' and anterior:
+        status_anterior = {item['ip']: item['status'] for item in anterior}
+        criticos, descoberta = descoberta_rotativa.alvos(rede_base, ip_list, {d['ip'] for d in vlan_devices},
+                                                         config_manager.get_ping_interval(int(vlan)))
+        alvos = criticos + descoberta
+        logging.info(f"[IP_OPERATIONS] Modo em camadas: {len(criticos)} cadastrados + {len(descoberta)} IPs de descoberta")
+    sondados = set(alvos)
+
+    # Usa o motor de varredura para verificar os IPs simultaneamente (concorrência).
+    desconhecidos = set()
+    with timings.span('sweep.probe'):
+        for resultado in varrer_hosts(alvos, deadline=deadline, cancel=cancel, **opcoes):
+            if resultado['status'] == 'unknown':
+                desconhecidos.add(resultado['ip'])
+            else:
+                ip_status_dict[resultado['ip']].append(resultado['status'])
+
+    if desconhecidos:
+        logging.warning(f"[IP_OPERATIONS] Varredura de {rede_base}0 interrompida: {len(desconhecidos)} IPs sem resultado")
+
+    # Após a verificação, atualiza o status final de cada IP.
+    for ip in ip_list:
+        # Se não houve nenhum "on" no histórico, marca o IP como "off". Caso contrário, "on".
+        if ip not in sondados:
+            ip_checked[ip] = status_anterior.get(ip, "unknown")
+        elif ip in desconhecidos:
+            ip_checked[ip] = "unknown"
+        elif ip_status_dict[ip].count("on") == 0:
+            ip_checked[ip] = "off"
+        else:
+            ip_checked[ip] = "on"
+
     # Cria uma lista de dicionários com o status de cada IP (IP e se está "on" ou "off").
     ip_status_list = [{"ip": ip, "status": status} for ip, status in ip_checked.items()]
+    for item in ip_status_list:
+        if item['ip'] not in sondados:
+            item['stale'] = True
     
-    # Se existir uma lista de dispositivos correspondente à VLAN atual, adiciona descrições e tipos aos IPs.
-    if vlan_devices:
-        dispositivos_com_tipo = 0
-        for item in ip_status_list:
-            for device in vlan_devices:
-                if item['ip'] == device['ip']:  # Se o IP do dispositivo corresponder ao IP verificado.
-                    item['descricao'] = device['descricao']  # Adiciona a descrição associada ao IP.
-                    item['tipo'] = device.get('tipo', '')  # Adiciona o tipo do dispositivo.
-                    if item['tipo']:
-                        dispositivos_com_tipo += 1
-                    break
-            else:
-                item['descricao'] = '-'  # Se não houver correspondência, adiciona "-" como descrição.
-                item['tipo'] = ''  # Se não houver correspondência, tipo vazio.
+    with timings.span('sweep.join'):
+        # Se existir uma lista de dispositivos correspondente à VLAN atual, adiciona descrições e tipos aos IPs.
+        if vlan_devices:
+            dispositivos_com_tipo = 0
+            for item in ip_status_list:
+                for device in vlan_devices:
+                    if item['ip'] == device['ip']:  # Se o IP do dispositivo corresponder ao IP verificado.
+                        item['descricao'] = device['descricao']  # Adiciona a descrição associada ao IP.
+                        item['tipo'] = device.get('tipo', '')  # Adiciona o tipo do dispositivo.
+                        if item['tipo']:
+                            dispositivos_com_tipo += 1
+                        break
+                else:
+                    item['descricao'] = '-'  # Se não houver correspondência, adiciona "-" como descrição.
+                    item['tipo'] = ''  # Se não houver correspondência, tipo vazio.
         
-        logging.info(f"[IP_OPERATIONS] Dispositivos com tipo definido: {dispositivos_com_tipo}")
-    else:
-        # Se não houver uma lista de dispositivos para a VLAN, adiciona "-" para todos os IPs.
-        for item in ip_status_list:
-            item['descricao'] = '-'
-            item['tipo'] = ''
-        logging.info(f"[IP_OPERATIONS] Nenhum dispositivo encontrado para VLAN {vlan}")
+            logging.info(f"[IP_OPERATIONS] Dispositivos com tipo definido: {dispositivos_com_tipo}")
+        else:
+            # Se não houver uma lista de dispositivos para a VLAN, adiciona "-" para todos os IPs.
+            for item in ip_status_list:
+                item['descricao'] = '-'
+                item['tipo'] = ''
+            logging.info(f"[IP_OPERATIONS] Nenhum dispositivo encontrado para VLAN {vlan}")
+
+    # Anexa nome, MAC e fabricante já em cache aos hosts online; os que faltam são
+    # consultados em segundo plano e aparecem na próxima varredura.
+    with timings.span('sweep.enrich'):
+        enrichment_service.enrich(ip_status_list)
 
     # Log de algumas amostras do resultado final
-    amostras_com_tipo = [item for item in ip_status_list if item.get('tipo') and item['descricao'] != '-']
-    logging.info(f"[IP_OPERATIONS] Amostras com tipo no resultado final: {len(amostras_com_tipo)}")
-    for amostra in amostras_com_tipo[:2]:
-        logging.info(f"[IP_OPERATIONS] Resultado final: IP={amostra['ip']}, Desc={amostra['descricao']}, Tipo={amostra['tipo']}")
+    with timings.span('sweep.log'):
+        amostras_com_tipo = [item for item in ip_status_list if item.get('tipo') and item['descricao'] != '-']
+        logging.info(f"[IP_OPERATIONS] Amostras com tipo no resultado final: {len(amostras_com_tipo)}")
+        for amostra in amostras_com_tipo[:2]:
+            logging.info(f"[IP_OPERATIONS] Resultado final: IP={amostra['ip']}, Desc={amostra['descricao']}, Tipo={amostra['tipo']}")
 
     return ip_status_list  # Retorna a lista de status de todos os IPs.
 
@@ -0,0 +1,156 @@
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Limites da captura de perfil sob demanda. Com 60 workers de sonda por VLAN o
+# processo passa de 200 threads: cada amostra lê no máximo MAX_THREADS_PER_SAMPLE
+# pilhas (em rodízio) e MAX_STACK_DEPTH frames de cada uma.
+MAX_PROFILE_SECONDS = 60
+DEFAULT_SAMPLE_INTERVAL = 0.015
+MIN_SAMPLE_INTERVAL = 0.005
+MAX_THREADS_PER_SAMPLE = 32
+MAX_STACK_DEPTH = 48
+
+
+class SpanTimings:
+    """
+    Tempos agregados por fase (span): contagem, total, máximo e última duração.
+    Os nomes são fixos e poucos (fases da varredura e endpoints), então o
+    custo por medição é um perf_counter e uma atualização de dicionário.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}  # nome -> [contagem, total_s, max_s, ultimo_s]
+
+    def record(self, name, elapsed):
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, elapsed, elapsed, elapsed]
+            else:
+                span[0] += 1
+                span[1] += elapsed
+                span[2] = max(span[2], elapsed)
+                span[3] = elapsed
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @contextmanager
+    def timed_lock(self, lock, name):
+        """Adquire o lock registrando o tempo de espera como o span `name`"""
+        start = time.perf_counter()
+        with lock:
+            self.record(name, time.perf_counter() - start)
+            yield
+
+    def get_status(self):
+        with self.lock:
+            return {
+                name: {
+                    'count': count,
+                    'total_ms': round(total * 1000, 2),
+                    'avg_ms': round(total * 1000 / count, 3),
+                    'max_ms': round(maximum * 1000, 2),
+                    'last_ms': round(last * 1000, 2),
+                }
+                for name, (count, total, maximum, last) in sorted(self.spans.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    # Caminho curto: a partir do pacote 'app' ou só o nome do arquivo
+    marker = filename.rfind('/app/')
+    short = filename[marker + 1:] if marker != -1 else filename.rsplit('/', 1)[-1]
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Perfil por amostragem de pilhas de todas as threads do processo (scanner e
+    waitress), sem instrumentar o código: a cada intervalo lê
+    sys._current_frames() e conta as pilhas. O resultado sai no formato
+    "collapsed" (uma linha 'thread;frame;frame N'), aceito por flamegraph.pl
+    e speedscope. Só uma captura roda por vez.
+
+    Para manter o custo baixo com muitas threads, cada amostra percorre só
+    parte delas (em rodízio), as pilhas são cortadas nos frames mais
+    externos e os rótulos dos frames ficam em cache por code object.
+    """
+
+    def __init__(self):
+        self.capture_lock = threading.Lock()
+        self.labels = {}  # code object -> rótulo do frame
+
+    def capture(self, seconds, interval=DEFAULT_SAMPLE_INTERVAL, thread_filter=None):
+        """Amostra as pilhas por `seconds`. Lança RuntimeError se já houver captura em andamento"""
+        if not self.capture_lock.acquire(blocking=False):
+            raise RuntimeError('Já existe uma captura de perfil em andamento')
+        try:
+            seconds = min(max(seconds, interval), MAX_PROFILE_SECONDS)
+            interval = max(interval, MIN_SAMPLE_INTERVAL)
+            own_ident = threading.get_ident()
+            stacks = Counter()
+            samples = 0
+            offset = 0
+            names = {}
+            names_at = 0
+
+            started = time.monotonic()
+            deadline = started + seconds
+            next_sample = started
+            while started < deadline:
+                if started - names_at > 1.0:
+                    # Nomes das threads relidos no máximo uma vez por segundo
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    names_at = started
+                current = [(ident, frame) for ident, frame in sys._current_frames().items()
+                           if ident != own_ident and (not thread_filter or thread_filter in names.get(ident, ''))]
+                if len(current) > MAX_THREADS_PER_SAMPLE:
+                    offset %= len(current)
+                    current = (current[offset:] + current[:offset])[:MAX_THREADS_PER_SAMPLE]
+                    offset += MAX_THREADS_PER_SAMPLE
+                for ident, frame in current:
+                    frames = []
+                    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                        label = self.labels.get(frame.f_code)
+                        if label is None:
+                            label = self.labels[frame.f_code] = _frame_label(frame)
+                        frames.append(label)
+                        frame = frame.f_back
+                    if frame is not None:
+                        frames.append('...')  # Pilha cortada: os frames mais externos ficam de fora
+                    frames.append(names.get(ident, str(ident)))
+                    stacks[';'.join(reversed(frames))] += 1
+                samples += 1
+                # Agenda fixa: o tempo gasto na amostra e a espera pelo GIL ao acordar
+                # não se acumulam no intervalo; amostras atrasadas não são repostas
+                next_sample = max(next_sample + interval, time.monotonic())
+                time.sleep(max(0, next_sample - time.monotonic()))
+                started = time.monotonic()
+
+            return {'samples': samples, 'interval': interval, 'seconds': seconds, 'stacks': stacks}
+        finally:
+            self.capture_lock.release()
+
+    @staticmethod
+    def collapsed(profile):
+        return ''.join(f"{stack} {count}\n" for stack, count in profile['stacks'].most_common())
+
+# Instâncias globais dos tempos por fase e do amostrador de pilhas
+timings = SpanTimings()
+stack_sampler = StackSampler()
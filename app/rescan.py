@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from app import ip_operations
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Máximo de IPs em uma única reverificação
+MAX_RESCAN_IPS = 4096
+
+# Reverificações distintas rodando ao mesmo tempo
+MAX_ACTIVE_FLIGHTS = 4
+
+# Respostas em streaming simultâneas: cada uma prende uma das 4 threads do waitress
+# durante a varredura; acima disso o pedido recebe 202 e acompanha por /api/rescan/status
+MAX_STREAMS = 2
+
+# Segundos em que o resultado de uma reverificação concluída ainda é reaproveitado
+RESCAN_REUSE_SECONDS = 5
+
+
+class RescanFlight:
+    """Uma reverificação em andamento: acumula os resultados e os entrega a vários assinantes"""
+
+    def __init__(self, key, ips):
+        self.key = key
+        self.ips = ips
+        self.results = []
+        self.done = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+    def publish(self, result):
+        with self.cond:
+            self.results.append(result)
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.finished_at = time.time()
+            self.cond.notify_all()
+
+    def stream(self):
+        """Gera todos os resultados (os já obtidos e os que ainda vão chegar) até o fim da varredura"""
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.results) and not self.done:
+                    self.cond.wait(1.0)
+                batch = self.results[index:]
+                index = len(self.results)
+                done = self.done
+            for result in batch:
+                yield result
+            if done and index >= len(self.results):
+                return
+
+    def summary(self):
+        with self.cond:
+            counts = Counter(r['status'] for r in self.results)
+            return {
+                'key': self.key,
+                'total': len(self.ips),
+                'checked': len(self.results),
+                'online': counts['on'],
+                'offline': counts['off'],
+                'unknown': counts['unknown'],  # Cortados pelo prazo ou pelo cancelamento
+                'done': self.done,
+                'subscribers': self.subscribers,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class RescanManager:
+    """
+    Reverificação sob demanda com single-flight: pedidos idênticos (mesmo conjunto
+    de IPs) feitos enquanto uma varredura está em andamento, ou logo após seu fim,
+    compartilham a mesma varredura em vez de disparar outra.
+    """
+
+    def __init__(self, on_complete=None):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.on_complete = on_complete
+        self.cancel_source = None  # Função que retorna o threading.Event de cancelamento atual
+        self.streams = 0
+        self.stats = {'requests': 0, 'coalesced': 0, 'sweeps': 0, 'streams_refused': 0}
+
+    @staticmethod
+    def flight_key(ips):
+        return hashlib.sha1(','.join(sorted(ips)).encode()).hexdigest()[:12]
+
+    def request(self, targets):
+        """
+        Inicia (ou reaproveita) a reverificação dos alvos.
+        Retorna (flight, coalesced). Lança ValueError para alvos inválidos
+        e RuntimeError quando há reverificações demais em andamento.
+        """
+        ips = [ip for _, ip in ip_operations.expandir_alvos(targets)]
+        if not ips:
+            raise ValueError('Nenhum IP a verificar')
+        if len(ips) > MAX_RESCAN_IPS:
+            raise ValueError(f'Máximo de {MAX_RESCAN_IPS} IPs por reverificação')
+
+        key = self.flight_key(ips)
+        now = time.time()
+        with self.lock:
+            self.stats['requests'] += 1
+            self._expire(now)
+
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.stats['coalesced'] += 1
+                flight.subscribers += 1
+                return flight, True
+
+            active = sum(1 for f in self.flights.values() if not f.done)
+            if active >= MAX_ACTIVE_FLIGHTS:
+                raise RuntimeError('Muitas reverificações em andamento')
+
+            flight = RescanFlight(key, ips)
+            flight.subscribers = 1
+            self.flights[key] = flight
+            self.stats['sweeps'] += 1
+
+        logging.info(f"[RESCAN] Iniciando reverificação {key} de {len(ips)} IPs")
+        threading.Thread(target=self._run, args=(flight,), daemon=True).start()
+        return flight, False
+
+    def acquire_stream(self):
+        """Reserva uma vaga de resposta em streaming. Retorna False se todas estão ocupadas"""
+        with self.lock:
+            if self.streams >= MAX_STREAMS:
+                self.stats['streams_refused'] += 1
+                return False
+            self.streams += 1
+            return True
+
+    def release_stream(self):
+        with self.lock:
+            self.streams = max(0, self.streams - 1)
+
+    def _expire(self, now):
+        """Remove as reverificações concluídas há mais de RESCAN_REUSE_SECONDS"""
+        for key in [k for k, f in self.flights.items()
+                    if f.done and now - f.finished_at > RESCAN_REUSE_SECONDS]:
+            del self.flights[key]
+
+    def _run(self, flight):
+        try:
+            # Mesmo prazo das varreduras em background, e cancelada junto com o serviço
+            cancel = self.cancel_source() if self.cancel_source else None
+            for result in ip_operations.varrer_hosts(flight.ips, deadline=ip_operations.prazo_da_config(), cancel=cancel,
+                                                     **ip_operations.opcoes_da_config()):
+                flight.publish(result)
+        except Exception as e:
+            logging.error(f"[RESCAN] Erro na reverificação {flight.key}: {e}")
+        finally:
+            flight.finish()
+
+        logging.info(f"[RESCAN] Reverificação {flight.key} concluída: {flight.summary()['online']}/{len(flight.ips)} online")
+        if self.on_complete:
+            try:
+                self.on_complete(flight.results, flight.started_at)
+            except Exception as e:
+                logging.error(f"[RESCAN] Erro ao publicar resultados de {flight.key}: {e}")
+
+    def get_status(self):
+        with self.lock:
+            self._expire(time.time())
+            return {
+                'stats': dict(self.stats),
+                'streams': self.streams,
+                'flights': [f.summary() for f in self.flights.values()],
+            }
+
+# Instância global das reverificações sob demanda (routes registra o on_complete)
+rescan_manager = RescanManager()
@@ -1,13 +1,28 @@
-from flask import Flask, render_template, jsonify, make_response, request  # Importa as funções necessárias do Flask.
+from flask import Flask, Response, render_template, jsonify, make_response, request, send_file, abort, g  # Importa as funções necessárias do Flask.
 from app import ip_operations  # Importa o módulo 'ip_operations' da aplicação, que contém a função 'verificar_ips'.
 import time  # Módulo para manipulação de tempo (usado para pausas e delays).
 import threading  # Módulo para rodar threads em paralelo (execução simultânea).
-from app import app  # Importa a instância 'app' da aplicação Flask.
+from app import app, asset_manifest  # Importa a instância 'app' da aplicação Flask e o manifest dos estáticos.
+from app.assets import IMMUTABLE_CACHE_CONTROL  # Cache-Control dos estáticos com hash.
 import concurrent.futures  # Para execução concorrente de múltiplas tarefas.
 import logging  # Adicionar logging
+import json  # Para serializar os resultados em streaming (NDJSON/SSE)
+import gzip  # Para descomprimir os lotes enviados pelos agentes remotos
+import io  # Para ler o corpo comprimido dos lotes como arquivo
+import base64  # Para codificar os cursores de paginação
+import ipaddress  # Para ordenar IPs numericamente
+from datetime import datetime  # Para registrar o horário de cada snapshot
 from functools import wraps  # Para criar decorators
 from app.config_manager import config_manager  # Importa o gerenciador de configurações.
 from app.device_manager import device_manager  # Importa o gerenciador de dispositivos.
+from app.alert_manager import alert_manager  # Importa o motor de alertas.
+from app.admission import admission_controller, classify_path  # Importa o controle de admissão da API.
+from app.rescan import rescan_manager  # Importa as reverificações sob demanda.
+from app.availability import availability_tracker, RESOLUTIONS  # Importa os agregados de disponibilidade.
+from app.enrichment import enrichment_service  # Importa o enriquecimento dos resultados.
+from app.profiling import timings, stack_sampler, DEFAULT_SAMPLE_INTERVAL  # Importa os spans e o perfil por amostragem.
+from app.facets import facet_index  # Importa o índice facetado por tipo.
+from app.inventory import inventory_reconciler  # Importa a conciliação do inventário.
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,12 +33,50 @@ API_TOKEN = 'whatsapp_api_token_2025_helpdeskmonitor_tce'
 # Dicionário global que armazenará o status dos IPs verificados, por VLAN.
 check_ip = {}
 
+# Snapshot por varredura consumido pela API externa em lote: cada VLAN guarda a lista
+# já formatada e ordenada, montada uma vez por varredura em vez de a cada consulta.
+external_snapshot = {}
+
+# Campos disponíveis para projeção na API externa em lote.
+EXTERNAL_FIELDS = ['vlan', 'ip', 'status', 'nome', 'descricao']
+
+# Limites de paginação da API externa em lote.
+EXTERNAL_PAGE_DEFAULT = 100
+EXTERNAL_PAGE_MAX = 1000
+
+# Agentes remotos conhecidos: agent_id -> último contato, sequência e contadores.
+# agent_ips guarda os IPs recebidos de cada agente (para amostrar e expirar só os dele).
+agents_status = {}
+agent_ips = {}
+agents_lock = threading.Lock()
+
+# Serializa as escritas em 'check_ip' (varredura em background, reverificação e agentes),
+# que leem a lista atual da VLAN e publicam uma nova.
+check_ip_lock = threading.Lock()
+
+# VLAN -> instante (time.time) em que começou a varredura em background publicada em check_ip.
+check_ip_started = {}
+
+# Tamanho máximo aceito de um lote de agente depois de descomprimido.
+AGENT_MAX_PAYLOAD = 10 * 1024 * 1024
+
 # Constante que define o caminho raiz para os endpoints da API.
 RAIZ = '/ipmonitor'
 
-# Variável global para controlar o loop de verificação
+# Variáveis globais para controlar o loop de verificação: cada loop tem o seu
+# sinal de cancelamento, e start/stop/restart são serializados pelo lock.
 background_thread = None
-should_stop = False
+background_cancel = threading.Event()
+background_ping_timeout = 2  # ping_timeout com que o loop atual foi iniciado
+background_restart_pending = False  # Loop cancelado que deve iniciar o sucessor ao terminar
+service_lock = threading.Lock()
+
+# Token do header "Authorization: Bearer <token>", ou None se ausente/mal formado
+def bearer_token():
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0].lower() != 'bearer':
+        return None
+    return parts[1]
 
 # Decorator para validar Bearer Token
 def require_api_token(f):
@@ -36,12 +89,10 @@ def require_api_token(f):
             return jsonify({'error': 'Token de autenticação não fornecido'}), 401
         
         # Verificar se o header está no formato "Bearer <token>"
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != 'bearer':
+        token = bearer_token()
+        if token is None:
             return jsonify({'error': 'Formato de autenticação inválido. Use: Bearer <token>'}), 401
         
-        token = parts[1]
-        
         if token != API_TOKEN:
             return jsonify({'error': 'Token de autenticação inválido'}), 403
         
@@ -49,22 +100,240 @@ def require_api_token(f):
     
     return decorated_function
 
+# Controle de admissão: rate limiting por cliente e limite de requisições simultâneas
+# por classe de rota, para que um cliente abusivo não esgote as threads do waitress.
+@app.before_request
+def admission_check():
+    route_class = classify_path(request.path)
+    if route_class is None or not admission_controller.enabled():
+        return None
+    
+    # Identifica o cliente pelo IP de origem (já corrigido pelo ProxyFix). Na API externa,
+    # um token válido vira a chave, para clientes atrás do mesmo proxy não dividirem o bucket;
+    # tokens inventados não criam buckets novos.
+    client = request.remote_addr
+    if route_class == 'external' and bearer_token() == API_TOKEN:
+        client = f"token:{API_TOKEN}"
+    if route_class == 'agents' and request.headers.get('X-Agent-Id') and bearer_token() == API_TOKEN:
+        # Agentes remotos compartilham o token; cada um tem seu próprio bucket
+        client = f"{client}:{request.headers['X-Agent-Id']}"
+    
+    retry_after = admission_controller.check_rate(route_class, client)
+    if retry_after:
+        response = jsonify({'error': 'Limite de requisições excedido', 'retry_after': retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    
+    if not admission_controller.acquire(route_class):
+        response = jsonify({'error': 'Servidor ocupado, tente novamente', 'retry_after': 1})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    g.admission_class = route_class
+    return None
+
+@app.teardown_request
+def admission_release(exc=None):
+    route_class = g.pop('admission_class', None)
+    if route_class is not None:
+        admission_controller.release(route_class)
+
+# Mede a duração de cada requisição por endpoint (span 'http.<endpoint>').
+@app.before_request
+def request_span_start():
+    g.span_start = time.perf_counter()
+
+@app.teardown_request
+def request_span_end(exc=None):
+    start = g.pop('span_start', None)
+    if start is not None and request.endpoint:
+        timings.record(f"http.{request.endpoint}", time.perf_counter() - start)
+
 # Função que verifica os IPs em uma determinada VLAN em segundo plano.
 # Esta função é chamada pelas threads para rodar verificações assíncronas.
-def background_ip_check(vlan):
+def background_ip_check(vlan, cancel=None):
     global check_ip
-    rede_base = '172.17.' + str(vlan) + '.'  # Define a base do endereço IP para a VLAN específica.
+    if cancel is not None and cancel.is_set():
+        return  # O loop foi cancelado antes desta VLAN começar
+    
+    rede_base = ip_operations.rede_base_da_vlan(vlan)  # Define a base do endereço IP para a VLAN específica.
     
     logging.info(f"[BACKGROUND] Verificando em background a VLAN {vlan} e rede_base {rede_base}")
 
     # Chama a função 'verificar_ips' do módulo 'ip_operations' e armazena o resultado no dicionário 'check_ip'.
-    result = ip_operations.verificar_ips(rede_base)
+    # A varredura tem um prazo (sweep_deadline); os hosts sem resultado saem como 'unknown'.
+    started = time.time()
+    with timings.span('background.sweep'):
+        result = ip_operations.verificar_ips(rede_base, ip_operations.prazo_da_config(), cancel, check_ip.get(vlan))
     
     # Log dos resultados antes de armazenar
     items_com_tipo = [item for item in result if item.get('tipo') and item['tipo'].strip()]
     logging.info(f"[BACKGROUND] VLAN {vlan} - Resultado: {len(result)} itens, {len(items_com_tipo)} com tipo")
     
-    check_ip[vlan] = result
+    with timings.span('background.snapshot'):
+        snapshot = build_external_snapshot(vlan, result)
+    with check_ip_lock:
+        check_ip[vlan] = result
+        check_ip_started[vlan] = started
+        external_snapshot[vlan] = snapshot
+
+    # Alimenta o motor de alertas (não bloqueia: o envio ocorre em thread própria).
+    with timings.span('background.alerts'):
+        alert_manager.processar_varredura(vlan, result)
+    
+    # Acrescenta a varredura aos agregados de disponibilidade (relatórios de uptime).
+    with timings.span('background.availability'):
+        availability_tracker.record_sweep(vlan, result)
+    
+    # Atualiza as contagens online do índice por tipo com as transições da varredura.
+    with timings.span('background.facets'):
+        facet_index.record_sweep(vlan, result)
+    
+    # Atualiza os online não cadastrados e os cadastrados sem resposta da VLAN.
+    with timings.span('background.inventory'):
+        inventory_reconciler.record_sweep(vlan, result)
+
+
+# Monta o snapshot da API externa para uma VLAN a partir do resultado da varredura.
+def build_external_snapshot(vlan, result):
+    itens = []
+    for item in result:
+        descricao = item.get('descricao', '-')
+        itens.append({
+            'vlan': vlan,
+            'ip': item['ip'],
+            'status': {'on': 'online', 'off': 'offline'}.get(item.get('status'), 'unknown'),
+            'nome': '' if descricao == '-' else descricao,
+            'descricao': item.get('tipo', ''),
+            '_chave': (vlan, int(ipaddress.ip_address(item['ip']))),
+        })
+    itens.sort(key=lambda d: d['_chave'])
+    return {'gerado_em': datetime.now().isoformat(), 'itens': itens}
+
+# Incorpora os resultados de uma reverificação sob demanda ao 'check_ip'.
+# Uma VLAN cuja varredura em background começou depois da reverificação já tem um
+# resultado mais novo e não é sobrescrita.
+def merge_rescan_results(results, started_at):
+    por_vlan = {}
+    for result in results:
+        vlan = ip_operations.vlan_do_ip(result['ip'])
+        # Hosts sem resultado (varredura interrompida) mantêm o status anterior
+        if vlan is not None and result['status'] != 'unknown':
+            por_vlan.setdefault(vlan, {})[result['ip']] = result['status']
+    
+    with check_ip_lock:
+        for vlan, status_por_ip in por_vlan.items():
+            if vlan not in check_ip:
+                continue
+            if check_ip_started.get(vlan, 0) >= started_at:
+                logging.info(f"[RESCAN] VLAN {vlan} - varredura em background mais recente; reverificação descartada")
+                continue
+            # Copia a lista para não alterar uma resposta que esteja sendo serializada
+            merged = [dict(item, status=status_por_ip[item['ip']]) if item['ip'] in status_por_ip else item
+                      for item in check_ip[vlan]]
+            check_ip[vlan] = merged
+            external_snapshot[vlan] = build_external_snapshot(vlan, merged)
+            facet_index.record_sweep(vlan, merged)
+            inventory_reconciler.record_sweep(vlan, merged)
+            logging.info(f"[RESCAN] VLAN {vlan} - {len(status_por_ip)} IPs atualizados em check_ip")
+
+rescan_manager.on_complete = merge_rescan_results
+# Reiniciar ou parar o serviço também interrompe as reverificações em andamento
+rescan_manager.cancel_source = lambda: background_cancel
+
+# Incorpora ao 'check_ip' os resultados enviados por um agente remoto. VLANs que o
+# servidor não varre localmente são montadas a partir dos IPs recebidos, com as
+# descrições e tipos cadastrados. Alertas e disponibilidade não são alimentados por
+# lote, e sim uma vez por ciclo do agente (ver record_agent_cycle).
+# Retorna as VLANs atualizadas e os IPs sem VLAN mapeada (ignorados).
+def merge_agent_results(results):
+    por_vlan = {}
+    unmapped = []
+    for result in results:
+        vlan = agent_vlan_of(result['ip'])
+        if vlan is None:
+            unmapped.append(result['ip'])
+        else:
+            por_vlan.setdefault(vlan, {})[result['ip']] = result['status']
+    
+    with check_ip_lock:
+        for vlan, status_por_ip in por_vlan.items():
+            itens = {item['ip']: item for item in check_ip.get(vlan, [])}
+            novos = [ip for ip in status_por_ip if ip not in itens]
+            if novos:
+                device_map = {device['ip']: device for device in device_manager.get_devices_by_vlan(vlan)}
+                for ip in novos:
+                    device = device_map.get(ip, {})
+                    itens[ip] = {'ip': ip, 'descricao': device.get('descricao', '-'), 'tipo': device.get('tipo', '')}
+            
+            merged = [dict(item, status=status_por_ip.get(ip, item.get('status', 'off')))
+                      for ip, item in sorted(itens.items(), key=lambda par: int(ipaddress.ip_address(par[0])))]
+            check_ip[vlan] = merged
+            external_snapshot[vlan] = build_external_snapshot(vlan, merged)
+            facet_index.record_sweep(vlan, merged)
+            inventory_reconciler.record_sweep(vlan, merged)
+    
+    return sorted(por_vlan), unmapped
+
+# Fim de um ciclo de varredura de um agente (lote com cycle_end, que chega mesmo sem
+# mudanças): conta uma amostra do estado atual dos IPs do agente para o debounce dos
+# alertas e para a disponibilidade, como uma varredura local da VLAN.
+def record_agent_cycle(vlans, ips):
+    with check_ip_lock:
+        listas = {vlan: [item for item in check_ip[vlan] if item['ip'] in ips] for vlan in vlans if vlan in check_ip}
+    for vlan, lista in listas.items():
+        alert_manager.processar_varredura(vlan, lista)
+        availability_tracker.record_sweep(vlan, lista)
+
+# Marca como 'unknown' os IPs de agentes sem contato há mais de stale_after_cycles
+# intervalos do próprio agente, para que a VLAN não mostre o último estado para sempre.
+# Chamado a cada ciclo do check_loop; o agente recebe 'resync' quando voltar.
+def expire_stale_agents():
+    stale_after = config_manager.get_config('agents').get('stale_after_cycles', 3)
+    now = time.time()
+    expirados = []
+    with agents_lock:
+        for agent_id, status in agents_status.items():
+            limite = stale_after * status.get('interval', 60)
+            if not status.get('stale') and now - status['last_seen_ts'] > limite:
+                status['stale'] = True
+                expirados.append((agent_id, status['vlans'], set(agent_ips.get(agent_id, ())), limite))
+    
+    for agent_id, vlans, ips, limite in expirados:
+        logging.warning(f"[AGENTS] {agent_id}: sem contato há mais de {limite:.0f}s; {len(ips)} IPs marcados como 'unknown'")
+        with check_ip_lock:
+            for vlan in vlans:
+                if vlan not in check_ip:
+                    continue
+                merged = [dict(item, status='unknown') if item['ip'] in ips else item for item in check_ip[vlan]]
+                check_ip[vlan] = merged
+                external_snapshot[vlan] = build_external_snapshot(vlan, merged)
+
+# VLAN de um IP recebido de agente: a da rede monitorada (172.17.<vlan>.x) ou a
+# definida em agents.networks (CIDR -> VLAN) para redes fora dela. None se não mapeado.
+def agent_vlan_of(ip):
+    vlan = ip_operations.vlan_do_ip(ip)
+    if vlan is not None:
+        return vlan
+    try:
+        endereco = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    for cidr, vlan in config_manager.get_config('agents').get('networks', {}).items():
+        if endereco in ipaddress.ip_network(cidr, strict=False):
+            return int(vlan)
+    return None
+
+# Cursores opacos de paginação: codificam a chave (vlan, ip) do último item entregue.
+def encode_cursor(chave):
+    return base64.urlsafe_b64encode(f"{chave[0]}:{chave[1]}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    vlan, ip_int = texto.split(':')
+    return (int(vlan), int(ip_int))
 
 
 '''API ENDPOINTS'''
@@ -127,6 +396,246 @@ def get_online_devices_by_vlan(vlan):
         logging.error(f"Erro ao obter dispositivos online da VLAN {vlan}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/external/devices', methods=['GET'])
+@app.route(RAIZ + '/api/external/devices', methods=['GET'])
+@require_api_token
+def query_external_devices():
+    """
+    Consulta em lote de várias VLANs a partir do snapshot da última varredura.
+    
+    Parâmetros (query string, todos opcionais):
+        vlans   - lista separada por vírgula (ex.: 70,80) ou 'all' (padrão)
+        status  - 'online' ou 'offline'
+        tipo    - tipo exato do dispositivo
+        q       - trecho do nome (descrição cadastrada), sem diferenciar maiúsculas
+        fields  - campos retornados, separados por vírgula (padrão: todos)
+        limit   - itens por página (padrão 100, máximo 1000)
+        cursor  - valor de 'next_cursor' da página anterior
+    """
+    try:
+        vlans_param = request.args.get('vlans', 'all').strip()
+        if vlans_param in ('', 'all'):
+            vlans = sorted(external_snapshot)
+        else:
+            try:
+                vlans = sorted({int(v) for v in vlans_param.split(',') if v.strip()})
+            except ValueError:
+                return jsonify({'error': 'Parâmetro vlans inválido'}), 400
+        
+        status = request.args.get('status', '').lower()
+        status = {'on': 'online', 'off': 'offline'}.get(status, status)
+        if status not in ('', 'online', 'offline'):
+            return jsonify({'error': 'Parâmetro status deve ser online ou offline'}), 400
+        
+        tipo = request.args.get('tipo')
+        busca = request.args.get('q', '').lower()
+        
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or EXTERNAL_FIELDS
+        invalid_fields = [f for f in fields if f not in EXTERNAL_FIELDS]
+        if invalid_fields:
+            return jsonify({'error': f'Campos inválidos: {", ".join(invalid_fields)}', 'fields': EXTERNAL_FIELDS}), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', EXTERNAL_PAGE_DEFAULT)), 1), EXTERNAL_PAGE_MAX)
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Parâmetros limit ou cursor inválidos'}), 400
+        
+        devices = []
+        has_more = False
+        scanned_at = {}
+        for vlan in vlans:
+            snapshot = external_snapshot.get(vlan)
+            if snapshot is None:
+                continue
+            scanned_at[vlan] = snapshot['gerado_em']
+            if has_more or (after and vlan < after[0]):
+                continue
+            for item in snapshot['itens']:
+                if after and item['_chave'] <= after:
+                    continue
+                if status and item['status'] != status:
+                    continue
+                if tipo is not None and item['descricao'] != tipo:
+                    continue
+                if busca and busca not in item['nome'].lower():
+                    continue
+                if len(devices) == limit:
+                    has_more = True
+                    break
+                devices.append(item)
+        
+        return jsonify({
+            'vlans': vlans,
+            'scanned_at': scanned_at,
+            'missing_vlans': [v for v in vlans if v not in external_snapshot],
+            'count': len(devices),
+            'devices': [{f: item[f] for f in fields} for item in devices],
+            'next_cursor': encode_cursor(devices[-1]['_chave']) if has_more else None
+        })
+    
+    except Exception as e:
+        logging.error(f"Erro na consulta externa em lote: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Consulta o índice facetado por tipo (parâmetros comuns à rota interna e à externa).
+def facet_query_response():
+    tipo = request.args.get('tipo')
+    vlan = request.args.get('vlan', type=int)
+    include_devices = request.args.get('devices') == '1'
+    try:
+        result = facet_index.query(tipo, vlan, include_devices)
+    except KeyError:
+        return jsonify({'error': 'Tipo não encontrado', 'tipo': tipo}), 404
+    result['success'] = True
+    return jsonify(result)
+
+@app.route('/api/external/facets/types', methods=['GET'])
+@app.route(RAIZ + '/api/external/facets/types', methods=['GET'])
+@require_api_token
+def get_external_type_facets():
+    """
+    Contagens de dispositivos cadastrados e online por tipo, em todas as VLANs.
+    
+    Parâmetros: tipo (ex.: UPS, sem diferenciar maiúsculas), vlan e devices=1
+    para incluir os IPs de cada tipo.
+    """
+    try:
+        return facet_query_response()
+    except Exception as e:
+        logging.error(f"Erro ao consultar facetas por tipo: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Consulta a conciliação do inventário (parâmetros comuns à rota interna e à externa).
+def inventory_query_response():
+    vlan = request.args.get('vlan', type=int)
+    days = request.args.get('days', type=float)
+    if days is not None and days < 0:
+        return jsonify({'error': 'days deve ser maior ou igual a zero'}), 400
+    result = inventory_reconciler.query(vlan, days)
+    result['success'] = True
+    return jsonify(result)
+
+@app.route('/api/external/inventory/reconciliation', methods=['GET'])
+@app.route(RAIZ + '/api/external/inventory/reconciliation', methods=['GET'])
+@require_api_token
+def get_external_inventory_reconciliation():
+    """
+    Hosts online sem cadastro e dispositivos cadastrados sem resposta, por VLAN.
+    
+    Parâmetros: vlan e days (cadastrados sem resposta há pelo menos N dias;
+    padrão inventory.stale_after_days).
+    """
+    try:
+        return inventory_query_response()
+    except Exception as e:
+        logging.error(f"Erro ao consultar conciliação do inventário: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/agents/results', methods=['POST'])
+@app.route(RAIZ + '/api/agents/results', methods=['POST'])
+@require_api_token
+def receive_agent_results():
+    """
+    Recebe um lote de resultados de um agente remoto (ver app/agent.py).
+    
+    Corpo JSON, opcionalmente comprimido (Content-Encoding: gzip):
+    {"agent_id": ..., "seq": N, "full": bool, "cycle": N, "cycle_end": bool, "interval": s,
+     "sent_at": ts, "results": [{"ip", "status", "rtt_ms"}]}
+    
+    O lote com cycle_end fecha um ciclo do agente (vazio se nada mudou) e conta
+    uma amostra para alertas e disponibilidade. A resposta traz resync=true
+    quando o central precisa do estado completo do agente.
+    """
+    try:
+        body = request.get_data()
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            with gzip.GzipFile(fileobj=io.BytesIO(body)) as f:
+                body = f.read(AGENT_MAX_PAYLOAD + 1)
+        if len(body) > AGENT_MAX_PAYLOAD:
+            return jsonify({'error': 'Lote muito grande'}), 413
+        
+        payload = json.loads(body)
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'O lote deve ser um objeto JSON'}), 400
+        agent_id = str(payload.get('agent_id', '')).strip()
+        results = payload.get('results')
+        if not agent_id or not isinstance(results, list):
+            return jsonify({'error': 'agent_id e results são obrigatórios'}), 400
+        
+        valid = [r for r in results
+                 if isinstance(r, dict) and isinstance(r.get('ip'), str) and r.get('status') in ('on', 'off')]
+        invalid = len(results) - len(valid)
+        # IPs fora de 172.17.x sem entrada em agents.networks não têm VLAN: são devolvidos ao agente
+        vlans, unmapped = merge_agent_results(valid)
+        accepted = len(valid) - len(unmapped)
+        
+        seq = payload.get('seq')
+        cycle = payload.get('cycle')
+        interval = payload.get('interval')
+        with agents_lock:
+            status = agents_status.get(agent_id)
+            # Agente desconhecido (ex.: central reiniciado) ou que volta depois de expirar:
+            # só as mudanças não bastam, o agente precisa reenviar o estado completo
+            resync = (status is None or status.get('stale', False)) and not payload.get('full')
+            if status is None:
+                status = agents_status[agent_id] = {'batches': 0, 'hosts_received': 0, 'seq_gaps': 0, 'last_seq': None,
+                                                    'cycles': 0, 'last_cycle': None}
+            if isinstance(seq, int) and status['last_seq'] is not None and seq > status['last_seq'] + 1:
+                status['seq_gaps'] += 1
+            status.update({
+                'last_seen': datetime.now().isoformat(),
+                'last_seen_ts': time.time(),
+                'last_seq': seq,
+                'remote_addr': request.remote_addr,
+                'vlans': sorted(set(status.get('vlans', [])) | set(vlans)),
+                'lag_s': round(time.time() - payload['sent_at'], 2) if isinstance(payload.get('sent_at'), (int, float)) else None,
+                'stale': False,
+            })
+            if isinstance(interval, (int, float)) and not isinstance(interval, bool) and interval > 0:
+                status['interval'] = interval
+            status['batches'] += 1
+            status['hosts_received'] += accepted
+            ips = agent_ips.setdefault(agent_id, set())
+            ips.update(r['ip'] for r in valid)
+            ips.difference_update(unmapped)
+            
+            # Uma amostra por ciclo do agente (um ciclo repetido, por reenvio ou resync, não conta de novo)
+            new_cycle = payload.get('cycle_end') is True and isinstance(cycle, int) and cycle != status['last_cycle']
+            if new_cycle:
+                status['last_cycle'] = cycle
+                status['cycles'] += 1
+                cycle_vlans, cycle_ips = list(status['vlans']), set(ips)
+        
+        if new_cycle:
+            record_agent_cycle(cycle_vlans, cycle_ips)
+        
+        if unmapped:
+            logging.warning(f"[AGENTS] {agent_id}: {len(unmapped)} IPs sem VLAN mapeada ignorados (ex.: {unmapped[0]})")
+        return jsonify({'success': True, 'accepted': accepted, 'vlans': vlans,
+                        'invalid': invalid, 'unmapped': unmapped, 'resync': resync})
+    
+    except (ValueError, OSError) as e:
+        return jsonify({'error': f'Lote inválido: {e}'}), 400
+    except Exception as e:
+        logging.error(f"Erro ao receber resultados de agente: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/agents/status', methods=['GET'])
+@app.route(RAIZ + '/api/agents/status', methods=['GET'])
+def get_agents_status():
+    try:
+        with agents_lock:
+            agents = {agent_id: dict(status) for agent_id, status in agents_status.items()}
+        return jsonify({
+            'success': True,
+            'remote_vlans': config_manager.get_config('agents').get('remote_vlans', []),
+            'agents': agents
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============================================================
 # API INTERNA - Endpoints do sistema
 # ============================================================
@@ -155,12 +664,30 @@ def dispositivos():
     # Renderiza o arquivo HTML 'dispositivos.html' sem dependências Jinja2
     return render_template('dispositivos.html')
 
+# Serve os estáticos com hash no nome (gerados por 'make assets') com cache imutável,
+# entregando a variante pré-comprimida (.br/.gz) aceita pelo navegador.
+@app.route('/static/dist/<path:filename>')
+@app.route(RAIZ + '/static/dist/<path:filename>')
+def static_dist(filename):
+    resolved = asset_manifest.resolve(filename, request.headers.get('Accept-Encoding'))
+    if resolved is None:
+        abort(404)
+    path, encoding, mimetype = resolved
+    
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 # Define o endpoint para retornar o status dos IPs verificados em formato JSON.
 @app.route('/api/ip-status')  # Rota para rodar localmente.
 @app.route(RAIZ + '/api/ip-status')  # Rota com prefixo 'RAIZ' para produção.
 def ip_status():
     # Retorna o conteúdo do dicionário 'check_ip' (status dos IPs) como um JSON.
-    return jsonify(check_ip)
+    with timings.span('http.ip_status.json'):
+        return jsonify(check_ip)
     
 # Endpoint para iniciar a verificação de uma VLAN específica.
 @app.route('/api/start-check/<string:vlan>', methods=['GET'])  # Rota local.
@@ -177,7 +704,8 @@ def check(vlan):
         if items_com_tipo:
             logging.info(f"[ROUTES] Exemplo com tipo: {items_com_tipo[0]}")
         
-        return jsonify(result)
+        with timings.span('http.check.json'):
+            return jsonify(result)
     except KeyError:
         # Caso a VLAN ainda não tenha sido verificada, retorna status 204 (No Content).
         logging.warning(f"[ROUTES] VLAN {vlan} não encontrada em check_ip por enquanto.")
@@ -199,12 +727,13 @@ def save_config():
             if not config_manager.update_section(section, values):
                 return jsonify({'error': f'Erro ao atualizar seção {section}'}), 500
         
-        # Reiniciar serviço de background com novas configurações
-        restart_background_service()
+        # Reiniciar serviço de background com novas configurações (sem esperar o loop atual terminar)
+        started = restart_background_service()
         
         return jsonify({
             'success': True,
-            'message': 'Configurações salvas com sucesso'
+            'message': 'Configurações salvas com sucesso',
+            'restart_pending': not started
         })
     
     except Exception as e:
@@ -217,10 +746,11 @@ def save_config():
 def reset_config():
     try:
         if config_manager.reset_to_defaults():
-            restart_background_service()
+            started = restart_background_service()
             return jsonify({
                 'success': True,
-                'message': 'Configurações restauradas para os valores padrão'
+                'message': 'Configurações restauradas para os valores padrão',
+                'restart_pending': not started
             })
         else:
             return jsonify({'error': 'Erro ao resetar configurações'}), 500
@@ -244,6 +774,194 @@ def debug_devices(vlan):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Endpoint com o resumo por tipo de dispositivo (cards do dashboard)
+@app.route('/api/facets/types')
+@app.route(RAIZ + '/api/facets/types')
+def get_type_facets():
+    """Resumo por tipo para os cards do dashboard (mesmos parâmetros da rota externa)"""
+    try:
+        return facet_query_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint com a conciliação do inventário (painel do dashboard)
+@app.route('/api/inventory/reconciliation')
+@app.route(RAIZ + '/api/inventory/reconciliation')
+def get_inventory_reconciliation():
+    """Conciliação do inventário para o painel do dashboard (mesmos parâmetros da rota externa)"""
+    try:
+        return inventory_query_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint com os tempos por fase da varredura e por endpoint
+@app.route('/api/debug/timings')
+@app.route(RAIZ + '/api/debug/timings')
+def get_debug_timings():
+    """Tempos acumulados por fase da varredura e por endpoint (?reset=1 zera após a leitura)"""
+    try:
+        spans = timings.get_status()
+        if request.args.get('reset') == '1':
+            timings.reset()
+        return jsonify({'success': True, 'spans': spans})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint de perfil por amostragem sob demanda
+@app.route('/api/debug/profile')
+@app.route(RAIZ + '/api/debug/profile')
+@require_api_token
+def get_debug_profile():
+    """
+    Captura um perfil por amostragem das pilhas de todas as threads, sem reiniciar o serviço.
+    
+    Parâmetros: seconds (padrão 10, máx. 60), interval (segundos entre amostras),
+    thread (filtra pelo nome, ex.: 'scanner', 'probe', 'waitress') e
+    format=collapsed (padrão, para flamegraph.pl/speedscope) ou json.
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval', DEFAULT_SAMPLE_INTERVAL))
+        if seconds <= 0 or interval <= 0:
+            return jsonify({'error': 'seconds e interval devem ser positivos'}), 400
+        
+        try:
+            profile = stack_sampler.capture(seconds, interval, request.args.get('thread'))
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        if request.args.get('format') == 'json':
+            stacks = profile.pop('stacks')
+            profile['stacks'] = [{'stack': stack, 'count': count} for stack, count in stacks.most_common()]
+            return jsonify(profile)
+        
+        response = Response(stack_sampler.collapsed(profile), mimetype='text/plain')
+        response.headers['Content-Disposition'] = 'attachment; filename=ipmonitor-profile.collapsed'
+        return response
+    except ValueError:
+        return jsonify({'error': 'seconds e interval devem ser números'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint com os contadores do motor de alertas
+@app.route('/api/alerts/status')
+@app.route(RAIZ + '/api/alerts/status')
+def alerts_status():
+    try:
+        return jsonify({'success': True, 'status': alert_manager.get_status()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint com os limites e contadores do controle de admissão
+@app.route('/api/admission/status')
+@app.route(RAIZ + '/api/admission/status')
+def admission_status():
+    try:
+        return jsonify({'success': True, 'status': admission_controller.get_status()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint para reverificar agora uma VLAN, CIDR ou lista de IPs.
+# Pedidos idênticos simultâneos compartilham uma única varredura (single-flight).
+@app.route('/api/rescan', methods=['POST'])
+@app.route(RAIZ + '/api/rescan', methods=['POST'])
+def rescan():
+    try:
+        data = request.get_json(silent=True) or {}
+        targets = data.get('targets')
+        if isinstance(targets, (str, int)):
+            targets = [targets]
+        if not targets:
+            return jsonify({'error': 'Informe targets: VLANs, CIDRs ou IPs'}), 400
+        
+        try:
+            flight, coalesced = rescan_manager.request(targets)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except RuntimeError as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        
+        # Sem streaming (pedido ou sem vaga de stream): apenas confirma; os resultados entram
+        # em check_ip ao final e o andamento fica em /api/rescan/status.
+        if not data.get('stream', True) or not rescan_manager.acquire_stream():
+            return jsonify({'success': True, 'coalesced': coalesced, 'rescan': flight.summary()}), 202
+        
+        sse = 'text/event-stream' in request.headers.get('Accept', '')
+        
+        def generate():
+            # Cada stream ocupa uma thread do waitress até o fim da varredura; a vaga é
+            # liberada também quando o cliente desconecta (o servidor fecha o gerador).
+            try:
+                for result in flight.stream():
+                    record = dict(result, type='host', vlan=ip_operations.vlan_do_ip(result['ip']))
+                    yield f"event: host\ndata: {json.dumps(record)}\n\n" if sse else json.dumps(record) + '\n'
+                summary = dict(flight.summary(), type='summary', coalesced=coalesced)
+                yield f"event: summary\ndata: {json.dumps(summary)}\n\n" if sse else json.dumps(summary) + '\n'
+            finally:
+                rescan_manager.release_stream()
+        
+        response = Response(generate(), mimetype='text/event-stream' if sse else 'application/x-ndjson')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    except Exception as e:
+        logging.error(f"Erro ao iniciar reverificação: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint com as reverificações em andamento e os contadores de coalescência
+@app.route('/api/rescan/status')
+@app.route(RAIZ + '/api/rescan/status')
+def rescan_status():
+    try:
+        return jsonify({'success': True, 'status': rescan_manager.get_status()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Relatório de disponibilidade (uptime/SLA) a partir dos agregados pré-calculados.
+# Período: ?days=30 (padrão), ?hours=N ou ?from=<ISO>&to=<ISO>; filtros opcionais ?ip= e ?resolution=.
+@app.route('/api/reports/availability/<int:vlan>')
+@app.route(RAIZ + '/api/reports/availability/<int:vlan>')
+def availability_report(vlan):
+    try:
+        end_ts = time.time()
+        if request.args.get('from'):
+            start_ts = datetime.fromisoformat(request.args['from']).timestamp()
+            if request.args.get('to'):
+                end_ts = datetime.fromisoformat(request.args['to']).timestamp()
+        elif request.args.get('hours'):
+            start_ts = end_ts - float(request.args['hours']) * 3600
+        else:
+            start_ts = end_ts - float(request.args.get('days', 30)) * 86400
+        
+        resolution = request.args.get('resolution')
+        if resolution and resolution not in RESOLUTIONS:
+            return jsonify({'error': f'Resolução inválida. Use: {", ".join(RESOLUTIONS)}'}), 400
+        if start_ts >= end_ts:
+            return jsonify({'error': 'Período inválido'}), 400
+        
+        report = availability_tracker.report(vlan, start_ts, end_ts, resolution, request.args.get('ip'))
+        report['from'] = datetime.fromtimestamp(report['from']).isoformat()
+        report['to'] = datetime.fromtimestamp(report['to']).isoformat()
+        return jsonify({'success': True, 'report': report})
+    except ValueError as e:
+        return jsonify({'error': f'Parâmetros inválidos: {e}'}), 400
+    except Exception as e:
+        logging.error(f"Erro ao gerar relatório de disponibilidade da VLAN {vlan}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Endpoint com os contadores do enriquecimento (cache de DNS reverso/MAC/fabricante)
+@app.route('/api/enrichment/status')
+@app.route(RAIZ + '/api/enrichment/status')
+def enrichment_status():
+    try:
+        return jsonify({'success': True, 'status': enrichment_service.get_status()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Endpoint para testar configurações
 @app.route('/api/config/test', methods=['POST'])
 @app.route(RAIZ + '/api/config/test', methods=['POST'])
@@ -446,6 +1164,45 @@ def validate_config_data(data):
             if 'retry_attempts' in network:
                 if not isinstance(network['retry_attempts'], int) or network['retry_attempts'] < 0 or network['retry_attempts'] > 5:
                     return False
+            if 'adaptive_timeout' in network and not isinstance(network['adaptive_timeout'], bool):
+                return False
+            if 'rto_floor' in network:
+                # O teto do timeout adaptativo é o próprio ping_timeout
+                rto_floor = network['rto_floor']
+                if isinstance(rto_floor, bool) or not isinstance(rto_floor, (int, float)) or not 0.05 <= rto_floor <= 10:
+                    return False
+            if 'scan_mode' in network and network['scan_mode'] not in ('full', 'tiered'):
+                return False
+            if 'registered_interval' in network:
+                if not isinstance(network['registered_interval'], (int, float)) or not 2 <= network['registered_interval'] <= 300:
+                    return False
+            if 'tier_probe_budget' in network:
+                if not isinstance(network['tier_probe_budget'], int) or network['tier_probe_budget'] < 16 or network['tier_probe_budget'] > 254:
+                    return False
+            if 'discovery_min_slice' in network:
+                if not isinstance(network['discovery_min_slice'], int) or network['discovery_min_slice'] < 1 or network['discovery_min_slice'] > 254:
+                    return False
+            if 'sweep_deadline' in network:
+                deadline = network['sweep_deadline']
+                if not isinstance(deadline, (int, float)) or (deadline != 0 and not 5 <= deadline <= 300):
+                    return False
+        
+        # Validar configurações dos agentes remotos
+        if 'agents' in data and 'stale_after_cycles' in data['agents']:
+            stale_after = data['agents']['stale_after_cycles']
+            if not isinstance(stale_after, int) or isinstance(stale_after, bool) or not 1 <= stale_after <= 100:
+                return False
+        
+        # Validar configurações de alerta
+        if 'monitoring' in data:
+            monitoring = data['monitoring']
+            if 'alert_debounce_samples' in monitoring:
+                if not isinstance(monitoring['alert_debounce_samples'], (int, float)) or monitoring['alert_debounce_samples'] < 1 or monitoring['alert_debounce_samples'] > 10:
+                    return False
+            if 'alert_webhook_url' in monitoring:
+                url = monitoring['alert_webhook_url']
+                if not isinstance(url, str) or (url and not url.startswith(('http://', 'https://'))):
+                    return False
         
         return True
     except Exception as e:
@@ -454,51 +1211,119 @@ def validate_config_data(data):
 
 # Função para reiniciar o serviço de background
 def restart_background_service():
-    """Reinicia o serviço de background com as novas configurações"""
-    global should_stop, background_thread
-    
-    # Sinalizar para parar o thread atual
-    should_stop = True
-    
-    # Aguardar um pouco para o thread atual parar
-    time.sleep(2)
-    
-    # Resetar flag e iniciar novo serviço
-    should_stop = False
-    start_background_service()
+    """
+    Reinicia o serviço de background com as novas configurações, sem esperar o
+    loop atual: ele é cancelado e inicia o sucessor quando terminar. Retorna
+    True se o novo loop já foi iniciado e False se o reinício ficou pendente.
+    """
+    global background_cancel
+    with service_lock:
+        background_cancel.set()
+        # O loop cancelado guarda a referência ao sinal dele; reverificações novas já usam o do sucessor
+        background_cancel = threading.Event()
+        return _start_background_locked()
+
+# Cancela o loop atual e espera ele terminar. As varreduras em andamento param de
+# enviar sondas na hora e terminam em até um timeout de sonda.
+def stop_background_service():
+    global background_restart_pending
+    with service_lock:
+        background_cancel.set()
+        background_restart_pending = False
+        thread = background_thread
+        # As sondas em andamento usam o timeout de quando o loop começou, não o recém-salvo
+        limite = background_ping_timeout + 5
+    # Fora do service_lock: o loop o usa ao terminar (ver _background_loop_exited)
+    if thread is not None and thread.is_alive():
+        thread.join(limite)
+        if thread.is_alive():
+            logging.warning(f"[BACKGROUND] Loop anterior não terminou em {limite}s; ele já está cancelado e não inicia novas varreduras")
+
+def _background_loop_exited(thread):
+    """Chamado pelo próprio loop ao terminar: libera a vaga e inicia o sucessor pendente"""
+    global background_thread, background_restart_pending
+    with service_lock:
+        if background_thread is not thread:
+            return
+        background_thread = None
+        if background_restart_pending:
+            background_restart_pending = False
+            _start_background_locked()
 
 # Função que inicia o serviço de verificação de IPs em segundo plano.
 def start_background_service():
-    global background_thread, should_stop
+    with service_lock:
+        # Agregados de disponibilidade e last_seen do inventário persistidos só no servidor
+        availability_tracker.enable_persistence()
+        inventory_reconciler.enable_persistence()
+        _start_background_locked()
+
+def _start_background_locked():
+    """Inicia o loop; retorna False se ainda houver um loop ativo (pendente se ele foi cancelado)"""
+    global background_thread, background_cancel, background_ping_timeout, background_restart_pending
+    
+    # Nunca mantém dois loops ativos: um loop cancelado que ainda está terminando
+    # inicia o sucessor ao sair
+    if background_thread is not None and background_thread.is_alive():
+        if background_thread.cancel.is_set():
+            background_restart_pending = True
+            logging.info("[BACKGROUND] Reinício pendente: o loop anterior inicia o novo ao terminar")
+        else:
+            logging.info("[BACKGROUND] Serviço de verificação já está em execução")
+        return False
     
     print("Iniciando serviço de verificação em background.")
+    # Um sinal novo só depois de um cancelamento: reverificações iniciadas antes da
+    # primeira partida já usam o sinal atual e também são canceladas no próximo restart
+    if background_cancel.is_set():
+        background_cancel = threading.Event()
+    cancel = background_cancel
+    background_ping_timeout = config_manager.get_config('network_settings').get('ping_timeout', 2)
     
     # Função interna que define um loop de verificação das VLANs.
     def check_loop():
-        while not should_stop:
+        try:
+            _check_loop()
+        finally:
+            _background_loop_exited(threading.current_thread())
+
+    def _check_loop():
+        while not cancel.is_set():
+            # IPs de agentes remotos que pararam de enviar deixam de mostrar o último estado
+            expire_stale_agents()
+            
             # Obter VLANs ativas das configurações
             vlan_list = config_manager.get_active_vlans()
             
+            # VLANs cobertas por agentes remotos não são varridas localmente
+            remote_vlans = config_manager.get_config('agents').get('remote_vlans', [])
+            vlan_list = [vlan for vlan in vlan_list if vlan not in remote_vlans]
+            
             # Usar configurações de concurrent pings
             max_workers = config_manager.get_config('network_settings').get('max_concurrent_pings', 3)
             
             # Usar um pool de threads para verificar VLANs simultaneamente
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                executor.map(background_ip_check, vlan_list)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scanner') as executor:
+                executor.map(background_ip_check, vlan_list, [cancel] * len(vlan_list))
             
             # Aguardar intervalo configurado (usar o menor intervalo como base)
             ping_intervals = config_manager.get_config('ping_intervals')
             min_interval = min(ping_intervals.values()) if ping_intervals else 10
             
-            # Verificar se deve parar durante o sleep
-            for _ in range(int(min_interval)):
-                if should_stop:
-                    break
-                time.sleep(1)
+            # No modo em camadas o ciclo segue o intervalo dos cadastrados; a descoberta
+            # de cada VLAN continua no intervalo dela (ver ip_operations.DescobertaRotativa)
+            network_config = config_manager.get_config('network_settings')
+            if network_config.get('scan_mode') == 'tiered':
+                min_interval = min(min_interval, network_config.get('registered_interval', 10))
+            
+            # Espera o intervalo, acordando imediatamente se o loop for cancelado
+            cancel.wait(min_interval)
 
     # Inicia a execução do loop de verificação em uma nova thread.
-    background_thread = threading.Thread(target=check_loop, daemon=True)
+    background_thread = threading.Thread(target=check_loop, name='check_loop', daemon=True)
+    background_thread.cancel = cancel
     background_thread.start()
+    return True
     
 # Ponto de entrada da aplicação. Executa o Flask quando o script é rodado diretamente.
 if __name__ == '__main__':
@@ -350,6 +350,10 @@ function setupHelpTooltips() {
         'ping_timeout': 'Tempo limite para cada ping individual. Valores muito baixos podem gerar falsos positivos.',
         'max_concurrent_pings': 'Número máximo de pings executados simultaneamente. Mais threads = verificação mais rápida.',
         'retry_attempts': 'Quantas vezes tentar fazer ping antes de considerar o dispositivo offline.',
+        'sweep_deadline': 'Tempo máximo de cada varredura de VLAN. Hosts não concluídos no prazo aparecem como "sem resultado".',
+        'scan_mode': 'Em camadas: os dispositivos cadastrados são verificados a todo ciclo e o restante da faixa aos poucos.',
+        'registered_interval': 'No modo em camadas, intervalo entre as verificações dos dispositivos cadastrados. A descoberta do restante da faixa segue o intervalo de cada VLAN.',
+        'tier_probe_budget': 'No modo em camadas, total de IPs sondados por VLAN a cada ciclo (cadastrados + descoberta).',
         'refresh_rate': 'Frequência de atualização automática da interface em segundos.',
         'max_log_entries': 'Número máximo de entradas de log mantidas no sistema.',
     };
@@ -8,9 +8,249 @@ function getApiBaseUrl() {
     }
 }
 
+// ====================================
+// MODELO DE LINHAS (RENDERIZAÇÃO INCREMENTAL)
+// ====================================
+
+// Acima deste número de dispositivos a grade renderiza apenas a janela visível
+const VIRTUALIZATION_THRESHOLD = 600;
+
+// Linhas extras renderizadas acima e abaixo da janela visível
+const VIRTUAL_OVERSCAN_ROWS = 4;
+
+// Modelo indexado por IP: guarda os dados atuais e os cards já criados,
+// para que cada atualização altere somente o que mudou
+const renderModel = {
+    vlan: null,
+    order: [],              // IPs na ordem recebida da API
+    devices: new Map(),     // ip -> dados atuais do dispositivo
+    cards: new Map(),       // ip -> elemento do card (apenas os criados)
+    virtual: false,
+    windowRange: null,      // [início, fim) renderizado no modo virtualizado
+    benchmarkRunning: false,
+    stats: { updates: 0, lastMs: 0, totalMs: 0, lastChanged: 0 }
+};
+
+// Campos que, ao mudar, exigem atualizar o card
+function deviceSignature(device) {
+    return `${device.status}|${device.descricao}|${device.tipo}|${device.hostname}|${device.mac}`;
+}
+
+// Descarta o modelo atual (troca de VLAN ou lista vazia)
+function resetRenderModel(vlan) {
+    renderModel.vlan = vlan;
+    renderModel.order = [];
+    renderModel.devices.clear();
+    renderModel.cards.clear();
+    renderModel.windowRange = null;
+    document.getElementById('devices-container').innerHTML = '';
+}
+
+// Aplica uma nova lista da API ao modelo e atualiza o DOM de forma incremental.
+// Retorna o número de dispositivos alterados.
+function renderDevices(data, vlan) {
+    const start = performance.now();
+    const container = document.getElementById('devices-container');
+
+    if (renderModel.vlan !== vlan) {
+        resetRenderModel(vlan);
+    }
+
+    // Verifica se há dados para exibir
+    if (data.length === 0) {
+        resetRenderModel(vlan);
+        container.innerHTML = '<div class="no-devices">📭 Nenhum dispositivo encontrado nesta VLAN</div>';
+        return 0;
+    }
+
+    const placeholder = container.querySelector('.no-devices');
+    if (placeholder) {
+        placeholder.remove();
+    }
+
+    // Atualiza apenas os cards cujos dados mudaram
+    let changed = 0;
+    const seen = new Set();
+    data.forEach(device => {
+        seen.add(device.ip);
+        const previous = renderModel.devices.get(device.ip);
+        if (previous && deviceSignature(previous) === deviceSignature(device)) {
+            return;
+        }
+        renderModel.devices.set(device.ip, device);
+        changed++;
+
+        const card = renderModel.cards.get(device.ip);
+        if (card) {
+            updateDeviceCard(card, device);
+        }
+    });
+
+    // Remove dispositivos que não vieram mais na resposta
+    renderModel.devices.forEach((_, ip) => {
+        if (!seen.has(ip)) {
+            renderModel.devices.delete(ip);
+            removeDeviceCard(ip);
+            changed++;
+        }
+    });
+
+    const order = data.map(device => device.ip);
+    const orderChanged = order.length !== renderModel.order.length ||
+        order.some((ip, i) => ip !== renderModel.order[i]);
+    renderModel.order = order;
+
+    const virtual = order.length > VIRTUALIZATION_THRESHOLD;
+    if (virtual !== renderModel.virtual) {
+        renderModel.virtual = virtual;
+        renderModel.windowRange = null;
+    }
+
+    if (renderModel.virtual) {
+        renderWindow(orderChanged);
+    } else if (orderChanged) {
+        renderAllCards(vlan);
+    }
+
+    // Métricas da atualização (exibidas pelo painel de benchmark)
+    const elapsed = performance.now() - start;
+    renderModel.stats.updates++;
+    renderModel.stats.lastMs = elapsed;
+    renderModel.stats.totalMs += elapsed;
+    renderModel.stats.lastChanged = changed;
+    updateBenchmarkPanel();
+
+    return changed;
+}
+
+// Obtém (ou cria) o card de um IP
+function getOrCreateCard(ip) {
+    let card = renderModel.cards.get(ip);
+    if (!card) {
+        card = createDeviceCard(renderModel.devices.get(ip), renderModel.vlan);
+        renderModel.cards.set(ip, card);
+    }
+    return card;
+}
+
+// Remove o card de um IP do DOM e do cache
+function removeDeviceCard(ip) {
+    const card = renderModel.cards.get(ip);
+    if (card) {
+        card.remove();
+        renderModel.cards.delete(ip);
+    }
+}
+
+// Modo normal: todos os cards no DOM, na ordem da API
+function renderAllCards() {
+    const container = document.getElementById('devices-container');
+    const fragment = document.createDocumentFragment();
+
+    renderModel.order.forEach(ip => {
+        fragment.appendChild(getOrCreateCard(ip));
+    });
+
+    container.querySelectorAll('.virtual-spacer').forEach(spacer => spacer.remove());
+    container.appendChild(fragment);
+}
+
+// Cria um espaçador que ocupa a largura toda da grade
+function createSpacer(position) {
+    const spacer = document.createElement('div');
+    spacer.className = `virtual-spacer virtual-spacer-${position}`;
+    spacer.style.gridColumn = '1 / -1';
+    return spacer;
+}
+
+// Mede colunas e altura de linha da grade para o modo virtualizado
+function measureGrid(container) {
+    const style = getComputedStyle(container);
+    const columns = Math.max(1, style.gridTemplateColumns.split(' ').length);
+    const gap = parseFloat(style.rowGap) || 0;
+    const sample = container.querySelector('.device-card');
+    const cardHeight = sample ? sample.offsetHeight : 180;
+    return { columns, gap, rowHeight: cardHeight + gap };
+}
+
+// Modo virtualizado: mantém no DOM apenas as linhas próximas da área visível
+function renderWindow(force = false) {
+    const container = document.getElementById('devices-container');
+    const order = renderModel.order;
+
+    // Garante ao menos um card para medir a altura das linhas
+    if (!container.querySelector('.device-card') && order.length > 0) {
+        container.appendChild(getOrCreateCard(order[0]));
+    }
+
+    const { columns, gap, rowHeight } = measureGrid(container);
+    const totalRows = Math.ceil(order.length / columns);
+    const scrolled = Math.max(0, -container.getBoundingClientRect().top);
+
+    const firstRow = Math.max(0, Math.floor(scrolled / rowHeight) - VIRTUAL_OVERSCAN_ROWS);
+    const lastRow = Math.min(totalRows, Math.ceil((scrolled + window.innerHeight) / rowHeight) + VIRTUAL_OVERSCAN_ROWS);
+    const from = firstRow * columns;
+    const to = Math.min(order.length, lastRow * columns);
+
+    const range = renderModel.windowRange;
+    if (!force && range && range[0] === from && range[1] === to) {
+        return;
+    }
+    renderModel.windowRange = [from, to];
+
+    // Descarta os cards que saíram da janela
+    const visible = new Set(order.slice(from, to));
+    Array.from(renderModel.cards.keys()).forEach(ip => {
+        if (!visible.has(ip)) {
+            removeDeviceCard(ip);
+        }
+    });
+
+    const topSpacer = container.querySelector('.virtual-spacer-top') || createSpacer('top');
+    const bottomSpacer = container.querySelector('.virtual-spacer-bottom') || createSpacer('bottom');
+    const rowsAbove = firstRow;
+    const rowsBelow = totalRows - lastRow;
+    topSpacer.style.display = rowsAbove > 0 ? '' : 'none';
+    topSpacer.style.height = `${Math.max(0, rowsAbove * rowHeight - gap)}px`;
+    bottomSpacer.style.display = rowsBelow > 0 ? '' : 'none';
+    bottomSpacer.style.height = `${Math.max(0, rowsBelow * rowHeight - gap)}px`;
+
+    const fragment = document.createDocumentFragment();
+    fragment.appendChild(topSpacer);
+    for (let i = from; i < to; i++) {
+        fragment.appendChild(getOrCreateCard(order[i]));
+    }
+    fragment.appendChild(bottomSpacer);
+    container.appendChild(fragment);
+}
+
+// Recalcula a janela virtualizada no scroll/resize (no máximo uma vez por frame)
+let windowRenderScheduled = false;
+function scheduleWindowRender() {
+    if (!renderModel.virtual || windowRenderScheduled) {
+        return;
+    }
+    windowRenderScheduled = true;
+    requestAnimationFrame(() => {
+        windowRenderScheduled = false;
+        renderWindow();
+    });
+}
+
+window.addEventListener('scroll', scheduleWindowRender, { passive: true });
+window.addEventListener('resize', () => {
+    renderModel.windowRange = null;
+    scheduleWindowRender();
+});
+
 // Função assíncrona para buscar dados com base na VLAN selecionada
 async function searchByVlan() {
 
+    // Não interfere no benchmark em andamento
+    if (renderModel.benchmarkRunning) {
+        return;
+    }
+
     // Obtém o elemento do select com ID 'filtroVLAN'
     const vlanSelect = document.getElementById('filtroVLAN');
 
@@ -50,111 +290,270 @@ async function searchByVlan() {
         // Converte a resposta em JSON
         const data = await response.json();
 
-        // Log para diagnóstico
-        console.log('[INDEX.JS] Dados recebidos da API:', data.length, 'itens');
-        const itemsComTipo = data.filter(item => item.tipo && item.tipo.trim() !== '');
-        console.log('[INDEX.JS] Items com tipo:', itemsComTipo.length);
-        if (itemsComTipo.length > 0) {
-            console.log('[INDEX.JS] Exemplo com tipo:', itemsComTipo[0]);
+        // O benchmark pode ter começado enquanto a requisição estava em andamento
+        if (renderModel.benchmarkRunning) {
+            return;
         }
 
-        // Obtém o corpo da tabela com os IPs
-        const tbody = document.getElementById('ipTableBody');
-        
-        // Limpa a tabela antes de inserir novos elementos
-        tbody.innerHTML = '';  
+        // Atualiza apenas os cards que mudaram desde a última consulta
+        const changed = renderDevices(data, vlan);
+        console.log(`[INDEX.JS] ${data.length} itens recebidos, ${changed} alterados, render em ${renderModel.stats.lastMs.toFixed(1)} ms`);
 
-        // Obtém o container de cards
-        const cardsContainer = document.getElementById('devices-container');
-        
-        // Limpa o container antes de inserir novos cards
-        cardsContainer.innerHTML = '';
+        // A tabela antiga só é montada se estiver visível
+        if (document.getElementById('main_table').style.display !== 'none') {
+            renderFallbackTable(data, vlan);
+        }
+    }
 
-        // Verifica se há dados para exibir
-        if (data.length === 0) {
-            cardsContainer.innerHTML = '<div class="no-devices">📭 Nenhum dispositivo encontrado nesta VLAN</div>';
+    loadTypeSummary();
+    loadInventory(vlan);
+}
+
+// Resumo de online/cadastrados por tipo em todas as VLANs (GET /api/facets/types)
+async function loadTypeSummary() {
+    const container = document.getElementById('type-summary');
+    try {
+        const response = await fetch(`${getApiBaseUrl()}/api/facets/types`);
+        if (!response.ok) {
             return;
         }
+        const result = await response.json();
 
-        // Cria cards para cada dispositivo
-        data.forEach(device => {
-            const card = createDeviceCard(device, vlan);
-            cardsContainer.appendChild(card);
-        });
+        const fragment = document.createDocumentFragment();
+        for (const facet of result.facets) {
+            if (!facet.tipo) {
+                continue;  // Dispositivos sem tipo não entram no resumo
+            }
+            const item = document.createElement('span');
+            item.className = 'type-summary-item' + (facet.offline > 0 ? ' has-offline' : '');
+            const nome = document.createElement('strong');
+            nome.textContent = facet.tipo;
+            item.appendChild(nome);
+            item.appendChild(document.createTextNode(`${facet.online}/${facet.registered} online`));
+            item.title = Object.entries(facet.vlans)
+                .map(([vlan, counts]) => `VLAN ${vlan}: ${counts.online}/${counts.registered}`)
+                .join('\n');
+            fragment.appendChild(item);
+        }
+        container.replaceChildren(fragment);
+        container.style.display = container.children.length ? 'flex' : 'none';
+    } catch (error) {
+        console.error('[INDEX.JS] Erro ao carregar resumo por tipo:', error);
+    }
+}
 
-        // Mantém a lógica antiga da tabela (oculta) como fallback
-        var QTD_COLUNAS = 4;
-
-        // Percorre os dados recebidos e cria linhas para a tabela
-        for (let i = 0; i < data.length; i += QTD_COLUNAS) {
-            const row = document.createElement('tr');
-
-            // Cria células para colunas de dados por linha
-            for (let j = 0; j < QTD_COLUNAS; j++) {
-                const descriptionCell = document.createElement('td');
-                const tipoCell = document.createElement('td');
-                const ipCell = document.createElement('td');
-                const statusCell = document.createElement('td');
-                const circle = document.createElement('span');
-
-                // Verifica se há dados para a célula atual
-                if (data[i + j]) {
-                    const device = data[i + j];
-                    
-                    // Célula de descrição (sem ícone agora)
-                    descriptionCell.textContent = device.descricao;
-                    
-                    // Célula de IP clicável com ícone de edição
-                    ipCell.className = 'ip-cell';
-                    ipCell.title = 'Clique para editar este dispositivo';
-                    
-                    const ipText = document.createElement('span');
-                    ipText.className = 'ip-text';
-                    ipText.textContent = device.ip;
-                    
-                    const editIcon = document.createElement('span');
-                    editIcon.innerHTML = '✏️';
-                    editIcon.className = 'edit-icon';
-                    editIcon.title = 'Editar dispositivo';
-                    
-                    // Fazer toda a célula de IP clicável
-                    ipCell.onclick = function() {
-                        openEditModal(device.ip, device.descricao, device.tipo, vlan);
-                    };
-                    
-                    ipCell.appendChild(ipText);
-                    ipCell.appendChild(editIcon);
-                    
-                    tipoCell.textContent = device.tipo || '-';
-
-                    // Verifica o status do dispositivo e aplica a classe correta
-                    if (device.status === "on") {
-                        circle.classList.add('circle', 'green'); // Aplica a classe 'green' para dispositivos online
-                    } else if (device.status === "off") {
-                        circle.classList.add('circle', 'red'); // Aplica a classe 'red' para dispositivos offline
-                    }
-                } else {
-                    // Células vazias para manter estrutura da tabela
-                    tipoCell.textContent = '';
-                }
+// Online não cadastrados e cadastrados sem resposta da VLAN (GET /api/inventory/reconciliation)
+async function loadInventory(vlan) {
+    const panel = document.getElementById('inventory-panel');
+    try {
+        const response = await fetch(`${getApiBaseUrl()}/api/inventory/reconciliation?vlan=${vlan}`);
+        if (!response.ok) {
+            return;
+        }
+        const result = await response.json();
+        const entry = result.vlans[vlan];
+        if (!entry) {
+            panel.style.display = 'none';
+            return;
+        }
 
-                // Aplica as classes corretas para cada coluna
-                tipoCell.classList.add(`tipo_${String.fromCharCode(65 + j)}`);
-                statusCell.classList.add(`status_${String.fromCharCode(65 + j)}`);
+        const formatSeen = (ts) => ts ? new Date(ts * 1000).toLocaleString('pt-BR') : 'nunca';
+        fillInventoryList('inventory-unregistered',
+            `${entry.unregistered_online.length} online sem cadastro`,
+            entry.unregistered_online.map((d) => d.ip));
+        fillInventoryList('inventory-stale',
+            `${entry.stale_registered.length} cadastrados sem resposta há ${result.days} dias (desde ${formatSeen(result.tracking_since)})`,
+            entry.stale_registered.map((d) => `${d.ip} - ${d.descricao}${d.tipo ? ` (${d.tipo})` : ''} - visto: ${formatSeen(d.last_seen)}`));
+        panel.style.display = 'block';
+    } catch (error) {
+        console.error('[INDEX.JS] Erro ao carregar conciliação do inventário:', error);
+    }
+}
+
+function fillInventoryList(id, title, lines) {
+    const details = document.getElementById(id);
+    details.querySelector('summary').textContent = title;
+    details.classList.toggle('has-items', lines.length > 0);
+    const fragment = document.createDocumentFragment();
+    for (const line of lines) {
+        const li = document.createElement('li');
+        li.textContent = line;
+        fragment.appendChild(li);
+    }
+    details.querySelector('ul').replaceChildren(fragment);
+}
+
+// Monta a tabela antiga (mantida oculta como fallback)
+function renderFallbackTable(data, vlan) {
+    // Obtém o corpo da tabela com os IPs
+    const tbody = document.getElementById('ipTableBody');
+    
+    // Limpa a tabela antes de inserir novos elementos
+    tbody.innerHTML = '';  
 
-                // Adiciona o círculo de status à célula de status
-                statusCell.appendChild(circle);
+    var QTD_COLUNAS = 4;
+
+    // Percorre os dados recebidos e cria linhas para a tabela
+    for (let i = 0; i < data.length; i += QTD_COLUNAS) {
+        const row = document.createElement('tr');
+
+        // Cria células para colunas de dados por linha
+        for (let j = 0; j < QTD_COLUNAS; j++) {
+            const descriptionCell = document.createElement('td');
+            const tipoCell = document.createElement('td');
+            const ipCell = document.createElement('td');
+            const statusCell = document.createElement('td');
+            const circle = document.createElement('span');
+
+            // Verifica se há dados para a célula atual
+            if (data[i + j]) {
+                const device = data[i + j];
+                
+                // Célula de descrição (sem ícone agora)
+                descriptionCell.textContent = device.descricao;
+                
+                // Célula de IP clicável com ícone de edição
+                ipCell.className = 'ip-cell';
+                ipCell.title = 'Clique para editar este dispositivo';
+                
+                const ipText = document.createElement('span');
+                ipText.className = 'ip-text';
+                ipText.textContent = device.ip;
                 
-                // Adiciona as células à linha
-                row.appendChild(descriptionCell);
-                row.appendChild(tipoCell);
-                row.appendChild(ipCell);
-                row.appendChild(statusCell);
+                const editIcon = document.createElement('span');
+                editIcon.innerHTML = '✏️';
+                editIcon.className = 'edit-icon';
+                editIcon.title = 'Editar dispositivo';
+                
+                // Fazer toda a célula de IP clicável
+                ipCell.onclick = function() {
+                    openEditModal(device.ip, device.descricao, device.tipo, vlan);
+                };
+                
+                ipCell.appendChild(ipText);
+                ipCell.appendChild(editIcon);
+                
+                tipoCell.textContent = device.tipo || '-';
+
+                // Verifica o status do dispositivo e aplica a classe correta
+                if (device.status === "on") {
+                    circle.classList.add('circle', 'green'); // Aplica a classe 'green' para dispositivos online
+                } else if (device.status === "off") {
+                    circle.classList.add('circle', 'red'); // Aplica a classe 'red' para dispositivos offline
+                }
+            } else {
+                // Células vazias para manter estrutura da tabela
+                tipoCell.textContent = '';
             }
 
-            // Adiciona a linha à tabela
-            tbody.appendChild(row);
+            // Aplica as classes corretas para cada coluna
+            tipoCell.classList.add(`tipo_${String.fromCharCode(65 + j)}`);
+            statusCell.classList.add(`status_${String.fromCharCode(65 + j)}`);
+
+            // Adiciona o círculo de status à célula de status
+            statusCell.appendChild(circle);
+            
+            // Adiciona as células à linha
+            row.appendChild(descriptionCell);
+            row.appendChild(tipoCell);
+            row.appendChild(ipCell);
+            row.appendChild(statusCell);
+        }
+
+        // Adiciona a linha à tabela
+        tbody.appendChild(row);
+    }
+}
+
+// Reverifica a VLAN selecionada agora. O servidor agrupa cliques simultâneos em
+// uma única varredura e devolve um resultado por host (NDJSON) à medida que chegam.
+async function rescanCurrentVlan() {
+    const vlan = encodeURIComponent(document.getElementById('filtroVLAN').value);
+    const button = document.getElementById('botaoReverificar');
+    button.disabled = true;
+    button.textContent = '⏳ Verificando...';
+
+    try {
+        const baseUrl = getApiBaseUrl();
+        const response = await fetch(`${baseUrl}/api/rescan`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ targets: [vlan] })
+        });
+
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            alert('❌ Não foi possível reverificar: ' + (data.error || response.status));
+            return;
+        }
+
+        // Sem vaga de streaming no servidor: acompanha a varredura pelo status
+        if (response.status === 202) {
+            const data = await response.json();
+            await waitRescan(data.rescan.key);
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            applyRescanLines(lines, vlan);
+        }
+    } catch (error) {
+        console.error('Erro ao reverificar VLAN:', error);
+    } finally {
+        button.disabled = false;
+        button.textContent = '🔄 Reverificar';
+        searchByVlan();
+    }
+}
+
+// Espera a reverificação `key` terminar consultando /api/rescan/status
+async function waitRescan(key) {
+    const baseUrl = getApiBaseUrl();
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch(`${baseUrl}/api/rescan/status`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        const flight = data.status.flights.find(f => f.key === key);
+        if (!flight || flight.done) {
+            return;
+        }
+    }
+}
+
+// Aplica ao modelo de linhas os status recebidos da reverificação
+function applyRescanLines(lines, vlan) {
+    if (renderModel.vlan !== vlan) {
+        return;
+    }
+
+    const updates = new Map();
+    lines.forEach(line => {
+        if (!line.trim()) {
+            return;
         }
+        const record = JSON.parse(line);
+        const current = renderModel.devices.get(record.ip);
+        if (record.type === 'host' && current && current.status !== record.status) {
+            updates.set(record.ip, { ...current, status: record.status });
+        }
+    });
+
+    if (updates.size > 0) {
+        const data = renderModel.order.map(ip => updates.get(ip) || renderModel.devices.get(ip));
+        renderDevices(data, vlan);
     }
 }
 
@@ -166,11 +565,11 @@ function updateGateway(vlan) {
     }
 }
 
-// Função para criar um card de dispositivo
+// Função para criar um card de dispositivo. A estrutura é criada uma única vez;
+// o conteúdo é preenchido (e depois atualizado) por updateDeviceCard.
 function createDeviceCard(device, vlan) {
     // Criar elementos do card
     const card = document.createElement('div');
-    card.className = `device-card ${device.status === 'on' ? 'online' : 'offline'}`;
     
     // Header do card
     const header = document.createElement('div');
@@ -178,16 +577,15 @@ function createDeviceCard(device, vlan) {
     
     // Badge de status
     const statusBadge = document.createElement('div');
-    statusBadge.className = `status-badge ${device.status === 'on' ? 'online' : 'offline'}`;
-    statusBadge.innerHTML = `
-        <span class="status-indicator"></span>
-        <span>${device.status === 'on' ? 'Online' : 'Offline'}</span>
-    `;
+    const statusIndicator = document.createElement('span');
+    statusIndicator.className = 'status-indicator';
+    const statusText = document.createElement('span');
+    statusBadge.appendChild(statusIndicator);
+    statusBadge.appendChild(statusText);
     
     // IP do dispositivo
     const ipElement = document.createElement('div');
     ipElement.className = 'device-ip';
-    ipElement.textContent = device.ip;
     
     header.appendChild(statusBadge);
     header.appendChild(ipElement);
@@ -199,31 +597,37 @@ function createDeviceCard(device, vlan) {
     // Descrição
     const description = document.createElement('div');
     description.className = 'device-description';
-    description.textContent = device.descricao || 'Sem descrição';
-    description.title = device.descricao; // Tooltip com texto completo
     
     // Tipo do dispositivo
     const typeElement = document.createElement('div');
     typeElement.className = 'device-type';
-    typeElement.innerHTML = `
-        <span class="device-type-icon">🏷️</span>
-        <span>${device.tipo || 'Não definido'}</span>
-    `;
+    const typeIcon = document.createElement('span');
+    typeIcon.className = 'device-type-icon';
+    typeIcon.textContent = '🏷️';
+    const typeText = document.createElement('span');
+    typeElement.appendChild(typeIcon);
+    typeElement.appendChild(typeText);
+    
+    // Nome DNS, MAC e fabricante (quando disponíveis)
+    const extraElement = document.createElement('div');
+    extraElement.className = 'device-extra';
     
     body.appendChild(description);
     body.appendChild(typeElement);
+    body.appendChild(extraElement);
     
     // Footer do card
     const footer = document.createElement('div');
     footer.className = 'device-card-footer';
     
-    // Botão de edição
+    // Botão de edição (usa sempre os dados atuais do card)
     const editBtn = document.createElement('button');
     editBtn.className = 'card-edit-btn';
     editBtn.innerHTML = '✏️ Editar';
     editBtn.onclick = function(e) {
         e.stopPropagation(); // Evita propagação do clique
-        openEditModal(device.ip, device.descricao, device.tipo, vlan);
+        const current = card.deviceData;
+        openEditModal(current.ip, current.descricao, current.tipo, vlan);
     };
     
     footer.appendChild(editBtn);
@@ -236,13 +640,39 @@ function createDeviceCard(device, vlan) {
     // Fazer o card inteiro clicável (exceto o botão)
     card.onclick = function(e) {
         if (e.target !== editBtn && !editBtn.contains(e.target)) {
-            openEditModal(device.ip, device.descricao, device.tipo, vlan);
+            const current = card.deviceData;
+            openEditModal(current.ip, current.descricao, current.tipo, vlan);
         }
     };
     
+    // Referências usadas nas atualizações incrementais
+    card.refs = { statusBadge, statusText, ipElement, description, typeText, extraElement };
+    updateDeviceCard(card, device);
+    
     return card;
 }
 
+// Atualiza um card existente com os dados atuais do dispositivo
+function updateDeviceCard(card, device) {
+    const refs = card.refs;
+    // 'unknown': a varredura foi interrompida (prazo ou cancelamento) antes de concluir o host
+    const state = device.status === 'on' ? 'online' : (device.status === 'unknown' ? 'unknown' : 'offline');
+    
+    card.deviceData = device;
+    card.className = `device-card ${state}`;
+    refs.statusBadge.className = `status-badge ${state}`;
+    refs.statusText.textContent = { online: 'Online', offline: 'Offline', unknown: 'Sem resultado' }[state];
+    refs.ipElement.textContent = device.ip;
+    refs.description.textContent = device.descricao || 'Sem descrição';
+    refs.description.title = device.descricao; // Tooltip com texto completo
+    refs.typeText.textContent = device.tipo || 'Não definido';
+    
+    const extra = [device.hostname, device.mac, device.vendor].filter(Boolean).join(' · ');
+    refs.extraElement.textContent = extra;
+    refs.extraElement.title = extra;
+    refs.extraElement.style.display = extra ? '' : 'none';
+}
+
 // Função para mostrar informações da VLAN selecionada
 function updateVlanInfo(vlan) {
     // Oculta todas as informações de VLAN
@@ -280,6 +710,121 @@ window.onload = function() {
 // Eu acho que isso não é mais necessário?
 setInterval(searchByVlan, 20000);
 
+// ====================================
+// BENCHMARK DE RENDERIZAÇÃO
+// ====================================
+// Abra a página com ?bench=1 para exibir o painel, ou chame
+// runRenderBenchmark(tamanho, atualizações, taxaDeMudança) no console.
+
+// Gera uma lista sintética no formato de /api/start-check
+function generateBenchmarkData(size) {
+    const data = [];
+    for (let i = 0; i < size; i++) {
+        data.push({
+            ip: `10.${Math.floor(i / 65536) % 256}.${Math.floor(i / 256) % 256}.${i % 256}`,
+            status: Math.random() < 0.8 ? 'on' : 'off',
+            descricao: i % 4 === 0 ? `Dispositivo ${i}` : '-',
+            tipo: i % 8 === 0 ? 'Câmera IP' : ''
+        });
+    }
+    return data;
+}
+
+// Mede o tempo de cada atualização (incluindo o layout forçado) sobre dados sintéticos
+async function runRenderBenchmark(size = 254, updates = 50, changeRate = 0.05) {
+    const container = document.getElementById('devices-container');
+    renderModel.benchmarkRunning = true;
+
+    try {
+        let data = generateBenchmarkData(size);
+        const times = [];
+
+        for (let n = 0; n <= updates; n++) {
+            if (n > 0) {
+                // Altera o status de uma fração dos dispositivos a cada atualização
+                data = data.map(device => Math.random() < changeRate
+                    ? { ...device, status: device.status === 'on' ? 'off' : 'on' }
+                    : device);
+            }
+
+            const start = performance.now();
+            renderDevices(data, 'benchmark');
+            void container.offsetHeight; // Força o layout para incluí-lo na medição
+            const elapsed = performance.now() - start;
+
+            // A primeira renderização (criação de todos os cards) é reportada à parte
+            if (n > 0) {
+                times.push(elapsed);
+            } else {
+                console.log(`[BENCH] Renderização inicial de ${size} itens: ${elapsed.toFixed(1)} ms`);
+            }
+
+            // Cede o controle ao navegador entre as atualizações
+            await new Promise(resolve => requestAnimationFrame(resolve));
+        }
+
+        times.sort((a, b) => a - b);
+        const percentile = p => times[Math.min(times.length - 1, Math.floor(p * times.length))];
+        const result = {
+            itens: size,
+            atualizacoes: updates,
+            taxa_mudanca: changeRate,
+            virtualizado: renderModel.virtual,
+            media_ms: +(times.reduce((a, b) => a + b, 0) / times.length).toFixed(2),
+            p50_ms: +percentile(0.5).toFixed(2),
+            p95_ms: +percentile(0.95).toFixed(2),
+            max_ms: +times[times.length - 1].toFixed(2)
+        };
+        console.table([result]);
+        return result;
+    } finally {
+        // Restaura a VLAN selecionada
+        renderModel.benchmarkRunning = false;
+        resetRenderModel(null);
+        searchByVlan();
+    }
+}
+
+// Painel com as métricas da última atualização real
+function updateBenchmarkPanel() {
+    const panel = document.getElementById('render-bench-stats');
+    if (!panel) {
+        return;
+    }
+    const stats = renderModel.stats;
+    const average = stats.updates ? stats.totalMs / stats.updates : 0;
+    panel.textContent = `Render: ${stats.lastMs.toFixed(1)} ms (média ${average.toFixed(1)} ms, ` +
+        `${stats.lastChanged} alterados, ${renderModel.order.length} itens${renderModel.virtual ? ', virtualizado' : ''})`;
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!new URLSearchParams(window.location.search).has('bench')) {
+        return;
+    }
+
+    const panel = document.createElement('div');
+    panel.id = 'render-bench';
+    panel.style.cssText = 'position:fixed;bottom:10px;right:10px;z-index:1000;padding:10px;' +
+        'background:rgba(0,0,0,0.8);color:#fff;font:12px monospace;border-radius:8px;';
+
+    const stats = document.createElement('div');
+    stats.id = 'render-bench-stats';
+    stats.textContent = 'Render: aguardando dados...';
+
+    const button = document.createElement('button');
+    button.textContent = 'Rodar benchmark (254 / 4096 itens)';
+    button.onclick = async function() {
+        button.disabled = true;
+        const results = [await runRenderBenchmark(254), await runRenderBenchmark(4096)];
+        stats.textContent = results.map(r => `${r.itens} itens: p50 ${r.p50_ms} ms, p95 ${r.p95_ms} ms`).join(' | ');
+        button.disabled = false;
+    };
+
+    panel.appendChild(stats);
+    panel.appendChild(button);
+    document.body.appendChild(panel);
+});
+
 // ====================================
 // MODAL DE EDIÇÃO DE DISPOSITIVO
 // ====================================
@@ -1,4 +1,8 @@
-from app import app
+from app import app, routes
+
+# O serviço de verificação em background só é iniciado pelo ponto de entrada web,
+# para que o pacote 'app' possa ser importado sem efeitos colaterais (ex.: pela CLI).
+routes.start_background_service()
 
 if __name__ == '__main__':
     # Para desenvolvimento local
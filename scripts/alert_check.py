@@ -0,0 +1,180 @@
+"""
+Verificação do motor de alertas contra um webhook local.
+
+Sobe um servidor HTTP de stand-in em 127.0.0.1 (porta livre) que registra
+os incidentes recebidos e pode responder com erro ou demorar de propósito,
+e roda o AlertManager real, com a entrega por webhook, em um diretório
+temporário. Confere:
+
+- o debounce: uma oscilação mais curta que alert_debounce_samples não alerta;
+- a queda de 200 câmeras de uma VLAN vira um único POST agrupado, sem que
+  a varredura espere pelo webhook (o stand-in demora a responder);
+- os retries com backoff quando o webhook responde com erro;
+- a fila limitada: com a entrega presa, os eventos excedentes são
+  descartados e contados.
+
+Sai com código 0 se tudo passou e 1 na primeira falha.
+
+Uso (na raiz do projeto):
+    python scripts/alert_check.py
+    make alertcheck
+"""
+import http.server
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+VLAN = 85
+CAMERAS = 200
+
+
+class WebhookStandIn(http.server.ThreadingHTTPServer):
+    """Webhook local: guarda os incidentes recebidos; `fail_next` respostas 500 e `delay` segundos por POST"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), WebhookHandler)
+        self.lock = threading.Lock()
+        self.received = []
+        self.attempts = 0
+        self.fail_next = 0
+        self.delay = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+    def wait_for(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if len(self.received) >= count:
+                    return True
+            time.sleep(0.02)
+        return False
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        time.sleep(server.delay)
+        with server.lock:
+            server.attempts += 1
+            failing = server.fail_next > 0
+            if failing:
+                server.fail_next -= 1
+            else:
+                server.received.append(json.loads(body))
+        self.send_response(500 if failing else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_fixtures(work_dir, webhook_url):
+    """Gera o app_config.json com alertas ligados e janela de agrupamento curta, e um cadastro vazio"""
+    config = {
+        'monitoring': {
+            'alert_on_device_down': True,
+            'alert_webhook_url': webhook_url,
+            'alert_debounce_samples': 3,
+            'alert_group_window': 0.3,
+            'alert_max_retries': 2,
+        },
+    }
+    with open(os.path.join(work_dir, 'app_config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+    with open(os.path.join(work_dir, 'ip_devices.json'), 'w', encoding='utf-8') as f:
+        json.dump({'vlans': {}}, f)
+
+
+def sweep(hosts, status, down=()):
+    """Resultado de varredura de dispositivos cadastrados: `status` para todos, exceto `down` offline"""
+    return [{
+        'ip': f"172.17.{VLAN}.{host}",
+        'status': 'off' if host in down else status,
+        'descricao': f"Câmera {host}",
+        'tipo': 'Câmera IP',
+    } for host in hosts]
+
+
+def check(description, condition):
+    print(f"{'OK  ' if condition else 'FALHA'} {description}")
+    if not condition:
+        sys.exit(1)
+
+
+def main():
+    logging.disable(logging.WARNING)
+    webhook = WebhookStandIn()
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+
+    work_dir = tempfile.mkdtemp(prefix='ipmonitor-alerts-')
+    write_fixtures(work_dir, webhook.url)
+    os.chdir(work_dir)
+    sys.path.insert(0, ROOT_DIR)
+
+    from app.alert_manager import AlertManager
+
+    hosts = range(1, CAMERAS + 1)
+    manager = AlertManager()
+    manager.processar_varredura(VLAN, sweep(hosts, 'on'))
+
+    # Debounce: duas amostras offline seguidas de uma online não confirmam a queda
+    manager.processar_varredura(VLAN, sweep(hosts, 'on', down={7}))
+    manager.processar_varredura(VLAN, sweep(hosts, 'on', down={7}))
+    manager.processar_varredura(VLAN, sweep(hosts, 'on'))
+    check("oscilação mais curta que o debounce não gera transição", manager.stats['transicoes'] == 0)
+
+    # VLAN inteira offline: 200 transições, um único incidente, varredura sem esperar o webhook
+    webhook.delay = 1
+    manager.processar_varredura(VLAN, sweep(hosts, 'off'))
+    manager.processar_varredura(VLAN, sweep(hosts, 'off'))
+    start = time.monotonic()
+    confirmadas = manager.processar_varredura(VLAN, sweep(hosts, 'off'))
+    elapsed = time.monotonic() - start
+    check(f"{len(confirmadas)} quedas confirmadas na terceira amostra", len(confirmadas) == CAMERAS)
+    check(f"varredura não espera pelo webhook ({elapsed * 1000:.1f} ms)", elapsed < webhook.delay / 2)
+    check("incidente entregue ao webhook", webhook.wait_for(1))
+    incidente = webhook.received[0]
+    check(f"um único POST com as {CAMERAS} quedas ({incidente['summary']})",
+          webhook.attempts == 1 and incidente['total_down'] == CAMERAS
+          and incidente['vlans'][str(VLAN)]['vlan_inteira_down'])
+
+    # Retries: o webhook falha duas vezes e o incidente sai na terceira tentativa (backoff 1s, 2s)
+    webhook.delay = 0
+    webhook.fail_next = 2
+    for _ in range(3):
+        manager.processar_varredura(VLAN, sweep(hosts, 'on'))
+    check("incidente de recuperação entregue após 2 falhas", webhook.wait_for(2))
+    check(f"3 tentativas para o segundo incidente ({manager.stats['tentativas']} no total)",
+          webhook.attempts == 4 and manager.stats['tentativas'] == 4 and webhook.received[1]['total_up'] == CAMERAS)
+
+    # Fila limitada: com uma entrega presa no webhook, o excedente é descartado
+    webhook.delay = 1.5
+    limited = AlertManager(queue_size=10)
+    limited.processar_varredura(VLAN, sweep(hosts, 'on'))
+    for _ in range(3):
+        limited.processar_varredura(VLAN, sweep(hosts, 'on', down={1}))
+    time.sleep(0.5)  # A janela de agrupamento fecha e o primeiro POST fica preso no stand-in
+    for _ in range(3):
+        limited.processar_varredura(VLAN, sweep(hosts, 'off', down={1}))
+    check(f"fila limitada a 10 eventos ({limited.stats['eventos_descartados']} descartados)",
+          limited.stats['eventos_descartados'] == CAMERAS - 1 - 10)
+    check("eventos restantes entregues em um segundo incidente", webhook.wait_for(4))
+    check("segundo incidente com os 10 eventos mantidos na fila", webhook.received[3]['total_down'] == 10)
+
+    webhook.shutdown()
+    print(f"Todas as verificações passaram ({webhook.attempts} POSTs recebidos pelo stand-in)")
+
+
+if __name__ == '__main__':
+    main()
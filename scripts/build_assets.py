@@ -0,0 +1,70 @@
+"""
+Gera as versões de produção dos arquivos estáticos.
+
+Para cada .css/.js de app/static cria em app/static/dist uma cópia com o hash
+do conteúdo no nome (ex.: styles.3f2a9c1b7e.css), mais as variantes
+pré-comprimidas .gz e .br, e grava o manifest.json usado pelos templates.
+A variante brotli só é gerada se o pacote 'brotli' estiver instalado.
+
+Uso (na raiz do projeto):
+    python scripts/build_assets.py
+    make assets
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STATIC_DIR = os.path.join(ROOT_DIR, 'app', 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+EXTENSIONS = ('.css', '.js')
+
+
+def build():
+    # Recria o diretório de saída para não acumular versões antigas
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for filename in sorted(os.listdir(STATIC_DIR)):
+        if not filename.endswith(EXTENSIONS):
+            continue
+
+        with open(os.path.join(STATIC_DIR, filename), 'rb') as f:
+            content = f.read()
+
+        name, ext = os.path.splitext(filename)
+        digest = hashlib.sha256(content).hexdigest()[:10]
+        hashed_name = f"{name}.{digest}{ext}"
+        hashed_path = os.path.join(DIST_DIR, hashed_name)
+
+        with open(hashed_path, 'wb') as f:
+            f.write(content)
+        # mtime=0 deixa o .gz determinístico entre builds
+        with open(hashed_path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(hashed_path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+
+        manifest[filename] = 'dist/' + hashed_name
+        print(f"[ASSETS] {filename} -> dist/{hashed_name}")
+
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+
+    if brotli is None:
+        print("[ASSETS] Pacote 'brotli' não instalado: variantes .br não geradas")
+    print(f"[ASSETS] {len(manifest)} arquivos gerados em {DIST_DIR}")
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,336 @@
+"""
+Benchmark de latência de detecção do scanner.
+
+Roda o pipeline real (check_loop -> background_ip_check -> verificar_ips ->
+varrer_hosts) contra uma rede simulada: as sondas ICMP são trocadas por uma
+sonda roteirizada em que cada dispositivo cai e volta em instantes
+conhecidos. Um observador lê o check_ip (o mesmo que o dashboard consulta)
+e, para cada configuração, o relatório mostra:
+
+- o tempo entre a queda real e o dashboard mostrar o dispositivo offline
+  (p50/p95/máx), o mesmo para a volta, as quedas não detectadas e as
+  detectadas com atraso (offline publicado até uma varredura depois da volta);
+- os flaps falsos: transições para offline de dispositivos sem queda
+  roteirizada naquele momento (provocadas pela perda de pacotes, --loss);
+- as sondas por segundo que a configuração custa.
+
+Cada opção de configuração aceita uma lista separada por vírgulas, e todas
+as combinações são medidas em sequência com o mesmo roteiro de quedas.
+
+Uso (na raiz do projeto):
+    python scripts/detection_bench.py --interval 5,10 --retries 0,2
+    python scripts/detection_bench.py --timeout 1,2 --concurrency 3,10 --loss 0.05 --output deteccao.json
+    make detectbench ARGS="--scan-mode full,tiered"
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from loadtest import ROOT_DIR, git_commit, percentile, write_fixtures
+
+
+def parse_list(cast):
+    def parse(text):
+        return [cast(value) for value in text.split(',')]
+    return parse
+
+
+class FakeNetwork:
+    """
+    Rede simulada: os dispositivos cadastrados (hosts 1..devices) respondem,
+    exceto durante as quedas do roteiro; o restante da faixa não responde.
+    Cada sonda a um host de pé leva um RTT sorteado e pode ser perdida com
+    probabilidade `loss`; sondas sem resposta esperam o timeout inteiro.
+    """
+
+    def __init__(self, vlans, devices, loss, seed):
+        self.vlans = vlans
+        self.devices = devices
+        self.loss = loss
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.origin = time.monotonic()
+        self.outages = {}  # ip -> (queda, volta), em segundos desde `origin`
+        self.probes = 0
+
+    def script_outages(self, events, start, end, outage):
+        """Sorteia `events` quedas por VLAN, cada uma de `outage` segundos, começando em [start, end]"""
+        rng = random.Random(self.seed)
+        self.outages.clear()
+        for vlan in self.vlans:
+            for host in rng.sample(range(1, self.devices + 1), events):
+                down = rng.uniform(start, end)
+                self.outages[f"172.17.{vlan}.{host}"] = (down, down + outage)
+
+    def is_up(self, ip, now):
+        host = int(ip.rsplit('.', 1)[1])
+        if host > self.devices:
+            return False
+        outage = self.outages.get(ip)
+        return outage is None or not outage[0] <= now - self.origin < outage[1]
+
+    def probe(self, ip, timeout):
+        """Substituto das sondas de ip_operations.SONDAS"""
+        with self.lock:
+            self.probes += 1
+            lost = self.rng.random() < self.loss
+            rtt = self.rng.uniform(0.0005, 0.005)
+        if self.is_up(ip, time.monotonic()) and not lost:
+            time.sleep(rtt)
+            return rtt
+        time.sleep(timeout)
+        return None
+
+
+class Observer:
+    """
+    Lê o check_ip periodicamente e registra as transições on/off de cada
+    dispositivo, e o maior intervalo entre duas publicações de uma VLAN (a
+    duração de uma varredura completa, ciclo incluído).
+    """
+
+    def __init__(self, check_ip, origin, resolution):
+        self.check_ip = check_ip
+        self.origin = origin
+        self.resolution = resolution
+        self.last = {}
+        self.transitions = []  # (segundos desde origin, ip, status)
+        self.published = {}    # vlan -> (lista publicada, instante)
+        self.max_sweep_gap = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(self.resolution):
+            now = time.monotonic() - self.origin
+            for vlan, items in list(self.check_ip.items()):
+                # Cada varredura publica uma lista nova no check_ip
+                previous_list = self.published.get(vlan)
+                if previous_list is None or previous_list[0] is not items:
+                    if previous_list is not None:
+                        self.max_sweep_gap = max(self.max_sweep_gap, now - previous_list[1])
+                    self.published[vlan] = (items, now)
+                for item in items:
+                    status = item['status']
+                    if status not in ('on', 'off'):
+                        continue  # 'unknown' não muda o que se sabe do dispositivo
+                    previous = self.last.get(item['ip'])
+                    self.last[item['ip']] = status
+                    if previous is not None and previous != status:
+                        self.transitions.append((now, item['ip'], status))
+
+
+def analyze(outages, transitions, end, grace):
+    """
+    Casa as transições observadas com o roteiro de quedas. Um offline publicado
+    até `grace` segundos (uma varredura) depois da volta ainda pertence à queda:
+    conta como detecção atrasada, não como queda perdida nem como flap.
+    """
+    down_latencies, up_latencies = [], []
+    missed_down = missed_up = late_down = 0
+    for ip, (down, up) in outages.items():
+        offs = [t for t, tip, status in transitions if tip == ip and status == 'off' and down <= t <= up + grace]
+        if not offs:
+            missed_down += 1
+            continue
+        down_latencies.append(offs[0] - down)
+        if offs[0] >= up:
+            late_down += 1
+        ons = [t for t, tip, status in transitions if tip == ip and status == 'on' and t >= max(up, offs[0])]
+        if ons:
+            up_latencies.append(ons[0] - up)
+        elif up < end:
+            missed_up += 1
+
+    # Flaps falsos: offline de um dispositivo sem queda roteirizada naquele momento
+    flaps = 0
+    for t, ip, status in transitions:
+        outage = outages.get(ip)
+        if status == 'off' and (outage is None or not outage[0] <= t <= outage[1] + grace):
+            flaps += 1
+    return down_latencies, up_latencies, missed_down, missed_up, late_down, flaps
+
+
+def latency_summary(values):
+    values = sorted(values)
+    if not values:
+        return {'p50_s': None, 'p95_s': None, 'max_s': None}
+    return {
+        'p50_s': round(percentile(values, 50), 2),
+        'p95_s': round(percentile(values, 95), 2),
+        'max_s': round(values[-1], 2),
+    }
+
+
+def run_case(case, args, vlans, routes, ip_operations, config_manager):
+    """Mede uma combinação de parâmetros com o pipeline real do scanner"""
+    routes.stop_background_service()
+    routes.check_ip.clear()
+    with ip_operations.estimador_rtt.lock:
+        ip_operations.estimador_rtt.hosts.clear()
+
+    with config_manager.config_lock:
+        # O check_loop usa o menor intervalo entre as VLANs: a seção é trocada inteira
+        config_manager.config['ping_intervals'] = {f"vlan_{vlan}": case['interval'] for vlan in vlans}
+        config_manager.config['network_settings'].update({
+            'ping_timeout': case['timeout'],
+            'retry_attempts': case['retries'],
+            'max_concurrent_pings': case['concurrency'],
+            'scan_mode': case['scan_mode'],
+            'adaptive_timeout': not args.fixed_timeout,
+            'sweep_deadline': 0,
+        })
+
+    network = FakeNetwork(vlans, args.devices, args.loss, args.seed)
+    ip_operations.SONDAS['icmp'] = network.probe
+    routes.start_background_service()
+
+    # O roteiro começa depois da primeira varredura de todas as VLANs
+    while len(routes.check_ip) < len(vlans):
+        time.sleep(0.05)
+    origin = time.monotonic()
+    network.origin = origin
+    network.script_outages(args.events, args.warmup, args.duration - args.outage - args.settle, args.outage)
+    with network.lock:
+        network.probes = 0
+
+    observer = Observer(routes.check_ip, origin, args.resolution)
+    observer_thread = threading.Thread(target=observer.run, name='detection-observer', daemon=True)
+    observer_thread.start()
+    time.sleep(args.duration)
+    observer.stop.set()
+    observer_thread.join()
+    elapsed = time.monotonic() - origin
+    with network.lock:
+        probes = network.probes
+    routes.stop_background_service()
+
+    # Uma varredura completa, medida entre publicações (no mínimo o intervalo do ciclo
+    # mais o pior caso das sondas com retentativas)
+    grace = max(observer.max_sweep_gap, case['interval'] + case['timeout'] * (case['retries'] + 1))
+    down, up, missed_down, missed_up, late_down, flaps = analyze(network.outages, observer.transitions, elapsed, grace)
+    return {
+        'params': case,
+        'outages': len(network.outages),
+        'down': dict(latency_summary(down), missed=missed_down, late=late_down),
+        'up': dict(latency_summary(up), missed=missed_up),
+        'false_flaps': flaps,
+        'probes_per_s': round(probes / elapsed, 1),
+    }
+
+
+def print_report(report):
+    header = (f"{'intervalo':>9}{'timeout':>8}{'retry':>6}{'conc.':>6}{'modo':>7} |"
+              f"{'queda p50':>10}{'p95':>7}{'máx':>7}{'perd.':>6}{'atras.':>7} |{'volta p50':>10}{'p95':>7} |{'flaps':>6}{'sondas/s':>10}")
+    print(header)
+    print('-' * len(header))
+
+    def fmt(value):
+        return '-' if value is None else value
+
+    for r in report['results']:
+        p, down, up = r['params'], r['down'], r['up']
+        print(f"{p['interval']:>9}{p['timeout']:>8}{p['retries']:>6}{p['concurrency']:>6}{p['scan_mode']:>7} |"
+              f"{fmt(down['p50_s']):>10}{fmt(down['p95_s']):>7}{fmt(down['max_s']):>7}{down['missed']:>6}{down['late']:>7} |"
+              f"{fmt(up['p50_s']):>10}{fmt(up['p95_s']):>7} |{r['false_flaps']:>6}{r['probes_per_s']:>10}")
+    params = report['params']
+    print(f"\n(tempos em segundos; {params['vlans']} VLANs x {params['devices']} dispositivos, {params['events']} quedas "
+          f"de {params['outage']}s por VLAN, perda {params['loss']:.0%}, {params['duration']}s por configuração)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Latência de detecção do scanner do ipmonitor em uma rede simulada.')
+    parser.add_argument('--interval', type=parse_list(int), default=[5], help='intervalo do check_loop (s), lista')
+    parser.add_argument('--timeout', type=parse_list(float), default=[1.0], help='ping_timeout (s), lista')
+    parser.add_argument('--retries', type=parse_list(int), default=[2], help='retry_attempts, lista')
+    parser.add_argument('--concurrency', type=parse_list(int), default=[3], help='max_concurrent_pings, lista')
+    parser.add_argument('--scan-mode', type=parse_list(str), default=['full'], help='scan_mode (full, tiered), lista')
+    parser.add_argument('--fixed-timeout', action='store_true', help='desliga o timeout adaptativo')
+    parser.add_argument('--vlans', type=int, default=2, help='VLANs simuladas')
+    parser.add_argument('--first-vlan', type=int, default=80, help='primeira VLAN simulada')
+    parser.add_argument('--devices', type=int, default=40, help='dispositivos cadastrados por VLAN (máx. 100)')
+    parser.add_argument('--events', type=int, default=4, help='quedas roteirizadas por VLAN')
+    parser.add_argument('--outage', type=float, default=20, help='duração de cada queda (s)')
+    parser.add_argument('--loss', type=float, default=0.02, help='probabilidade de perda de cada sonda')
+    parser.add_argument('-d', '--duration', type=float, default=60, help='duração da medição de cada configuração (s)')
+    parser.add_argument('--warmup', type=float, default=3, help='segundos antes da primeira queda possível')
+    parser.add_argument('--resolution', type=float, default=0.05, help='intervalo de leitura do check_ip (s)')
+    parser.add_argument('--seed', type=int, default=1, help='semente do roteiro e da perda de pacotes')
+    parser.add_argument('--output', help='grava o resultado em JSON')
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.devices <= 100 or args.events > args.devices:
+        parser.error('devices deve estar entre 1 e 100 e events não pode passar de devices')
+    if any(mode not in ('full', 'tiered') for mode in args.scan_mode):
+        parser.error('scan-mode aceita apenas full e tiered')
+    # Folga após a última volta para que ela possa ser detectada
+    args.settle = max(args.interval) + max(args.timeout) * (max(args.retries) + 1) + 1
+    if args.duration - args.outage - args.settle <= args.warmup:
+        parser.error(f"duration curta demais: precisa passar de warmup + outage + {args.settle:.0f}s de folga")
+
+    output = os.path.abspath(args.output) if args.output else None
+
+    # A aplicação lê e grava seus arquivos no diretório atual
+    work_dir = tempfile.mkdtemp(prefix='ipmonitor-detection-')
+    fixture_args = argparse.Namespace(vlans=args.vlans, first_vlan=args.first_vlan, devices=args.devices,
+                                      scan_interval=min(args.interval), admission=False)
+    vlans = write_fixtures(work_dir, fixture_args)
+    os.chdir(work_dir)
+    sys.path.insert(0, ROOT_DIR)
+
+    log_file = open(os.path.join(work_dir, 'app.log'), 'w', encoding='utf-8')
+    logging.basicConfig(level=logging.INFO, stream=log_file, format='%(asctime)s - %(levelname)s - %(message)s')
+    stdout = sys.stdout
+    sys.stdout = log_file
+
+    from app import routes, ip_operations
+    from app.config_manager import config_manager
+
+    cases = [dict(zip(('interval', 'timeout', 'retries', 'concurrency', 'scan_mode'), values))
+             for values in itertools.product(args.interval, args.timeout, args.retries, args.concurrency, args.scan_mode)]
+    results = []
+    try:
+        for i, case in enumerate(cases, 1):
+            print(f"[{i}/{len(cases)}] {case}", file=stdout, flush=True)
+            results.append(run_case(case, args, vlans, routes, ip_operations, config_manager))
+    finally:
+        routes.stop_background_service()
+        sys.stdout = stdout
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': {
+            'vlans': args.vlans,
+            'devices': args.devices,
+            'events': args.events,
+            'outage': args.outage,
+            'loss': args.loss,
+            'duration': args.duration,
+            'adaptive_timeout': not args.fixed_timeout,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    print()
+    print_report(report)
+    print(f"\nLogs da aplicação: {os.path.join(work_dir, 'app.log')}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultado gravado em {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
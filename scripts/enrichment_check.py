@@ -0,0 +1,171 @@
+"""
+Verificação do enriquecimento (nome, MAC e fabricante) sem rede.
+
+Roda o EnrichmentService real em um diretório temporário com um resolvedor
+DNS de stub e arquivos de fixture para a tabela de vizinhos (formato de
+/proc/net/arp) e para a base OUI, e confere:
+
+- que enrich() não espera pelo DNS (o stub demora de propósito) e que os
+  dados aparecem na chamada seguinte;
+- MAC e fabricante vindos das fixtures, ignorando entradas ARP incompletas;
+- o cache negativo (IP sem nome não é consultado de novo até negative_ttl);
+- o limite do cache LRU e a releitura da tabela de vizinhos no máximo uma
+  vez a cada neighbor_max_age.
+
+Sai com código 0 se tudo passou e 1 na primeira falha.
+
+Uso (na raiz do projeto):
+    python scripts/enrichment_check.py
+    make enrichcheck
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Atraso do resolvedor de stub: maior que o tempo aceitável para enrich()
+RESOLVER_DELAY = 0.3
+
+NEIGHBOR_FIXTURE = """IP address       HW type     Flags       HW address            Mask     Device
+10.9.0.1         0x1         0x2         00:1a:2b:00:00:01     *        eth0
+10.9.0.2         0x1         0x2         3c:d9:2b:00:00:02     *        eth0
+10.9.0.3         0x1         0x0         00:00:00:00:00:00     *        eth0
+"""
+
+OUI_FIXTURE = """OUI/MA-L                                                    Organization
+00-1A-2B   (hex)\t\tFabricante Teste
+001A2B     (base 16)\t\tFabricante Teste
+3CD92B,Outro Fabricante
+"""
+
+# Respostas do DNS reverso de stub (IPs ausentes não têm nome)
+HOSTNAMES = {
+    '10.9.0.1': 'camera-01.local',
+    '10.9.0.2': 'ups-02.local',
+}
+
+
+class StubResolver:
+    """Resolvedor de DNS reverso em memória que conta as consultas e demora RESOLVER_DELAY"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def __call__(self, ip):
+        with self.lock:
+            self.calls[ip] = self.calls.get(ip, 0) + 1
+        time.sleep(RESOLVER_DELAY)
+        return HOSTNAMES.get(ip)
+
+
+def write_fixtures(work_dir):
+    """Gera a tabela de vizinhos, a base OUI, o app_config.json com TTLs curtos e um cadastro vazio"""
+    with open(os.path.join(work_dir, 'arp'), 'w', encoding='utf-8') as f:
+        f.write(NEIGHBOR_FIXTURE)
+    with open(os.path.join(work_dir, 'oui.txt'), 'w', encoding='utf-8') as f:
+        f.write(OUI_FIXTURE)
+    config = {
+        'enrichment': {
+            'enabled': True,
+            'ttl': 60,
+            'negative_ttl': 1,
+            'cache_size': 8,
+            'neighbor_file': os.path.join(work_dir, 'arp'),
+            'neighbor_max_age': 30,
+            'oui_file': os.path.join(work_dir, 'oui.txt'),
+        },
+    }
+    with open(os.path.join(work_dir, 'app_config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+    with open(os.path.join(work_dir, 'ip_devices.json'), 'w', encoding='utf-8') as f:
+        json.dump({'vlans': {}}, f)
+
+
+def wait_idle(service, timeout=5):
+    """Espera a fila do enriquecimento esvaziar e o último lote terminar"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with service.queued_lock:
+            if not service.queued:
+                return True
+        time.sleep(0.02)
+    return False
+
+
+def online(*ips):
+    return [{'ip': ip, 'status': 'on'} for ip in ips]
+
+
+def check(description, condition):
+    print(f"{'OK  ' if condition else 'FALHA'} {description}")
+    if not condition:
+        sys.exit(1)
+
+
+def main():
+    logging.disable(logging.INFO)
+    work_dir = tempfile.mkdtemp(prefix='ipmonitor-enrichment-')
+    write_fixtures(work_dir)
+    os.chdir(work_dir)
+    sys.path.insert(0, ROOT_DIR)
+
+    from app.enrichment import EnrichmentService, read_neighbor_table
+
+    resolver = StubResolver()
+    service = EnrichmentService(resolver=resolver)
+
+    # Primeira varredura: nada em cache, enrich() só enfileira
+    start = time.monotonic()
+    first = service.enrich(online('10.9.0.1', '10.9.0.2', '10.9.0.3') + [{'ip': '10.9.0.4', 'status': 'off'}])
+    elapsed = time.monotonic() - start
+    check(f"enrich() não espera pelo DNS ({elapsed * 1000:.1f} ms)", elapsed < RESOLVER_DELAY / 2)
+    check("primeira varredura sai sem dados de enriquecimento", all('hostname' not in item for item in first))
+    check("lote consultado em segundo plano", wait_idle(service))
+    check("host offline não é consultado", '10.9.0.4' not in resolver.calls)
+
+    # Varredura seguinte: dados vindos do cache
+    second = {item['ip']: item for item in service.enrich(online('10.9.0.1', '10.9.0.2', '10.9.0.3'))}
+    check("nome, MAC e fabricante pelo OUI do IEEE",
+          (second['10.9.0.1']['hostname'], second['10.9.0.1']['mac'], second['10.9.0.1']['vendor'])
+          == ('camera-01.local', '00:1a:2b:00:00:01', 'Fabricante Teste'))
+    check("fabricante pela linha simplificada do OUI", second['10.9.0.2']['vendor'] == 'Outro Fabricante')
+    check("entrada ARP incompleta ignorada", second['10.9.0.3']['mac'] is None and second['10.9.0.3']['hostname'] is None)
+
+    # Cache negativo: 10.9.0.3 não tem nome nem MAC e expira após negative_ttl
+    service.enrich(online('10.9.0.3'))
+    wait_idle(service)
+    check("resultado vazio não é consultado de novo antes de negative_ttl", resolver.calls['10.9.0.3'] == 1)
+    time.sleep(1.1)
+    service.enrich(online('10.9.0.3'))
+    wait_idle(service)
+    check("resultado vazio consultado de novo após negative_ttl", resolver.calls['10.9.0.3'] == 2)
+
+    # Limite do LRU (cache_size 8)
+    service.enrich(online(*[f"10.9.1.{host}" for host in range(1, 21)]))
+    wait_idle(service)
+    check(f"cache limitado a cache_size ({len(service.cache)} entradas, {service.cache.stats['evictions']} descartes)",
+          len(service.cache) == 8 and service.cache.stats['evictions'] > 0)
+
+    # Tabela de vizinhos injetada: relida no máximo uma vez por neighbor_max_age
+    reads = []
+
+    def counting_reader(path):
+        reads.append(path)
+        return read_neighbor_table(path)
+
+    service = EnrichmentService(resolver=resolver, neighbor_reader=counting_reader)
+    for host in range(1, 4):
+        service.lookup_batch([f"10.9.0.{host}"])
+    check("tabela de vizinhos lida uma vez em três lotes seguidos", len(reads) == 1)
+
+    print(f"Todas as verificações passaram ({service.get_status()['lookups']} consultas no último serviço)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+"""
+Teste de carga da API de status e de dispositivos.
+
+Sobe a aplicação no waitress (mesmo servidor de produção) em um diretório
+temporário, com um ip_devices.json de fixture e um scanner simulado no lugar
+das sondas reais, e dispara clientes concorrentes contra /api/ip-status,
+/api/start-check/<vlan>, a API externa e o CRUD de dispositivos. Ao final
+mostra vazão e latências p50/p95/p99 por rota.
+
+Com --output o resultado é gravado em JSON (com o commit atual), e
+--compare mostra a diferença para um resultado anterior, permitindo
+comparar commits com os mesmos parâmetros.
+
+Uso (na raiz do projeto):
+    python scripts/loadtest.py --clients 16 --duration 20
+    python scripts/loadtest.py --mix status=5,vlan=5,external=2,crud=1 --output antes.json
+    python scripts/loadtest.py --output depois.json --compare antes.json
+    make loadtest
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Cenários disponíveis e peso padrão no sorteio de cada cliente
+DEFAULT_MIX = 'status=4,vlan=4,external=2,batch=1,devices=2,crud=1'
+
+# Primeiro host usado pelo CRUD (os dispositivos da fixture ficam abaixo dele)
+CRUD_FIRST_HOST = 150
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f"Cenário desconhecido: {name} (opções: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def write_fixtures(work_dir, args):
+    """Gera o ip_devices.json e o app_config.json usados pela aplicação no teste"""
+    vlans = list(range(args.first_vlan, args.first_vlan + args.vlans))
+    tipos = ['Câmera IP', 'Central de Alarme', 'UPS', 'GMG', 'Controlador', '']
+    now = datetime.now().isoformat()
+
+    devices = {'vlans': {}}
+    for vlan in vlans:
+        devices['vlans'][str(vlan)] = [{
+            'ip': f"172.17.{vlan}.{host}",
+            'descricao': f"Dispositivo {vlan}.{host}",
+            'tipo': tipos[host % len(tipos)],
+            'created_at': now,
+            'updated_at': now,
+        } for host in range(1, args.devices + 1)]
+
+    config = {
+        'ping_intervals': {f"vlan_{vlan}": args.scan_interval for vlan in vlans},
+        'vlans': {'active_vlans': vlans},
+        'admission': {'enabled': args.admission},
+        'enrichment': {'enabled': False},
+        'monitoring': {'alert_webhook_url': ''},
+    }
+
+    with open(os.path.join(work_dir, 'ip_devices.json'), 'w', encoding='utf-8') as f:
+        json.dump(devices, f, ensure_ascii=False)
+    with open(os.path.join(work_dir, 'app_config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+    return vlans
+
+
+def simulated_sweep(sweep_time, down_ratio):
+    """Cria um substituto de varrer_hosts: estados sorteados e tempo de varredura fixo, sem rede"""
+    def varrer_hosts(ip_list, **_):
+        rng = random.Random()
+        pause = sweep_time / 10
+        offline = []
+        for i, ip in enumerate(ip_list):
+            if i % max(1, len(ip_list) // 10) == 0:
+                time.sleep(pause)
+            host = int(ip.rsplit('.', 1)[1])
+            # Hosts altos simulam o espaço livre da faixa
+            if host > 100 or rng.random() < down_ratio:
+                offline.append({'ip': ip, 'status': 'off', 'rtt_ms': None})
+            else:
+                yield {'ip': ip, 'status': 'on', 'rtt_ms': round(rng.uniform(0.3, 5), 2)}
+        yield from offline
+    return varrer_hosts
+
+
+class Client:
+    """Cliente HTTP com conexão persistente que registra a latência de cada requisição"""
+
+    def __init__(self, index, port, vlans, token, results):
+        self.index = index
+        self.port = port
+        self.vlans = vlans
+        self.token = token
+        self.results = results
+        self.rng = random.Random(index)
+        self.conn = None
+        # IP exclusivo deste cliente para o CRUD
+        self.crud_vlan = vlans[index % len(vlans)]
+        self.crud_ip = f"172.17.{self.crud_vlan}.{CRUD_FIRST_HOST + index // len(vlans)}"
+
+    def request(self, route, method, path, body=None, auth=False):
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if auth:
+            headers['Authorization'] = f"Bearer {self.token}"
+
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            status = 0
+        elapsed = time.perf_counter() - start
+        self.results.setdefault(route, []).append((elapsed, status))
+
+    def run(self, mix, deadline):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        while time.monotonic() < deadline:
+            SCENARIOS[self.rng.choices(names, weights)[0]](self)
+
+
+def scenario_status(client):
+    client.request('GET /api/ip-status', 'GET', '/api/ip-status')
+
+
+def scenario_vlan(client):
+    vlan = client.rng.choice(client.vlans)
+    client.request('GET /api/start-check/<vlan>', 'GET', f"/api/start-check/{vlan}")
+
+
+def scenario_external(client):
+    vlan = client.rng.choice(client.vlans)
+    client.request('GET /api/external/devices/vlan/<vlan>', 'GET', f"/api/external/devices/vlan/{vlan}", auth=True)
+
+
+def scenario_batch(client):
+    vlans = ','.join(str(v) for v in client.rng.sample(client.vlans, min(3, len(client.vlans))))
+    client.request('GET /api/external/devices', 'GET', f"/api/external/devices?vlans={vlans}&status=online", auth=True)
+
+
+def scenario_devices(client):
+    vlan = client.rng.choice(client.vlans)
+    client.request('GET /api/devices/<vlan>', 'GET', f"/api/devices/{vlan}")
+
+
+def scenario_crud(client):
+    vlan, ip = client.crud_vlan, client.crud_ip
+    client.request('POST /api/devices/<vlan>', 'POST', f"/api/devices/{vlan}",
+                   {'ip': ip, 'descricao': f"Carga {client.index}", 'tipo': 'UPS'})
+    client.request('PUT /api/devices/<vlan>/<ip>', 'PUT', f"/api/devices/{vlan}/{ip}",
+                   {'descricao': f"Carga {client.index} editado", 'tipo': 'GMG'})
+    client.request('DELETE /api/devices/<vlan>', 'DELETE', f"/api/devices/{vlan}", {'ip': ip})
+
+
+SCENARIOS = {
+    'status': scenario_status,
+    'vlan': scenario_vlan,
+    'external': scenario_external,
+    'batch': scenario_batch,
+    'devices': scenario_devices,
+    'crud': scenario_crud,
+}
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(results, duration):
+    routes = {}
+    for route, samples in sorted(results.items()):
+        latencies = sorted(elapsed for elapsed, _ in samples)
+        statuses = [status for _, status in samples]
+        routes[route] = {
+            'requests': len(samples),
+            'rps': round(len(samples) / duration, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2),
+            'rejected': sum(1 for s in statuses if s in (429, 503)),
+            'errors': sum(1 for s in statuses if s == 0 or (s >= 400 and s not in (429, 503))),
+        }
+    return routes
+
+
+def print_report(report, baseline=None):
+    header = f"{'rota':<42}{'req':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'429/503':>9}{'erros':>7}"
+    print(header)
+    print('-' * len(header))
+    for route, r in report['routes'].items():
+        print(f"{route:<42}{r['requests']:>8}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['max_ms']:>9}{r['rejected']:>9}{r['errors']:>7}")
+    total = report['total']
+    print('-' * len(header))
+    print(f"{'total':<42}{total['requests']:>8}{total['rps']:>9}   (latências em ms, {report['params']['clients']} clientes, "
+          f"{report['params']['duration']}s, {total['sweeps']} varreduras simuladas)")
+
+    if baseline:
+        print(f"\nComparação com {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '')}):")
+        if baseline.get('params') != report['params']:
+            print("  aviso: parâmetros diferentes entre as execuções")
+        for route, r in report['routes'].items():
+            old = baseline.get('routes', {}).get(route)
+            if not old:
+                continue
+            deltas = []
+            for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if old[key]:
+                    deltas.append(f"{key} {100.0 * (r[key] - old[key]) / old[key]:+.1f}%")
+            print(f"  {route:<42}{'  '.join(deltas)}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Teste de carga da API do ipmonitor com scanner simulado.')
+    parser.add_argument('-c', '--clients', type=int, default=16, help='clientes concorrentes')
+    parser.add_argument('-d', '--duration', type=float, default=15, help='duração da medição, em segundos')
+    parser.add_argument('--warmup', type=float, default=2, help='segundos de aquecimento antes de medir')
+    parser.add_argument('--threads', type=int, default=4, help='threads do waitress (produção usa 4)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"peso de cada cenário (padrão: {DEFAULT_MIX})")
+    parser.add_argument('--vlans', type=int, default=6, help='VLANs na fixture')
+    parser.add_argument('--first-vlan', type=int, default=80, help='primeira VLAN da fixture')
+    parser.add_argument('--devices', type=int, default=60, help='dispositivos cadastrados por VLAN (máx. 100)')
+    parser.add_argument('--scan-interval', type=int, default=2, help='intervalo do check_loop, em segundos')
+    parser.add_argument('--sweep-time', type=float, default=0.5, help='duração simulada de cada varredura de VLAN')
+    parser.add_argument('--down-ratio', type=float, default=0.05, help='fração de dispositivos offline por varredura')
+    parser.add_argument('--admission', action='store_true', help='mantém o controle de admissão ligado')
+    parser.add_argument('--output', help='grava o resultado em JSON')
+    parser.add_argument('--compare', help='compara com um JSON gravado anteriormente')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if not 1 <= args.devices <= 100 or args.clients < 1 or args.duration <= 0:
+        parser.error('devices deve estar entre 1 e 100; clients e duration devem ser positivos')
+    if args.clients > len(range(CRUD_FIRST_HOST, 255)) * args.vlans:
+        parser.error('clientes demais para os IPs livres de CRUD; aumente --vlans')
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    # A aplicação lê e grava seus arquivos no diretório atual
+    work_dir = tempfile.mkdtemp(prefix='ipmonitor-loadtest-')
+    vlans = write_fixtures(work_dir, args)
+    os.chdir(work_dir)
+    sys.path.insert(0, ROOT_DIR)
+
+    # Logs e prints da aplicação continuam sendo gerados (fazem parte do custo), mas vão para arquivo
+    log_file = open(os.path.join(work_dir, 'app.log'), 'w', encoding='utf-8')
+    logging.basicConfig(level=logging.INFO, stream=log_file, format='%(asctime)s - %(levelname)s - %(message)s')
+    stdout = sys.stdout
+    sys.stdout = log_file
+
+    from waitress import create_server
+    from app import app, routes, ip_operations
+
+    sweeps = {'count': 0}
+    varrer_simulado = simulated_sweep(args.sweep_time, args.down_ratio)
+
+    def contar_varreduras(ip_list, **opcoes):
+        sweeps['count'] += 1
+        return varrer_simulado(ip_list, **opcoes)
+
+    ip_operations.varrer_hosts = contar_varreduras
+
+    server = create_server(app, host='127.0.0.1', port=0, threads=args.threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    routes.start_background_service()
+
+    try:
+        # Espera a primeira varredura de todas as VLANs
+        while len(routes.check_ip) < len(vlans):
+            time.sleep(0.1)
+
+        results = [{} for _ in range(args.clients)]
+        clients = [Client(i, server.effective_port, vlans, routes.API_TOKEN, results[i]) for i in range(args.clients)]
+
+        warmup_deadline = time.monotonic() + args.warmup
+        threads = [threading.Thread(target=c.run, args=(mix, warmup_deadline)) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for r in results:
+            r.clear()
+
+        sweeps_before = sweeps['count']
+        start = time.monotonic()
+        deadline = start + args.duration
+        threads = [threading.Thread(target=c.run, args=(mix, deadline)) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duration = time.monotonic() - start
+        sweeps_done = sweeps['count'] - sweeps_before
+    finally:
+        # O servidor roda em thread daemon e termina junto com o processo
+        routes.stop_background_service()
+        sys.stdout = stdout
+
+    merged = {}
+    for r in results:
+        for route, samples in r.items():
+            merged.setdefault(route, []).extend(samples)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': {
+            'clients': args.clients,
+            'duration': args.duration,
+            'threads': args.threads,
+            'mix': mix,
+            'vlans': args.vlans,
+            'devices': args.devices,
+            'scan_interval': args.scan_interval,
+            'sweep_time': args.sweep_time,
+            'admission': args.admission,
+        },
+        'routes': summarize(merged, duration),
+    }
+    total_requests = sum(len(samples) for samples in merged.values())
+    report['total'] = {'requests': total_requests, 'rps': round(total_requests / duration, 1), 'sweeps': sweeps_done}
+
+    print_report(report, baseline)
+    print(f"\nLogs da aplicação: {os.path.join(work_dir, 'app.log')}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultado gravado em {output}")
+
+    failed = sum(r['errors'] for r in report['routes'].values())
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())